@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Compare the codecs on realistic payloads.
+
+    python -m bench.codec [rounds]
+
+Request and response are decoded and encoded once per call,
+a broadcast event is encoded once per room and wire format.
+"""
+
+import time
+from typing import Any, Callable
+
+from jsonrpcd.rpc.codec import available_codecs, get_codec
+
+REQUEST = dict(
+    jsonrpc="2.0",
+    id=1337,
+    method="all.firework",
+    params=dict(x=0.42, y=0.17, color="#ff8800", size=12, trail=True),
+)
+RESPONSE = dict(
+    jsonrpc="2.0",
+    id=1337,
+    result=[
+        dict(login=f"user-{i}", room="secret_room", score=i * 1.5, online=i % 2 == 0)
+        for i in range(20)
+    ],
+)
+BROADCAST = dict(
+    jsonrpc="2.0",
+    method="all.firework",
+    params=dict(
+        x=0.42,
+        y=0.17,
+        color="#ff8800",
+        particles=[dict(dx=i / 100, dy=-i / 50, life=120) for i in range(50)],
+    ),
+)
+
+
+def measure(function: Callable[[], Any], rounds: int) -> float:
+    "Nanoseconds per call."
+    start = time.perf_counter_ns()
+    for _ in range(rounds):
+        function()
+    return (time.perf_counter_ns() - start) / rounds
+
+
+def main(rounds: int = 20_000):
+    print(f"{'codec':<10}{'payload':<12}{'encode ns':>12}{'decode ns':>12}{'bytes':>8}")
+    for name in available_codecs() + available_codecs(binary=True):
+        codec = get_codec(name)
+        for label, payload in (
+            ("request", REQUEST),
+            ("response", RESPONSE),
+            ("broadcast", BROADCAST),
+        ):
+            data = codec.encode(payload)
+            encode = measure(lambda: codec.encode(payload), rounds)
+            # Websocket text frames arrive as str, binary ones as bytes
+            text = data if codec.binary else data.decode()
+            decode = measure(lambda: codec.decode(text), rounds)
+            print(f"{name:<10}{label:<12}{encode:>12.0f}{decode:>12.0f}{len(data):>8}")
+
+
+if __name__ == "__main__":
+    import sys
+
+    main(*(int(arg) for arg in sys.argv[1:2]))
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Dispatch overhead, before and after the precompiled route table.
+
+    python -m bench.dispatch [rounds]
+
+"legacy" is the previous lookup: split the name, then find out if the
+method is public by introspecting the wrapper name.
+"""
+
+import time
+from typing import Any, Awaitable, Callable
+
+from jsonrpcd.rpc.dispatcher import Dispatcher
+
+Handler = Callable[..., Awaitable[Any]]
+
+
+async def _handler(request: Any) -> None:
+    pass
+
+
+def _anonymous(function: Handler) -> Handler:
+    async def _anonymously(request: Any) -> Any:
+        return await function(request)
+
+    return _anonymously
+
+
+class LegacyDispatcher:
+    def __init__(self) -> None:
+        self._handlers = dict[str, Handler]()
+        self._namespaces = dict[str, Handler]()
+
+    def __getitem__(self, name: str) -> Handler:
+        slugs = name.split(".")
+        if len(slugs) > 1 and slugs[0] in self._namespaces:
+            return self._namespaces[slugs[0]]
+        return self._handlers[name]
+
+
+def legacy(rounds: int, names: list[str]) -> float:
+    d = LegacyDispatcher()
+    d._handlers["hello"] = _anonymous(_handler)
+    d._namespaces["all"] = _handler
+    start = time.perf_counter_ns()
+    for _ in range(rounds):
+        for name in names:
+            method = d[name]
+            "_anonymously" not in method.__qualname__
+    return (time.perf_counter_ns() - start) / rounds / len(names)
+
+
+def routed(rounds: int, names: list[str]) -> float:
+    d = Dispatcher[Handler]()
+    d.put_handler("hello", _handler, public=True)
+    d.put_namespace("all", _handler)
+    start = time.perf_counter_ns()
+    for _ in range(rounds):
+        for name in names:
+            route = d.route(name)
+            route.public
+    return (time.perf_counter_ns() - start) / rounds / len(names)
+
+
+def main(rounds: int = 200_000):
+    names = ["hello", "all.firework", "all.chat.message"]
+    print(f"legacy: {legacy(rounds, names):.0f} ns per lookup")
+    print(f"routed: {routed(rounds, names):.0f} ns per lookup")
+
+
+if __name__ == "__main__":
+    import sys
+
+    main(*(int(arg) for arg in sys.argv[1:2]))
@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+"""
+Load generator: N websocket clients, a workload, a target rate.
+
+    python -m bench.load [--url ws://localhost:8080/rpc] [--clients 50]
+        [--workload request|notification|broadcast] [--rate 2000]
+        [--duration 10] [--json]
+    python -m bench.load --suite [--json]
+
+Without --url, a local server is started: hello, and a Club room for the
+broadcasts. Against jsonrpcd.ws.hello, use the request and notification
+workloads. Against the fireworks server, the broadcast one needs the room key:
+
+    FAN_KEY="my super secret key" python -m bench.load \\
+        --url ws://localhost:8080/rpc --room secret_room --workload broadcast
+
+Requests call hello, broadcasts are all.bench notifications, carrying their
+send time. Latencies are counted from the scheduled send time, a late client
+doesn't hide the server slowness. --rate 0 is a closed loop: each client waits
+for its response before the next request.
+--json writes one JSON object per run, to compare releases.
+"""
+
+import argparse
+import asyncio
+from importlib import metadata
+import json
+import math
+import multiprocessing
+import os
+import platform
+import socket
+import subprocess
+import time
+from typing import Any
+
+import aiohttp
+from aiohttp import web
+import jwt
+
+from jsonrpcd.fan.club import Club, all
+from jsonrpcd.rpc.app import App, Request, Session
+from jsonrpcd.ws.web import JsonRpcWebHandler
+
+WORKLOADS = ("request", "notification", "broadcast")
+
+
+def percentile(values: list[float], q: float) -> float:
+    "Nearest rank, values are sorted."
+    if len(values) == 0:
+        return math.nan
+    return values[max(0, math.ceil(q * len(values)) - 1)]
+
+
+def _close_session(session: Session) -> None:
+    # Request and notification clients are anonymous
+    if session.user is not None:
+        session.close()
+
+
+def server_app(room: str, secret: str) -> web.Application:
+    app = App()
+    club = Club(app)
+    club.register_room(room, secret)
+    app.namespace("all")(all)
+    app.handler("authenticate", public=True)(club.authenticate)
+
+    @app.handler("hello", public=True)
+    async def hello(request: Request) -> str:
+        return f"Hello {request.params[0]}"
+
+    web_app = web.Application()
+    web_app.router.add_get("/rpc", JsonRpcWebHandler(app, on_close=_close_session))
+    return web_app
+
+
+def _serve(port: int, room: str, secret: str) -> None:
+    web.run_app(server_app(room, secret), port=port, print=None)
+
+
+def start_server(room: str, secret: str) -> tuple[multiprocessing.Process, str]:
+    "A local server, in its own process."
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    process = multiprocessing.Process(
+        target=_serve, args=(port, room, secret), daemon=True
+    )
+    process.start()
+    for _ in range(100):
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            break
+        except OSError:
+            time.sleep(0.05)
+    return process, f"ws://127.0.0.1:{port}/rpc"
+
+
+class Client:
+    "One websocket, its pending requests, and what it measured."
+
+    def __init__(self, ws: aiohttp.ClientWebSocketResponse) -> None:
+        self.ws = ws
+        self.latencies = list[float]()
+        self.errors = 0
+        self.received = 0
+        self._pending = dict[int, tuple[float, asyncio.Future]]()
+        self._last_id = 0
+
+    async def read(self) -> None:
+        async for msg in self.ws:
+            if msg.type != aiohttp.WSMsgType.TEXT:
+                break
+            now = time.monotonic()
+            message = json.loads(msg.data)
+            if "result" in message or "error" in message:
+                sent, future = self._pending.pop(message["id"], (None, None))
+                if "error" in message:
+                    self.errors += 1
+                elif sent is not None:
+                    self.latencies.append(now - sent)
+                if future is not None and not future.done():
+                    future.set_result(message)
+            elif message.get("method", "").startswith("all."):
+                self.received += 1
+                self.latencies.append(now - message["params"]["t"])
+        for _, future in self._pending.values():
+            if not future.done():
+                future.set_exception(ConnectionError("Connection closed"))
+
+    async def request(
+        self, method: str, params: Any, sent: float | None = None
+    ) -> asyncio.Future:
+        "Send a request, the future is its response."
+        self._last_id += 1
+        future = asyncio.get_running_loop().create_future()
+        self._pending[self._last_id] = (
+            time.monotonic() if sent is None else sent,
+            future,
+        )
+        await self.ws.send_str(
+            json.dumps(
+                dict(jsonrpc="2.0", id=self._last_id, method=method, params=params)
+            )
+        )
+        return future
+
+    async def notify(self, method: str, params: Any) -> None:
+        await self.ws.send_str(
+            json.dumps(dict(jsonrpc="2.0", method=method, params=params))
+        )
+
+
+async def _drive(
+    client: Client, workload: str, rate: float, duration: float, start: float
+) -> int:
+    "Send at rate per second (0 is a closed loop) for duration seconds."
+    sent = 0
+    end = start + duration
+    while True:
+        if rate > 0:
+            scheduled = start + sent / rate
+            if scheduled >= end:
+                break
+            delay = scheduled - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        else:
+            scheduled = time.monotonic()
+            if scheduled >= end:
+                break
+        sent += 1
+        if workload == "request":
+            response = await client.request("hello", ["bench"], scheduled)
+            if rate == 0:
+                await response
+        elif workload == "notification":
+            await client.notify("hello", ["bench"])
+        else:
+            await client.notify("all.bench", dict(t=scheduled))
+            if rate == 0:
+                await asyncio.sleep(0)
+    return sent
+
+
+async def run(
+    url: str,
+    clients: int = 50,
+    workload: str = "request",
+    rate: float = 2000,
+    duration: float = 10,
+    room: str = "bench",
+    secret: str = "",
+) -> dict[str, Any]:
+    "Run one workload, rate is the total for all the clients."
+    async with aiohttp.ClientSession() as http:
+        pool = list[Client]()
+        for i in range(clients):
+            pool.append(Client(await http.ws_connect(url, max_msg_size=0)))
+        readers = [asyncio.create_task(client.read()) for client in pool]
+        if workload == "broadcast":
+            logins = [
+                await client.request(
+                    "authenticate",
+                    dict(
+                        room=room,
+                        token=jwt.encode(
+                            dict(login=f"bench-{i}", room=room),
+                            secret,
+                            algorithm="HS256",
+                        ),
+                    ),
+                )
+                for i, client in enumerate(pool)
+            ]
+            await asyncio.gather(*logins)
+            for client in pool:
+                client.latencies.clear()
+        start = time.monotonic()
+        sent = sum(
+            await asyncio.gather(
+                *(
+                    _drive(client, workload, rate / clients, duration, start)
+                    for client in pool
+                )
+            )
+        )
+        # Everything sent, wait for the server
+        if workload == "notification":
+            # The server is done with the notifications, roughly.
+            # Notifications have no latency, only a throughput.
+            ends = [await client.request("hello", ["end"]) for client in pool]
+            await asyncio.gather(*ends)
+            for client in pool:
+                client.latencies.clear()
+        elif workload == "broadcast":
+            # Every other client gets the event, lost ones are given up after 1s
+            expected = sent * (clients - 1)
+            received, progress = 0, time.monotonic()
+            while received < expected and time.monotonic() - progress < 1:
+                await asyncio.sleep(0.01)
+                if sum(client.received for client in pool) > received:
+                    received = sum(client.received for client in pool)
+                    progress = time.monotonic()
+        else:
+            while any(len(client._pending) for client in pool):
+                await asyncio.sleep(0.01)
+        elapsed = time.monotonic() - start
+        for client in pool:
+            await client.ws.close()
+        await asyncio.gather(*readers)
+    latencies = sorted(lat for client in pool for lat in client.latencies)
+    done = sent if workload == "notification" else len(latencies)
+    return dict(
+        workload=workload,
+        clients=clients,
+        rate=rate,
+        duration=duration,
+        sent=sent,
+        done=done,
+        errors=sum(client.errors for client in pool),
+        seconds=elapsed,
+        throughput=done / elapsed,
+        p50=percentile(latencies, 0.5),
+        p99=percentile(latencies, 0.99),
+        p999=percentile(latencies, 0.999),
+        max=latencies[-1] if len(latencies) else math.nan,
+    )
+
+
+def _version() -> str | None:
+    "The installed jsonrpcd, or the git commit of a checkout."
+    try:
+        return metadata.version("jsonrpcd")
+    except metadata.PackageNotFoundError:
+        pass
+    try:
+        described = subprocess.run(
+            ["git", "describe", "--tags", "--always", "--dirty"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+            timeout=5,
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    if described.returncode != 0:
+        return None
+    return described.stdout.strip() or None
+
+
+def report(result: dict[str, Any], as_json: bool) -> None:
+    if as_json:
+        result = dict(
+            result,
+            version=_version(),
+            python=platform.python_version(),
+            cpus=os.cpu_count(),
+        )
+        print(
+            json.dumps({k: None if v != v else v for k, v in result.items()}),
+            flush=True,
+        )
+        return
+    print(
+        f"{result['workload']:>12} {result['clients']:>4} clients"
+        f" {result['done']:>9} done {result['errors']:>5} errors"
+        f" {result['throughput']:>9.0f}/s"
+        f"  p50 {result['p50'] * 1000:7.2f} ms"
+        f"  p99 {result['p99'] * 1000:7.2f} ms"
+        f"  p999 {result['p999'] * 1000:7.2f} ms",
+        flush=True,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="jsonrpcd load generator")
+    parser.add_argument("--url", help="websocket url, default: a local server")
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--workload", choices=WORKLOADS, default="request")
+    parser.add_argument("--rate", type=float, default=2000, help="total, per second")
+    parser.add_argument("--duration", type=float, default=10, help="seconds")
+    parser.add_argument("--room", default="bench")
+    parser.add_argument("--suite", action="store_true", help="every workload")
+    parser.add_argument("--json", action="store_true", help="JSON lines output")
+    args = parser.parse_args()
+    secret = os.getenv("FAN_KEY", "jsonrpcd benchmark, not a secret key")
+    server = None
+    url = args.url
+    if url is None:
+        server, url = start_server(args.room, secret)
+    try:
+        if args.suite:
+            runs = [
+                dict(workload="request", rate=0),
+                dict(workload="request", rate=args.rate),
+                dict(workload="notification", rate=args.rate),
+                dict(workload="broadcast", rate=args.rate / 10),
+            ]
+        else:
+            runs = [dict(workload=args.workload, rate=args.rate)]
+        for options in runs:
+            result = asyncio.run(
+                run(
+                    url,
+                    clients=args.clients,
+                    duration=args.duration,
+                    room=args.room,
+                    secret=secret,
+                    **options,
+                )
+            )
+            report(result, args.json)
+    finally:
+        if server is not None:
+            server.terminate()
+
+
+if __name__ == "__main__":
+    main()
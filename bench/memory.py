@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Memory held by jsonrpcd for each idle connection.
+
+    python -m bench.memory [connections]
+
+An idle connection is an authenticated Session, in a Room, with its User,
+its Outbox and its writer task, and its Handshake snapshot.
+The aiohttp websocket and its transport are not counted.
+"""
+
+import asyncio
+import sys
+import tracemalloc
+from typing import Any
+
+from aiohttp import WSMsgType
+from aiohttp.test_utils import make_mocked_request
+
+from jsonrpcd.rpc.app import App, Request, Room, Session, User
+from jsonrpcd.rpc.outbox import Outbox
+from jsonrpcd.ws.web import Handshake, websocketFrameWriter, websocketWriter
+
+
+class IdleWebsocket:
+    async def send_frame(self, data: bytes, opcode: WSMsgType) -> None:
+        pass
+
+
+def connect(app: App, room: Room, i: int, http_request: Any) -> Session:
+    ws: Any = IdleWebsocket()
+    outbox = Outbox(websocketFrameWriter(ws))
+    session = Session(
+        websocketWriter(ws, app.codec, outbox.put),
+        codec=app.codec,
+        frame_out=outbox.put_event,
+        outbox=outbox,
+    )
+    session["handshake"] = Handshake(http_request)
+    user = User(f"user-{i}")
+    room.adduser(user, session)
+    session.user = user
+    session.authenticate()
+    outbox.start()
+    return session
+
+
+async def main(connections: int = 10_000):
+    app = App()
+    room = Room(app)
+    http_request = make_mocked_request("GET", "/rpc?room=secret_room")
+    # Warm up, lazy imports and caches are not connections
+    connect(app, room, -1, http_request)
+    await asyncio.sleep(0)
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    sessions = [connect(app, room, i, http_request) for i in range(connections)]
+    await asyncio.sleep(0)  # writer tasks are waiting
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    total = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    print(f"{connections} idle connections: {total / connections:.0f} bytes each")
+    session = sessions[0]
+    request = Request(app, session, 1, "hello", ["World"])
+    for label, obj in (
+        ("Session", session),
+        ("User", session.user),
+        ("Outbox", session.outbox),
+        ("Handshake", session["handshake"]),
+        ("Request", request),
+    ):
+        print(f"  {label:<10}{sys.getsizeof(obj):>6} bytes, shallow")
+    for session in sessions:
+        assert session.outbox is not None
+        session.outbox.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(*(int(arg) for arg in sys.argv[1:2])))
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Reconnect storm: after a deploy, every client comes back with its token.
+
+    python -m bench.reconnect [clients] [reconnections]
+
+Compare the Club authentication without cache, with the prepared keys only,
+and with the verified tokens cache, against a plain jwt.decode.
+"""
+
+import logging
+import time
+
+import jwt
+
+from jsonrpcd.fan.club import Club
+from jsonrpcd.rpc.app import App, Session
+from jsonrpcd.rpc.app_test import OutTest
+
+SECRET = "jsonrpcd benchmark, not a secret key"
+
+
+def storm(club: Club, tokens: list[str], reconnections: int) -> float:
+    "Logins per second."
+    start = time.perf_counter()
+    for _ in range(reconnections):
+        for token in tokens:
+            session = Session(OutTest())
+            club.login("storm", token, session)
+            session.close()
+    return len(tokens) * reconnections / (time.perf_counter() - start)
+
+
+def main(clients: int = 5_000, reconnections: int = 5):
+    logging.disable(logging.INFO)
+    now = time.time()
+    tokens = [
+        jwt.encode(dict(login=f"user-{i}", exp=now + 3600), SECRET, algorithm="HS256")
+        for i in range(clients)
+    ]
+    print(f"{clients} clients, {reconnections} reconnections each")
+
+    start = time.perf_counter()
+    for _ in range(reconnections):
+        for token in tokens:
+            jwt.decode(token, SECRET, algorithms=["HS256"])
+    decode = clients * reconnections / (time.perf_counter() - start)
+    print(f"{'jwt.decode only':>22}: {decode:>10.0f} tokens/s")
+
+    for label, cache_size in (("prepared keys", 0), ("verified tokens cache", None)):
+        club = Club(App()) if cache_size is None else Club(App(), cache_size=0)
+        club.register_room("storm", SECRET)
+        rate = storm(club, tokens, reconnections)
+        print(f"{label:>22}: {rate:>10.0f} logins/s")
+
+
+if __name__ == "__main__":
+    import sys
+
+    main(*(int(arg) for arg in sys.argv[1:3]))
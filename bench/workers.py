@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Broadcast throughput by worker count, through the cluster bus.
+
+    python -m bench.workers [events] [sessions]
+
+Every worker holds sessions in the same named room, and broadcasts events.
+Each event reaches every session of every worker. Broadcasts wait for the
+bus, events dropped by a stalled worker are reported.
+"""
+
+import asyncio
+import multiprocessing
+import os
+import tempfile
+import time
+from typing import Any
+
+from jsonrpcd.cluster.bus import BusClient, BusHub
+from jsonrpcd.rpc.app import App, Room, Session, User
+
+TIMEOUT = 60.0  # seconds, for the events of the other workers
+
+
+async def _ignore(message: Any):
+    pass
+
+
+async def _worker(name: str, path: str, workers: int, events: int, sessions: int):
+    app = App()
+    room = Room(app, name="bench")
+    expected = workers * events * sessions
+    received = 0
+
+    async def _sink(data: bytes):
+        nonlocal received
+        received += 1
+
+    for i in range(sessions):
+        user = User(f"{name}-{i}")
+        room.adduser(user)
+        Session(_ignore, user, frame_out=_sink)
+    # Every event of the other workers may wait for its delivery
+    bus = BusClient(app, path, name, backlog=workers * events)
+    await bus.connect()
+    await asyncio.sleep(0.5)  # every worker is connected
+    for i in range(events):
+        await room.broadcast(dict(method="all.tick", params=dict(worker=name, i=i)))
+        if i % 100 == 0:
+            await bus.drain()
+    deadline = time.monotonic() + TIMEOUT
+    # A dropped event is never received by any session
+    while received + bus.dropped * sessions < expected:
+        if time.monotonic() > deadline:
+            print(f"Worker {name} timed out, {received}/{expected} received")
+            break
+        await asyncio.sleep(0.01)
+    if bus.dropped or bus.lost:
+        print(f"Worker {name} dropped {bus.dropped} events, lost {bus.lost} packets")
+    await bus.close()
+
+
+def _process(name: str, path: str, workers: int, events: int, sessions: int):
+    asyncio.run(_worker(name, path, workers, events, sessions))
+
+
+async def run(workers: int, events: int, sessions: int) -> float:
+    path = os.path.join(tempfile.mkdtemp(), "bus.sock")
+    hub = BusHub(path)
+    await hub.start()
+    processes = [
+        multiprocessing.Process(
+            target=_process, args=(str(i), path, workers, events, sessions)
+        )
+        for i in range(workers)
+    ]
+    start = time.perf_counter()
+    for process in processes:
+        process.start()
+    loop = asyncio.get_running_loop()
+    await asyncio.gather(
+        *(loop.run_in_executor(None, process.join) for process in processes)
+    )
+    await hub.close()
+    return time.perf_counter() - start - 0.5
+
+
+def main(events: int = 2_000, sessions: int = 100):
+    if (os.cpu_count() or 1) < 4:
+        print(f"Only {os.cpu_count()} CPU, workers can't scale here")
+    print(f"{events} events per worker, {sessions} sessions per worker")
+    print(f"{'workers':>8}{'seconds':>10}{'deliveries/s':>15}")
+    for workers in (1, 2, 4):
+        duration = asyncio.run(run(workers, events, sessions))
+        deliveries = workers * events * sessions * workers
+        print(f"{workers:>8}{duration:>10.2f}{deliveries / duration:>15.0f}")
+
+
+if __name__ == "__main__":
+    import sys
+
+    main(*(int(arg) for arg in sys.argv[1:3]))
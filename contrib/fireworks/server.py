@@ -6,8 +6,10 @@ from typing import cast
 
 from jsonrpcd.rpc.app import App as RpcApp
 from jsonrpcd.rpc.app import Request
+from jsonrpcd.rpc.quota import Quota
 from jsonrpcd.ws.web import JsonRpcWebHandler
 from jsonrpcd.fan.club import Club, all, close_session
+from jsonrpcd.fan.sse import ClubEventSource
 
 logging.getLogger("asyncio").setLevel(logging.WARNING)
 logging.basicConfig(level=logging.INFO)
@@ -16,7 +18,8 @@ rpc_app = RpcApp()
 club = Club(rpc_app)
 club.register_room("secret_room", os.getenv("FAN_KEY", ""))
 
-rpc_app.namespace("all")(all)
+# A chatty client can't flood the room
+rpc_app.namespace("all", quota=Quota(rate=10, burst=20))(all)
 rpc_app.handler("authenticate", public=True)(club.authenticate)
 
 
@@ -26,6 +29,8 @@ async def hello(request: Request) -> str:
 
 
 ws_app = JsonRpcWebHandler(rpc_app, on_close=close_session)
+# Read-only viewers: /events?room=secret_room&token=…
+sse_app = ClubEventSource(club)
 
 
 async def index(request):
@@ -35,11 +40,13 @@ async def index(request):
 
 routes = web.RouteTableDef()
 routes.get("/rpc")(ws_app)
+routes.get("/events")(sse_app)
 routes.static("/js", "./www-data/js")
 routes.get("/")(index)
 
 app = web.Application()
 app.add_routes(routes)
+app.on_cleanup.append(rpc_app.close)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,261 @@
+from asyncio import Queue, Task, create_task, get_running_loop
+from collections import deque
+import json
+import logging
+import struct
+from typing import Any, Awaitable, Callable
+
+from ..rpc.app import App
+from ..rpc.codec import Frame
+
+logger = logging.getLogger(__name__)
+
+# Packet: header size, body size, JSON header, body (an encoded frame)
+SIZES = struct.Struct(">II")
+
+
+def pack(header: dict[str, Any], body: bytes = b"") -> bytes:
+    raw = json.dumps(header, separators=(",", ":")).encode()
+    return SIZES.pack(len(raw), len(body)) + raw + body
+
+
+def unpack(packet: bytes) -> tuple[dict[str, Any], bytes]:
+    header_size, _ = SIZES.unpack_from(packet)
+    end = SIZES.size + header_size
+    return json.loads(packet[SIZES.size : end]), packet[end:]
+
+
+class RemoteUser:
+    "A user connected to another node, it can only receive events."
+
+    __slots__ = ("login", "_backend", "_nodes")
+
+    def __init__(self, login: str, backend: "Backend", nodes: set[str]) -> None:
+        self.login = login
+        self._backend = backend
+        self._nodes = nodes
+
+    async def unicast(self, message: dict[str, Any]):
+        "Send an event to every session of the user."
+        frame = Frame(message)
+        for node in self._nodes:
+            self._backend.unicast(node, self.login, frame)
+
+
+class Backend:
+    """Share named rooms and users with the other nodes, workers or servers.
+    Room.broadcast, Room.adduser and User.close_session publish through App.bus.
+    Packets published during the same loop iteration are sent in one batch.
+    Received events are delivered to the local sessions by a task for each room,
+    or user: a stalled session doesn't hold the reader, only the next events
+    of its room, and at most backlog of them wait, the oldest are dropped.
+    Subclasses carry the packets: _open, _send and _shutdown."""
+
+    node: str
+    _directory: dict[str, set[str]]  # login -> nodes
+
+    def __init__(self, app: App, node: str, backlog: int = 1024) -> None:
+        self._app = app
+        self.node = node
+        self.backlog = backlog
+        self._deliveries = dict[str, deque[Callable[[], Awaitable[Any]]]]()
+        self._delivering = set[Task]()
+        self.dropped = 0
+        self._directory = dict[str, set[str]]()
+        self._presence = dict[str, dict[str, set[str]]]()  # node -> room -> logins
+        self._pending = list[tuple[str | None, bytes]]()
+        self.published = 0
+        self.batches = 0
+
+    async def connect(self) -> None:
+        await self._open()
+        self._app.bus = self
+        self._publish(dict(type="hello"))
+        self._publish_presence()
+
+    async def close(self) -> None:
+        if self._app.bus is self:
+            self._app.bus = None
+        self._publish(dict(type="bye"))
+        self._flush()
+        for task in self._delivering:
+            task.cancel()
+        await self._shutdown()
+
+    async def drain(self) -> None:
+        "Send the pending packets, and wait until the carrier can take more."
+        self._flush()
+
+    async def _open(self) -> None:
+        raise NotImplementedError()
+
+    def _send(self, packets: list[tuple[str | None, bytes]]) -> None:
+        "Send a batch of (target node or everybody, packet)."
+        raise NotImplementedError()
+
+    async def _shutdown(self) -> None:
+        pass
+
+    def _publish(
+        self, header: dict[str, Any], body: bytes = b"", to: str | None = None
+    ) -> None:
+        header["from"] = self.node
+        if len(self._pending) == 0:
+            get_running_loop().call_soon(self._flush)
+        self._pending.append((to, pack(header, body)))
+
+    def _flush(self) -> None:
+        if len(self._pending) == 0:
+            return
+        packets = self._pending
+        self._pending = list()
+        self.published += len(packets)
+        self.batches += 1
+        try:
+            self._send(packets)
+        except Exception as e:
+            logger.warning(f"Node {self.node} lost {len(packets)} packets: {e!r}")
+
+    def broadcast(self, room: str, frame: Frame, but: str | None = None) -> None:
+        self._publish(
+            dict(type="broadcast", room=room, but=but), frame.encode(self._app.codec)
+        )
+
+    def presence(self, room: str, logins: list[str], joined: bool) -> None:
+        self._publish(dict(type="presence", room=room, logins=logins, joined=joined))
+
+    def unicast(self, node: str, login: str, frame: Frame) -> None:
+        self._publish(
+            dict(type="unicast", to=node, login=login),
+            frame.encode(self._app.codec),
+            to=node,
+        )
+
+    def _publish_presence(self) -> None:
+        for name, room in self._app._rooms.items():
+            if len(room.users):
+                self.presence(name, list(room.users), joined=True)
+
+    def find_user(self, login: str) -> RemoteUser:
+        nodes = self._directory.get(login)
+        if not nodes:
+            raise KeyError(login)
+        return RemoteUser(login, self, nodes)
+
+    async def _receive(self, header: dict[str, Any], body: bytes) -> None:
+        sender = header.get("from")
+        if sender == self.node:
+            return  # pub/sub servers echo
+        kind = header["type"]
+        if kind == "broadcast":
+            room = self._app._rooms.get(header["room"])
+            if room is not None:
+                frame = Frame.from_encoded(body, self._app.codec)
+                self._deliver(
+                    f"room:{header['room']}",
+                    lambda: room.fan_out(frame, header["but"]),
+                )
+        elif kind == "unicast":
+            user = self._app._users.get(header["login"])
+            if user is not None:
+                message = self._app.codec.decode(body)
+                self._deliver(f"user:{user.login}", lambda: user.unicast(message))
+        elif kind == "presence":
+            self._update(sender, header["room"], header["logins"], header["joined"])
+        elif kind == "hello":
+            # A new sibling, tell it who is here
+            self._publish_presence()
+        elif kind == "bye":
+            rooms = self._presence.pop(sender, dict())
+            for logins in rooms.values():
+                self._forget(sender, logins)
+
+    def _deliver(self, key: str, delivery: Callable[[], Awaitable[Any]]) -> None:
+        queue = self._deliveries.get(key)
+        if queue is None:
+            queue = self._deliveries[key] = deque()
+            task = create_task(self._run_deliveries(key, queue))
+            self._delivering.add(task)
+            task.add_done_callback(self._delivering.discard)
+        elif len(queue) >= self.backlog:
+            queue.popleft()
+            self.dropped += 1
+            logger.warning(f"Node {self.node} dropped an event for {key}")
+        queue.append(delivery)
+
+    async def _run_deliveries(self, key: str, queue: deque) -> None:
+        try:
+            while len(queue):
+                try:
+                    await queue.popleft()()
+                except Exception as e:
+                    logger.warning(f"Delivery to {key} failed: {e!r}")
+        finally:
+            del self._deliveries[key]
+
+    async def _receive_packet(self, packet: bytes) -> None:
+        header, body = unpack(packet)
+        try:
+            await self._receive(header, body)
+        except Exception as e:
+            logger.warning(f"Bus packet {header.get('type')} failed: {e!r}")
+
+    def _update(self, node: Any, room: str, logins: list[str], joined: bool) -> None:
+        here = self._presence.setdefault(node, dict()).setdefault(room, set())
+        if joined:
+            here.update(logins)
+            for login in logins:
+                self._directory.setdefault(login, set()).add(node)
+        else:
+            here.difference_update(logins)
+            self._forget(node, logins)
+
+    def _forget(self, node: Any, logins: Any) -> None:
+        for login in logins:
+            nodes = self._directory.get(login)
+            if nodes is None:
+                continue
+            nodes.discard(node)
+            if len(nodes) == 0:
+                del self._directory[login]
+
+
+class MemoryBroker:
+    "In-process pub/sub, the nodes are Apps of the same process."
+
+    def __init__(self) -> None:
+        self._nodes = dict[str, "MemoryBackend"]()
+
+
+class MemoryBackend(Backend):
+    "Backend of the nodes sharing a MemoryBroker, for tests and single process setups."
+
+    def __init__(
+        self, app: App, broker: MemoryBroker, node: str, backlog: int = 1024
+    ) -> None:
+        super().__init__(app, node, backlog)
+        self._broker = broker
+        self._inbox = Queue[bytes]()
+        self._task: Task | None = None
+
+    async def _open(self) -> None:
+        self._broker._nodes[self.node] = self
+        self._task = create_task(self._read())
+
+    async def _shutdown(self) -> None:
+        self._broker._nodes.pop(self.node, None)
+        if self._task is not None:
+            self._task.cancel()
+
+    def _send(self, packets: list[tuple[str | None, bytes]]) -> None:
+        for to, packet in packets:
+            if to is None:
+                for node in self._broker._nodes.values():
+                    if node is not self:
+                        node._inbox.put_nowait(packet)
+            elif to in self._broker._nodes:
+                self._broker._nodes[to]._inbox.put_nowait(packet)
+
+    async def _read(self) -> None:
+        while True:
+            await self._receive_packet(await self._inbox.get())
@@ -0,0 +1,122 @@
+import asyncio
+from typing import Callable
+
+import pytest
+
+from ..rpc.app import App, Room, Session, User
+from ..rpc.app_test import OutTest
+from .backend import Backend, MemoryBackend, MemoryBroker, RemoteUser, pack, unpack
+
+
+def _join(room: Room, login: str) -> OutTest:
+    out = OutTest()
+    user = User(login)
+    room.adduser(user)
+    Session(out, user)
+    return out
+
+
+async def scenario(backend: Callable[[App, str], Backend]) -> None:
+    "Two nodes sharing the lobby room, whatever carries the packets."
+    app_a = App()
+    room_a = Room(app_a, name="lobby")
+    bus_a = backend(app_a, "a")
+    await bus_a.connect()
+    alice = _join(room_a, "alice")
+    await asyncio.sleep(0.05)
+    app_b = App()
+    room_b = Room(app_b, name="lobby")
+    bus_b = backend(app_b, "b")
+    await bus_b.connect()
+    bob = _join(room_b, "bob")
+    await asyncio.sleep(0.05)
+
+    for i in range(10):
+        await room_a.broadcast(dict(method="tick", params=[i]))
+    await asyncio.sleep(0.05)
+    assert [m["params"][0] for m in bob.messages] == list(range(10))
+    assert len(alice.messages) == 10
+
+    remote = app_a.find_user("bob")
+    assert isinstance(remote, RemoteUser)
+    await remote.unicast(dict(method="psst", params=[]))
+    assert isinstance(app_b.find_user("alice"), RemoteUser)
+    await asyncio.sleep(0.05)
+    assert bob.messages[-1] == dict(method="psst", params=[])
+
+    await bus_b.close()
+    await asyncio.sleep(0.05)
+    with pytest.raises(KeyError):
+        app_a.find_user("bob")
+    await bus_a.close()
+
+
+def testPack():
+    header, body = unpack(pack(dict(type="broadcast", room="lobby"), b"{}"))
+    assert header == dict(type="broadcast", room="lobby")
+    assert body == b"{}"
+
+
+@pytest.mark.asyncio
+async def testMemoryBackend():
+    broker = MemoryBroker()
+    await scenario(lambda app, node: MemoryBackend(app, broker, node))
+    assert len(broker._nodes) == 0
+
+
+@pytest.mark.asyncio
+async def testBatch():
+    app = App()
+    room = Room(app, name="lobby")
+    bus = MemoryBackend(app, MemoryBroker(), "a")
+    await bus.connect()
+    await asyncio.sleep(0)
+    batches = bus.batches
+    for i in range(10):
+        await room.broadcast(dict(method="tick", params=[i]))
+    await asyncio.sleep(0)
+    assert bus.batches == batches + 1
+    await bus.close()
+
+
+class Stalled:
+    "A session output which never drains."
+
+    async def __call__(self, message):
+        await asyncio.Event().wait()
+
+
+async def stalled_scenario(backend: Callable[[App, str], Backend]) -> None:
+    "A stalled session doesn't hold the events of the other rooms."
+    app_a, app_b = App(), App()
+    slow_a = Room(app_a, name="slow")
+    fast_a = Room(app_a, name="fast")
+    slow_b = Room(app_b, name="slow")
+    fast_b = Room(app_b, name="fast")
+    bus_a = backend(app_a, "a")
+    bus_b = backend(app_b, "b")
+    bus_b.backlog = 2
+    await bus_a.connect()
+    await bus_b.connect()
+    stalled = User("stalled")
+    slow_b.adduser(stalled)
+    Session(Stalled(), stalled)
+    bob = _join(fast_b, "bob")
+    _join(slow_a, "alice")
+    await asyncio.sleep(0.05)
+
+    for i in range(5):
+        await slow_a.broadcast(dict(method="tick", params=[i]))
+    await fast_a.broadcast(dict(method="tock", params=[]))
+    await asyncio.sleep(0.05)
+    assert bob.messages == [dict(method="tock", params=[])]
+    # One event is stalled, two wait, the oldest ones are dropped
+    assert bus_b.dropped == 2
+    await bus_a.close()
+    await bus_b.close()
+
+
+@pytest.mark.asyncio
+async def testStalledSubscriber():
+    broker = MemoryBroker()
+    await stalled_scenario(lambda app, node: MemoryBackend(app, broker, node))
@@ -0,0 +1,136 @@
+from asyncio import (
+    IncompleteReadError,
+    StreamReader,
+    StreamWriter,
+    Task,
+    create_task,
+    open_unix_connection,
+    start_unix_server,
+)
+import logging
+from typing import Any
+
+from ..rpc.app import App
+from .backend import SIZES, Backend, RemoteUser, pack, unpack
+
+__all__ = ["BusClient", "BusHub", "RemoteUser"]
+
+logger = logging.getLogger(__name__)
+
+
+async def _drain(writer: StreamWriter) -> None:
+    try:
+        await writer.drain()
+    except ConnectionError:
+        pass  # its own reader says goodbye
+
+
+class BusHub:
+    """Relay packets between the workers, over a Unix socket.
+    It runs in the launcher process, bodies are never decoded.
+    Unicasts go to their worker, everything else to all the other workers.
+    A worker is not read while the ones it writes to are not drained."""
+
+    def __init__(self, path: str) -> None:
+        self._path = path
+        self._workers = dict[str, StreamWriter]()
+        self._server: Any = None
+
+    async def start(self) -> None:
+        self._server = await start_unix_server(self._client, self._path)
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def _client(self, reader: StreamReader, writer: StreamWriter) -> None:
+        worker: str | None = None
+        try:
+            while True:
+                sizes = await reader.readexactly(SIZES.size)
+                header_size, body_size = SIZES.unpack(sizes)
+                packet = sizes + await reader.readexactly(header_size + body_size)
+                header, _ = unpack(packet[: SIZES.size + header_size])
+                if header["type"] == "hello":
+                    worker = str(header["from"])
+                    self._workers[worker] = writer
+                target = header.get("to")
+                if target is not None:
+                    targets = [self._workers[target]] if target in self._workers else []
+                else:
+                    targets = [w for w in self._workers.values() if w is not writer]
+                for sibling in targets:
+                    sibling.write(packet)
+                for sibling in targets:
+                    await _drain(sibling)
+        except (IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            if worker is not None and self._workers.get(worker) is writer:
+                del self._workers[worker]
+                # The worker may have died without a word
+                bye = pack(dict(type="bye", **{"from": worker}))
+                for sibling in self._workers.values():
+                    sibling.write(bye)
+            writer.close()
+
+
+class BusClient(Backend):
+    """A worker connected to the hub of its launcher.
+    At most limit bytes wait to be written to the hub, more packets are lost,
+    drain() waits for them instead."""
+
+    def __init__(
+        self,
+        app: App,
+        path: str,
+        worker: str,
+        backlog: int = 1024,
+        limit: int = 16 * 1024 * 1024,
+    ) -> None:
+        super().__init__(app, worker, backlog)
+        self._path = path
+        self.limit = limit
+        self.lost = 0
+        self._writer: StreamWriter | None = None
+        self._task: Task | None = None
+
+    @property
+    def worker(self) -> str:
+        return self.node
+
+    async def _open(self) -> None:
+        reader, self._writer = await open_unix_connection(self._path)
+        self._task = create_task(self._read(reader))
+
+    async def _shutdown(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+        if self._writer is not None:
+            self._writer.close()
+
+    def _send(self, packets: list[tuple[str | None, bytes]]) -> None:
+        # One write for the batch
+        if self._writer is None or self._writer.is_closing():
+            return
+        if self._writer.transport.get_write_buffer_size() > self.limit:
+            self.lost += len(packets)
+            logger.warning(f"Worker {self.node} lost {len(packets)} packets")
+            return
+        self._writer.write(b"".join(packet for _, packet in packets))
+
+    async def drain(self) -> None:
+        await super().drain()
+        if self._writer is not None and not self._writer.is_closing():
+            await self._writer.drain()
+
+    async def _read(self, reader: StreamReader) -> None:
+        try:
+            while True:
+                sizes = await reader.readexactly(SIZES.size)
+                header_size, body_size = SIZES.unpack(sizes)
+                packet = sizes + await reader.readexactly(header_size + body_size)
+                await self._receive_packet(packet)
+        except (IncompleteReadError, ConnectionError):
+            logger.warning(f"Worker {self.node} lost the bus")
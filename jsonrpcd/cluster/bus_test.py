@@ -0,0 +1,95 @@
+import asyncio
+import os
+import tempfile
+
+import pytest
+
+from ..rpc.app import App, Room, Session, User
+from ..rpc.app_test import OutTest
+from .bus import BusClient, BusHub, RemoteUser
+
+
+async def _worker(name: str, path: str) -> tuple[App, Room, BusClient]:
+    app = App()
+    room = Room(app, name="lobby")
+    bus = BusClient(app, path, name)
+    await bus.connect()
+    return app, room, bus
+
+
+def _join(room: Room, login: str) -> OutTest:
+    out = OutTest()
+    user = User(login)
+    room.adduser(user)
+    Session(out, user)
+    return out
+
+
+@pytest.mark.asyncio
+async def testBus():
+    path = os.path.join(tempfile.mkdtemp(), "bus.sock")
+    hub = BusHub(path)
+    await hub.start()
+    app_a, room_a, bus_a = await _worker("a", path)
+    alice = _join(room_a, "alice")
+    await asyncio.sleep(0.05)
+    # Late worker, it learns who is already here
+    app_b, room_b, bus_b = await _worker("b", path)
+    bob = _join(room_b, "bob")
+    charly = _join(room_b, "charly")
+    await asyncio.sleep(0.05)
+
+    fan_out = await room_a.broadcast(dict(method="hello", params=[]), but="charly")
+    assert fan_out.sessions == 1
+    await asyncio.sleep(0.05)
+    assert alice.messages == [dict(method="hello", params=[])]
+    assert bob.messages == [dict(method="hello", params=[])]
+    assert charly.messages == []
+
+    assert app_a.find_user("alice") is room_a.users["alice"]
+    remote = app_a.find_user("bob")
+    assert isinstance(remote, RemoteUser)
+    await remote.unicast(dict(method="psst", params=[]))
+    remote_alice = app_b.find_user("alice")
+    assert isinstance(remote_alice, RemoteUser)
+    await asyncio.sleep(0.05)
+    assert bob.messages[-1] == dict(method="psst", params=[])
+    assert len(charly.messages) == 0
+
+    # bob leaves, then worker b stops
+    bob_user = room_b.users["bob"]
+    bob_user.close_session(next(iter(bob_user.sessions)))
+    await asyncio.sleep(0.05)
+    with pytest.raises(KeyError):
+        app_a.find_user("bob")
+    app_a.find_user("charly")
+    await bus_b.close()
+    await asyncio.sleep(0.05)
+    with pytest.raises(KeyError):
+        app_a.find_user("charly")
+
+    await bus_a.close()
+    await hub.close()
+
+
+@pytest.mark.asyncio
+async def testBusFlowControl():
+    path = os.path.join(tempfile.mkdtemp(), "bus.sock")
+    hub = BusHub(path)
+    await hub.start()
+    app_a, room_a, bus_a = await _worker("a", path)
+    bus_a.limit = 256 * 1024
+    app_b, room_b, bus_b = await _worker("b", path)
+    await asyncio.sleep(0.05)
+    assert bus_b._task is not None
+    bus_b._task.cancel()  # a stalled worker, it doesn't read the bus
+    payload = "x" * 10_000
+    for i in range(2_000):
+        await room_a.broadcast(dict(method="tick", params=[payload]))
+        await asyncio.sleep(0)
+    # The hub doesn't buffer for the stalled worker, the sender loses packets
+    assert hub._workers["b"].transport.get_write_buffer_size() < 1024 * 1024
+    assert bus_a.lost > 0
+    await bus_a.close()
+    await bus_b.close()
+    await hub.close()
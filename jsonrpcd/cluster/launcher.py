@@ -0,0 +1,91 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import signal
+import tempfile
+from typing import Callable
+
+from aiohttp import web
+
+from ..rpc.app import App
+from .bus import BusClient, BusHub
+
+logger = logging.getLogger(__name__)
+
+Factory = Callable[[], tuple[web.Application, App]]
+
+
+async def serve(
+    factory: Factory, worker: str, bus_path: str, host: str, port: int
+) -> None:
+    "One worker: its own loop, its own App, the listening port is shared."
+    web_app, rpc_app = factory()
+    bus = BusClient(rpc_app, bus_path, worker)
+    await bus.connect()
+    runner = web.AppRunner(web_app)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port, reuse_port=True)
+    await site.start()
+    logger.info(f"Worker {worker} ({os.getpid()}) listening on {host}:{port}")
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop.set)
+    try:
+        await stop.wait()
+    finally:
+        await bus.close()
+        await runner.cleanup()
+
+
+def _worker(factory: Factory, worker: str, bus_path: str, host: str, port: int):
+    asyncio.run(serve(factory, worker, bus_path, host, port))
+
+
+async def launch(
+    factory: Factory, workers: int, host: str, port: int, bus_path: str
+) -> None:
+    hub = BusHub(bus_path)
+    await hub.start()
+    processes = [
+        multiprocessing.Process(
+            target=_worker, args=(factory, str(i), bus_path, host, port), daemon=True
+        )
+        for i in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    loop = asyncio.get_running_loop()
+    stop = asyncio.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop.set)
+    exits = [loop.run_in_executor(None, process.join) for process in processes]
+    # Stop everything when one worker dies, or when asked to
+    await asyncio.wait(
+        [asyncio.ensure_future(stop.wait()), *exits],
+        return_when=asyncio.FIRST_COMPLETED,
+    )
+    for process in processes:
+        if process.is_alive():
+            process.terminate()
+    await asyncio.gather(*exits)
+    await hub.close()
+
+
+def run_workers(
+    factory: Factory,
+    workers: int | None = None,
+    host: str = "0.0.0.0",
+    port: int = 8080,
+    bus_path: str | None = None,
+) -> None:
+    """Run the application in several processes, sharing the port (SO_REUSEPORT).
+    The factory, a module level function, builds the aiohttp and the json-rpc
+    applications of each worker. Workers share named rooms and users through
+    a bus over a Unix socket."""
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if bus_path is None:
+        bus_path = os.path.join(tempfile.mkdtemp(prefix="jsonrpcd-"), "bus.sock")
+    asyncio.run(launch(factory, workers, host, port, bus_path))
@@ -0,0 +1,132 @@
+from asyncio import (
+    IncompleteReadError,
+    StreamReader,
+    StreamWriter,
+    Task,
+    create_task,
+    open_connection,
+)
+import logging
+from typing import Any
+
+from ..rpc.app import App
+from .backend import Backend
+
+logger = logging.getLogger(__name__)
+
+
+class RedisError(Exception):
+    "An error reply."
+
+    pass
+
+
+def command(*args: str | bytes) -> bytes:
+    "A command, in RESP."
+    chunks = [b"*%d\r\n" % len(args)]
+    for arg in args:
+        if isinstance(arg, str):
+            arg = arg.encode()
+        chunks.append(b"$%d\r\n%b\r\n" % (len(arg), arg))
+    return b"".join(chunks)
+
+
+async def read_reply(reader: StreamReader) -> Any:
+    "Read one RESP reply, error replies are raised."
+    line = await reader.readline()
+    if not line:
+        raise ConnectionError("Connection closed by the server")
+    kind, rest = line[:1], line[1:-2]
+    if kind == b"+":
+        return rest.decode()
+    if kind == b"-":
+        raise RedisError(rest.decode())
+    if kind == b":":
+        return int(rest)
+    if kind == b"$":
+        size = int(rest)
+        if size < 0:
+            return None
+        return (await reader.readexactly(size + 2))[:-2]
+    if kind == b"*":
+        size = int(rest)
+        if size < 0:
+            return None
+        return [await read_reply(reader) for _ in range(size)]
+    raise RedisError(f"Unknown reply: {line!r}")
+
+
+class RedisBackend(Backend):
+    """Nodes on different hosts, sharing a Redis server (or anything speaking
+    its protocol) with PUBLISH and SUBSCRIBE.
+    Everybody listens to the prefix channel, unicasts go to prefix:node.
+    Batches are pipelined: one write, replies are read later.
+    A node which dies without its bye stays in the directory of the others."""
+
+    def __init__(
+        self,
+        app: App,
+        node: str,
+        host: str = "127.0.0.1",
+        port: int = 6379,
+        prefix: str = "jsonrpcd",
+        backlog: int = 1024,
+    ) -> None:
+        super().__init__(app, node, backlog)
+        self._host = host
+        self._port = port
+        self._prefix = prefix
+        self._writer: StreamWriter | None = None
+        self._subscriber: StreamWriter | None = None
+        self._tasks = list[Task]()
+
+    def _channel(self, node: str | None) -> str:
+        return self._prefix if node is None else f"{self._prefix}:{node}"
+
+    async def _open(self) -> None:
+        reader, self._subscriber = await open_connection(self._host, self._port)
+        self._subscriber.write(
+            command("SUBSCRIBE", self._channel(None), self._channel(self.node))
+        )
+        for _ in range(2):
+            await read_reply(reader)  # subscribe confirmations
+        self._tasks.append(create_task(self._read(reader)))
+        replies, self._writer = await open_connection(self._host, self._port)
+        self._tasks.append(create_task(self._drain(replies)))
+
+    async def _shutdown(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        for writer in (self._writer, self._subscriber):
+            if writer is not None:
+                writer.close()
+
+    def _send(self, packets: list[tuple[str | None, bytes]]) -> None:
+        if self._writer is None or self._writer.is_closing():
+            raise ConnectionError("Not connected")
+        self._writer.write(
+            b"".join(
+                command("PUBLISH", self._channel(to), packet) for to, packet in packets
+            )
+        )
+
+    async def _drain(self, reader: StreamReader) -> None:
+        "Replies of the pipelined PUBLISH."
+        try:
+            while True:
+                try:
+                    await read_reply(reader)
+                except RedisError as e:
+                    logger.warning(f"Node {self.node} publish failed: {e}")
+        except (IncompleteReadError, ConnectionError):
+            logger.warning(f"Node {self.node} lost its publisher connection")
+
+    async def _read(self, reader: StreamReader) -> None:
+        try:
+            while True:
+                reply = await read_reply(reader)
+                if isinstance(reply, list) and len(reply) == 3:
+                    if reply[0] == b"message":
+                        await self._receive_packet(reply[2])
+        except (IncompleteReadError, ConnectionError):
+            logger.warning(f"Node {self.node} lost its subscriber connection")
@@ -0,0 +1,72 @@
+from asyncio import IncompleteReadError, StreamReader, StreamWriter, start_server
+
+import pytest
+
+from .backend_test import scenario, stalled_scenario
+from .redis import RedisBackend, RedisError, command, read_reply
+
+
+class StandIn:
+    "The PUBLISH and SUBSCRIBE part of a Redis server."
+
+    def __init__(self) -> None:
+        self._channels = dict[bytes, set[StreamWriter]]()
+        self.published = 0
+
+    async def start(self) -> int:
+        self._server = await start_server(self._client, "127.0.0.1", 0)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def close(self) -> None:
+        self._server.close()
+
+    async def _client(self, reader: StreamReader, writer: StreamWriter) -> None:
+        try:
+            while True:
+                name, *args = await read_reply(reader)
+                name = name.upper()
+                if name == b"SUBSCRIBE":
+                    for i, channel in enumerate(args):
+                        self._channels.setdefault(channel, set()).add(writer)
+                        writer.write(command("subscribe", channel) + b":%d\r\n" % i)
+                elif name == b"PUBLISH":
+                    self.published += 1
+                    subscribers = self._channels.get(args[0], set())
+                    for subscriber in subscribers:
+                        subscriber.write(command("message", *args))
+                    writer.write(b":%d\r\n" % len(subscribers))
+                else:
+                    writer.write(b"-ERR unknown command\r\n")
+        except (IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            for subscribers in self._channels.values():
+                subscribers.discard(writer)
+            writer.close()
+
+
+@pytest.mark.asyncio
+async def testRedisBackend():
+    server = StandIn()
+    port = await server.start()
+    await scenario(lambda app, node: RedisBackend(app, node, port=port))
+    assert server.published > 10
+    await server.close()
+
+
+@pytest.mark.asyncio
+async def testRedisStalledSubscriber():
+    server = StandIn()
+    port = await server.start()
+    await stalled_scenario(lambda app, node: RedisBackend(app, node, port=port))
+    await server.close()
+
+
+@pytest.mark.asyncio
+async def testReadReply():
+    reader = StreamReader()
+    reader.feed_data(b"*2\r\n$5\r\nhello\r\n:42\r\n$-1\r\n-ERR nope\r\n")
+    assert await read_reply(reader) == [b"hello", 42]
+    assert await read_reply(reader) is None
+    with pytest.raises(RedisError):
+        await read_reply(reader)
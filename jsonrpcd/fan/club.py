@@ -1,41 +1,155 @@
-from typing import Any, cast
+from collections import OrderedDict
+import hashlib
+import hmac
+import json
+from typing import Any, Sequence, cast
 import logging
+import time
 
 import jwt
+from jwt.utils import base64url_decode
 
 from ..rpc.app import App, Request, Room, User, Session
 
 
 logger = logging.getLogger(__name__)
 
+# The signature is checked with the prepared keys, pyjwt checks the claims
+_CLAIMS = dict(
+    verify_signature=False, verify_exp=True, verify_nbf=True, verify_iat=True
+)
+
+
+class TokenCache:
+    """Verified tokens, bounded by size and by their expiry.
+    A reconnect storm presents the same tokens again, they are verified once."""
+
+    def __init__(self, size: int = 10_000, ttl: float = 300.0) -> None:
+        """Tokens without exp are trusted again for ttl seconds."""
+        self.size = size
+        self.ttl = ttl
+        self._tokens = OrderedDict[tuple[str, str], tuple[float, dict[str, Any]]]()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._tokens)
+
+    def get(self, room: str, token: str) -> dict[str, Any] | None:
+        key = (room, token)
+        entry = self._tokens.get(key)
+        if entry is None or entry[0] <= time.time():
+            if entry is not None:
+                del self._tokens[key]
+            self.misses += 1
+            return None
+        self._tokens.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(
+        self, room: str, token: str, meta: dict[str, Any], leeway: float = 0
+    ) -> None:
+        if self.size <= 0:
+            return
+        expires = time.time() + self.ttl
+        if "exp" in meta:
+            expires = min(expires, float(meta["exp"]) + leeway)
+        self._tokens[(room, token)] = (expires, meta)
+        self._tokens.move_to_end((room, token))
+        if len(self._tokens) > self.size:
+            self._tokens.popitem(last=False)
+
+    def forget(self, room: str) -> None:
+        "Tokens of the room must be verified again."
+        for key in [key for key in self._tokens if key[0] == room]:
+            del self._tokens[key]
+
+
+def prepare_key(secret: str | bytes) -> Any:
+    "HS256 key, its HMAC state is computed once."
+    key = secret.encode() if isinstance(secret, str) else secret
+    if len(key) == 0:
+        raise jwt.InvalidKeyError("HMAC key must not be empty.")
+    return hmac.new(key, digestmod=hashlib.sha256)
+
 
 class Club:
-    def __init__(self, app: App):
+    def __init__(
+        self,
+        app: App,
+        cache_size: int = 10_000,
+        cache_ttl: float = 300.0,
+        leeway: float = 0,
+    ):
+        """Verified tokens are cached, cache_size 0 disables the cache.
+        leeway is the clock skew, in seconds, accepted for exp and nbf."""
         self._app = app
         self._rooms = dict[str, Room]()
-        self._secrets = dict[str, str]()
+        self._keys = dict[str, list[Any]]()
+        self._jwt = jwt.PyJWT()
+        self.tokens = TokenCache(cache_size, cache_ttl)
+        self.leeway = leeway
 
-    def register_room(self, name: str, secret: str):
-        "Create a new room, with its secret."
-        room = Room(self._app)
+    def register_room(self, name: str, secret: str | Sequence[str]):
+        """Create a new room, with its secret.
+        Several secrets are all accepted, the newest first."""
+        room = Room(self._app, name=name)
         self._rooms[name] = room
-        self._secrets[name] = secret
+        secrets = [secret] if isinstance(secret, str) else list(secret)
+        self._keys[name] = [prepare_key(s) for s in secrets]
+
+    def rotate(self, name: str, secret: str, keep: int = 2):
+        """A new secret for the room, the previous ones are kept until keep
+        secrets are active. Tokens are verified again."""
+        self._keys[name] = [prepare_key(secret), *self._keys[name][: keep - 1]]
+        self.tokens.forget(name)
+
+    def verify(self, room_name: str, token: str) -> dict[str, Any]:
+        "Claims of a valid token, or raise a jwt.InvalidTokenError."
+        meta = self.tokens.get(room_name, token)
+        if meta is not None:
+            return meta
+        keys = self._keys[room_name]
+        try:
+            signing_input, signature = token.encode().rsplit(b".", 1)
+            header = json.loads(base64url_decode(signing_input.split(b".", 1)[0]))
+            signature = base64url_decode(signature)
+        except Exception as e:
+            raise jwt.DecodeError(f"Invalid token: {e}")
+        if not isinstance(header, dict) or header.get("alg") != "HS256":
+            raise jwt.InvalidAlgorithmError("The specified alg value is not allowed")
+        for key in keys:
+            mac = key.copy()
+            mac.update(signing_input)
+            if hmac.compare_digest(mac.digest(), signature):
+                break
+        else:
+            raise jwt.InvalidSignatureError("Signature verification failed")
+        meta = self._jwt.decode(token, options=_CLAIMS, leeway=self.leeway)  # type: ignore
+        self.tokens.put(room_name, token, meta, self.leeway)
+        return meta
 
     async def authenticate(self, request: Request):
         params = cast(dict[str, str], request.params)
-        room_name = params["room"]
+        self.login(params["room"], params["token"], request.session)
 
+    def login(self, room_name: str, token: str, session: Session) -> User:
+        """Check the token, and add the session to the room.
+        Sessions of the same login share their User."""
         room: Room = self._rooms[room_name]
-        secret: str = self._secrets[room_name]
-        meta: dict[str, Any] = jwt.decode(params["token"], secret, algorithms=["HS256"])
+        meta: dict[str, Any] = self.verify(room_name, token)
 
-        user = User(meta["login"])
+        user = room.users.get(meta["login"])
+        if user is None:
+            user = User(meta["login"])
         user["meta"] = meta
-        room.adduser(user, request.session)
-        request.session.user = user
-        request.session.authenticate()
+        room.adduser(user, session)
+        session.user = user
+        session.authenticate()
         logger.info(f"authenticate: {user.login}")
         logger.info(f"room '{room_name}' has {len(room)} users.")
+        return user
 
 
 def close_session(session: Session):
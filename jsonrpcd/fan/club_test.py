@@ -1,4 +1,6 @@
 import asyncio
+import time
+
 import jwt
 import pytest
 
@@ -56,3 +58,57 @@ async def testClub():
         message = outs[name].messages[0]
         assert message["method"] == "all.hello"
         print(name, outs[name].messages)
+
+
+def testTokenCache():
+    club = Club(App())
+    club.register_room("harry", "potter")
+    token = jwt.encode({"login": "hermione"}, "potter", algorithm="HS256")
+    for _ in range(3):
+        club.login("harry", token, Session(OutTest()))
+    assert club.tokens.misses == 1
+    assert club.tokens.hits == 2
+
+    with pytest.raises(jwt.InvalidSignatureError):
+        club.verify("harry", jwt.encode({"login": "draco"}, "x", algorithm="HS256"))
+    with pytest.raises(jwt.InvalidAlgorithmError):
+        club.verify("harry", jwt.encode({"login": "draco"}, None, algorithm="none"))
+    with pytest.raises(jwt.DecodeError):
+        club.verify("harry", "garbage")
+
+
+def testTokenExpiry(monkeypatch: pytest.MonkeyPatch):
+    club = Club(App())
+    club.register_room("harry", "potter")
+    now = time.time()
+    with pytest.raises(jwt.ExpiredSignatureError):
+        club.verify(
+            "harry",
+            jwt.encode({"login": "ron", "exp": now - 10}, "potter", algorithm="HS256"),
+        )
+    with pytest.raises(jwt.ImmatureSignatureError):
+        club.verify(
+            "harry",
+            jwt.encode({"login": "ron", "nbf": now + 60}, "potter", algorithm="HS256"),
+        )
+    token = jwt.encode({"login": "ron", "exp": now + 60}, "potter", algorithm="HS256")
+    club.verify("harry", token)
+    club.verify("harry", token)
+    assert club.tokens.hits == 1
+    # The cached token expires with the token
+    monkeypatch.setattr(time, "time", lambda: now + 120)
+    assert club.tokens.get("harry", token) is None
+    assert len(club.tokens) == 0
+
+
+def testKeyRotation():
+    club = Club(App())
+    club.register_room("harry", ["potter", "granger"])
+    old = jwt.encode({"login": "ron"}, "granger", algorithm="HS256")
+    assert club.verify("harry", old)["login"] == "ron"
+    club.rotate("harry", "weasley", keep=2)
+    # granger is gone, potter is still accepted
+    with pytest.raises(jwt.InvalidSignatureError):
+        club.verify("harry", old)
+    club.verify("harry", jwt.encode({"login": "ron"}, "potter", algorithm="HS256"))
+    club.verify("harry", jwt.encode({"login": "ron"}, "weasley", algorithm="HS256"))
@@ -0,0 +1,94 @@
+from typing import Any
+import logging
+
+import jwt
+from aiohttp import web
+from aiohttp_sse import EventSourceResponse
+
+from ..rpc.app import Session
+from ..rpc.codec import Codec, default_codec
+from ..rpc.outbox import Outbox, Overflow
+from .club import Club
+
+logger = logging.getLogger(__name__)
+
+
+def sseFrameWriter(sse: EventSourceResponse):
+    """Write encoded messages as server-sent events.
+    The JSON is already encoded, and shared with the websocket subscribers,
+    it is just framed."""
+
+    async def _out(data: bytes) -> None:
+        await sse.write(b"data: " + data + b"\n\n")
+
+    return _out
+
+
+class ClubEventSource:
+    """aiohttp web handler, a receive-only subscriber of a Club room,
+    with server-sent events.
+    EventSource can't set headers, the room and the token are in the query string:
+
+        /events?room=secret_room&token=…
+    """
+
+    _club: Club
+    _codec: Codec | None
+
+    def __init__(
+        self,
+        club: Club,
+        codec: Codec | None = None,
+        outbox_size: int = 256,
+        overflow: Overflow | str = Overflow.DROP_OLDEST,
+    ):
+        """The codec defaults to the App one, or to the standard json when the
+        App one is binary: events are text."""
+        if codec is not None and codec.binary:
+            raise ValueError(f"Server-sent events are text, not {codec.name}")
+        self._club = club
+        self._codec = codec
+        self._outbox_size = outbox_size
+        self._overflow = Overflow(overflow)
+
+    async def __call__(self, request: web.Request) -> web.StreamResponse:
+        try:
+            room, token = request.query["room"], request.query["token"]
+        except KeyError as e:
+            raise web.HTTPBadRequest(text=f"Missing parameter: {e}")
+        admission = self._club._app.admission
+        if admission is not None:
+            admission.check_connection()
+        codec = self._codec
+        if codec is None:
+            codec = self._club._app.codec
+            if codec.binary:
+                codec = default_codec
+        sse = EventSourceResponse()
+        outbox = Outbox(
+            sseFrameWriter(sse),
+            maxsize=self._outbox_size,
+            overflow=self._overflow,
+        )
+
+        async def _out(message: Any) -> None:
+            await outbox.put(codec.encode(message))
+
+        session = Session(_out, codec=codec, frame_out=outbox.put_event, outbox=outbox)
+        try:
+            self._club.login(room, token, session)
+        except (KeyError, jwt.InvalidTokenError) as e:
+            logger.info(f"SSE subscriber rejected: {e!r}")
+            raise web.HTTPForbidden()
+        metrics = self._club._app.metrics
+        metrics.open(session)
+        try:
+            await sse.prepare(request)
+            outbox.start()
+            await sse.wait()  # until the client leaves
+        finally:
+            metrics.close(session)
+            outbox.close()
+            sse.stop_streaming()
+            session.close()
+        return sse
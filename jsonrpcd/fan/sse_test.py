@@ -0,0 +1,76 @@
+import asyncio
+import json
+
+import jwt
+import pytest
+from aiohttp import ClientSession, web
+from aiohttp.test_utils import TestServer
+
+from ..rpc.app import App, Session
+from ..rpc.app_test import CountingCodec, OutTest
+from ..rpc.codec import available_codecs, get_codec
+from .club import Club
+from .sse import ClubEventSource
+
+
+@pytest.mark.asyncio
+async def testEventSource():
+    codec = CountingCodec()
+    app = App(codec=codec)
+    club = Club(app)
+    club.register_room("harry", "potter")
+    room = club._rooms["harry"]
+    web_app = web.Application()
+    web_app.router.add_get("/events", ClubEventSource(club))
+
+    # A websocket like subscriber, in the same room
+    frames = list[bytes]()
+
+    async def _frame_out(data: bytes):
+        frames.append(data)
+
+    ws_session = Session(OutTest(), codec=codec, frame_out=_frame_out)
+    club.login("harry", jwt.encode({"login": "ron"}, "potter"), ws_session)
+
+    async with TestServer(web_app) as server, ClientSession() as client:
+        url = server.make_url("/events")
+        async with client.get(url, params=dict(room="harry", token="nope")) as resp:
+            assert resp.status == 403
+        async with client.get(url, params=dict(room="harry")) as resp:
+            assert resp.status == 400
+
+        token = jwt.encode({"login": "hermione"}, "potter")
+        async with client.get(url, params=dict(room="harry", token=token)) as resp:
+            assert resp.status == 200
+            assert resp.content_type == "text/event-stream"
+            assert set(room.users) == {"ron", "hermione"}
+            await room.broadcast(dict(method="all.hello", params=["Everyone"]))
+            line = await asyncio.wait_for(resp.content.readline(), 1)
+            assert line.startswith(b"data: ")
+            assert json.loads(line[6:]) == dict(method="all.hello", params=["Everyone"])
+        assert codec.encoded == 1  # shared by the websocket and the event source
+        assert frames == [line[6:].strip()]
+
+        await asyncio.sleep(0.1)
+        assert set(room.users) == {"ron"}  # hermione leaves the room
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("name", available_codecs(binary=True))
+async def testEventSourceBinaryApp(name: str):
+    with pytest.raises(ValueError):
+        ClubEventSource(Club(App()), codec=get_codec(name))
+    app = App(codec=get_codec(name))
+    club = Club(app)
+    club.register_room("harry", "potter")
+    web_app = web.Application()
+    web_app.router.add_get("/events", ClubEventSource(club))
+    async with TestServer(web_app) as server, ClientSession() as client:
+        token = jwt.encode({"login": "hermione"}, "potter")
+        async with client.get(
+            server.make_url("/events"), params=dict(room="harry", token=token)
+        ) as resp:
+            assert resp.status == 200
+            await club._rooms["harry"].broadcast(dict(method="tick", params=[1]))
+            line = await asyncio.wait_for(resp.content.readline(), 1)
+            assert json.loads(line[6:]) == dict(method="tick", params=[1])
@@ -0,0 +1,21 @@
+from aiohttp import web
+
+from ..rpc.app import App
+
+
+class MetricsHandler:
+    """aiohttp web handler, the App metrics in the Prometheus text format.
+
+    routes.get("/metrics")(MetricsHandler(app))
+    """
+
+    _app: App
+
+    def __init__(self, app: App) -> None:
+        self._app = app
+
+    async def __call__(self, request: web.Request) -> web.Response:
+        return web.Response(
+            body=self._app.metrics.render().encode(),
+            headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"},
+        )
@@ -0,0 +1,118 @@
+from typing import Any, Callable
+import logging
+
+from aiohttp import web
+
+from ..rpc.app import App, Session
+from ..rpc.codec import Codec
+from ..rpc.json_rpc import JsonRpcRequestException, checkup
+
+logger = logging.getLogger(__name__)
+
+
+def _ids(message: Any) -> set[Any]:
+    "Ids of the calls of a request, or of a batch."
+    messages = message if isinstance(message, list) else [message]
+    return {
+        m.get("id")
+        for m in messages
+        if isinstance(m, dict) and isinstance(m.get("id"), (str, int, float))
+    }
+
+
+class Collector:
+    """Session output, responses to the calls of the request are kept for the
+    HTTP response, events and everything else are dropped.
+    Invalid calls are answered with a null id."""
+
+    __slots__ = ("responses", "ids")
+
+    def __init__(self) -> None:
+        self.responses: dict[str, Any] | list[dict[str, Any]] | None = None
+        self.ids = set[Any]()
+
+    def _wanted(self, message: Any) -> bool:
+        if not isinstance(message, dict):
+            return False
+        if "result" in message:
+            return message.get("id") in self.ids
+        if "error" in message:
+            id_ = message.get("id")
+            return id_ is None or id_ in self.ids
+        return False
+
+    async def __call__(self, message: dict[str, Any] | list[dict[str, Any]]):
+        if isinstance(message, list):
+            responses = [m for m in message if self._wanted(m)]
+            if len(responses):
+                self.responses = responses
+        elif self._wanted(message):
+            self.responses = message
+
+
+class JsonRpcPostHandler:
+    """aiohttp web handler, JSON-RPC over HTTP POST.
+    Each HTTP request gets its own short lived Session, there is no server call,
+    and no event, streamed results are sent as lists.
+    Notifications are answered with a 204, an overloaded App with a 503."""
+
+    _app: App
+    _codec: Codec
+
+    def __init__(
+        self, app: App, init: None | Callable = None, codec: Codec | None = None
+    ):
+        """Init async function is called for each HTTP request.
+        It is used to add information to the session, or to authenticate it,
+        with a header for example.
+        The codec defaults to the App one."""
+        self._app = app
+        self._init = init
+        self._codec = app.codec if codec is None else codec
+
+    async def __call__(self, request: web.Request) -> web.Response:
+        admission = self._app.admission
+        if admission is not None:
+            admission.check_connection()
+        collector = Collector()
+        session = Session(collector, codec=self._codec)
+        session.streaming = False  # one response, streamed results are lists
+        session["http-request"] = request
+        try:
+            message = self._codec.decode(await request.read())
+        except Exception as e:
+            return self._response(
+                dict(
+                    jsonrpc="2.0",
+                    id=None,
+                    error=dict(code=-32700, message="Parse error", data=str(e)),
+                )
+            )
+        collector.ids = _ids(message)
+        if self._init is not None:
+            await self._init(session)
+        if isinstance(message, list) and len(message):
+            await self._app._handle_batch(session, message)
+        else:
+            try:
+                if not isinstance(message, dict):
+                    raise JsonRpcRequestException("Request must be an object")
+                checkup(message)
+            except JsonRpcRequestException as e:
+                return self._response(
+                    dict(
+                        jsonrpc="2.0",
+                        id=None,
+                        error=dict(code=-32600, message="Invalid Request", data=str(e)),
+                    )
+                )
+            await self._app._handle(session, message)
+        if collector.responses is None:
+            # Only notifications
+            return web.Response(status=204)
+        return self._response(collector.responses)
+
+    def _response(self, payload: Any) -> web.Response:
+        return web.Response(
+            body=self._codec.encode(payload), content_type=self._codec.media_type
+        )
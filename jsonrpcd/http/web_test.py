@@ -0,0 +1,167 @@
+import json
+from typing import cast
+
+import pytest
+from aiohttp import ClientSession, web
+from aiohttp.test_utils import TestServer
+
+from ..rpc.admission import Admission
+from ..rpc.app import App, Request, Session
+from ..rpc.codec import available_codecs, get_codec
+from .metrics import MetricsHandler
+from .web import JsonRpcPostHandler
+
+
+@pytest.fixture
+def app():
+    _app = App()
+
+    @_app.handler("hello")
+    async def hello(request: Request) -> str:
+        return f"Hello {cast(list[str], request.params)[0]}"
+
+    return _app
+
+
+async def _authenticate(session: Session):
+    request = cast(web.Request, session["http-request"])
+    if request.headers.get("Authorization") == "Bearer s3cr3t":
+        session.authenticate()
+
+
+@pytest.mark.asyncio
+async def testPost(app: App):
+    web_app = web.Application()
+    web_app.router.add_post("/rpc", JsonRpcPostHandler(app, init=_authenticate))
+    headers = {"Authorization": "Bearer s3cr3t"}
+    async with TestServer(web_app) as server, ClientSession() as client:
+        url = server.make_url("/rpc")
+
+        async with client.post(
+            url, json=dict(jsonrpc="2.0", id=1, method="hello", params=["World"])
+        ) as resp:
+            assert (await resp.json())["error"]["message"].endswith(
+                "needs authentication"
+            )
+
+        async with client.post(
+            url,
+            headers=headers,
+            json=dict(jsonrpc="2.0", id=1, method="hello", params=["World"]),
+        ) as resp:
+            assert resp.status == 200
+            assert resp.content_type == "application/json"
+            assert (await resp.json())["result"] == "Hello World"
+
+        async with client.post(
+            url,
+            headers=headers,
+            json=[
+                dict(jsonrpc="2.0", id=1, method="hello", params=["Alice"]),
+                dict(jsonrpc="2.0", method="hello", params=["nobody"]),
+                dict(jsonrpc="2.0", id=2, method="hello", params=["Bob"]),
+            ],
+        ) as resp:
+            batch = await resp.json()
+            assert [r["result"] for r in batch] == ["Hello Alice", "Hello Bob"]
+
+        async with client.post(
+            url,
+            headers=headers,
+            json=dict(jsonrpc="2.0", method="hello", params=["nobody"]),
+        ) as resp:
+            assert resp.status == 204
+
+        async with client.post(url, data="{oups") as resp:
+            assert (await resp.json())["error"]["code"] == -32700
+
+        for body in ([], 42, dict(id=1, method="hello")):
+            async with client.post(url, data=json.dumps(body)) as resp:
+                assert (await resp.json())["error"]["code"] == -32600
+
+
+@pytest.mark.asyncio
+async def testMetrics(app: App):
+    web_app = web.Application()
+    web_app.router.add_post("/rpc", JsonRpcPostHandler(app, init=_authenticate))
+    web_app.router.add_get("/metrics", MetricsHandler(app))
+    async with TestServer(web_app) as server, ClientSession() as client:
+        async with client.post(
+            server.make_url("/rpc"),
+            headers={"Authorization": "Bearer s3cr3t"},
+            json=dict(jsonrpc="2.0", id=1, method="hello", params=["World"]),
+        ) as resp:
+            assert resp.status == 200
+        async with client.get(server.make_url("/metrics")) as resp:
+            assert resp.content_type == "text/plain"
+            text = await resp.text()
+    assert 'jsonrpc_requests_total{method="hello",namespace="",code="0"} 1' in text
+    assert 'jsonrpc_handler_seconds_count{method="hello",namespace=""} 1' in text
+
+
+@pytest.mark.asyncio
+async def testPostEvents():
+    app = App()
+
+    @app.handler("tick", public=True)
+    async def tick(request: Request) -> str:
+        # An event, and a stray response, are not the HTTP response
+        await request.session.send_message(dict(jsonrpc="2.0", method="tick"))
+        await request.session.send_message(dict(jsonrpc="2.0", id=99, result=0))
+        return "tock"
+
+    web_app = web.Application()
+    web_app.router.add_post("/rpc", JsonRpcPostHandler(app))
+    async with TestServer(web_app) as server, ClientSession() as client:
+        url = server.make_url("/rpc")
+        async with client.post(
+            url, json=dict(jsonrpc="2.0", id=1, method="tick")
+        ) as resp:
+            assert await resp.json() == dict(jsonrpc="2.0", id=1, result="tock")
+        async with client.post(
+            url,
+            json=[dict(jsonrpc="2.0", id=1, method="tick"), dict(jsonrpc="2.0")],
+        ) as resp:
+            batch = await resp.json()
+            assert [r.get("result") for r in batch] == ["tock", None]
+            assert batch[1]["id"] is None
+        async with client.post(url, json=dict(jsonrpc="2.0", method="tick")) as resp:
+            assert resp.status == 204
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("name", available_codecs(binary=True))
+async def testPostMediaType(name: str):
+    app = App()
+
+    @app.function("add", public=True)
+    async def add(a: int, b: int) -> int:
+        return a + b
+
+    codec = get_codec(name)
+    web_app = web.Application()
+    web_app.router.add_post("/rpc", JsonRpcPostHandler(app, codec=codec))
+    async with TestServer(web_app) as server, ClientSession() as client:
+        async with client.post(
+            server.make_url("/rpc"),
+            data=codec.encode(dict(jsonrpc="2.0", id=1, method="add", params=[1, 2])),
+        ) as resp:
+            assert resp.content_type == f"application/{name}"
+            assert codec.decode(await resp.read())["result"] == 3
+
+
+@pytest.mark.asyncio
+async def testPostOverloaded():
+    admission = Admission()
+    web_app = web.Application()
+    web_app.router.add_post("/rpc", JsonRpcPostHandler(App(admission=admission)))
+    async with TestServer(web_app) as server, ClientSession() as client:
+        admission.overloaded = True
+        async with client.post(
+            server.make_url("/rpc"),
+            json=dict(jsonrpc="2.0", id=1, method="nope"),
+        ) as resp:
+            assert resp.status == 503
+            assert resp.headers["Retry-After"] == "1"
+    assert admission.rejected_connections == 1
+    admission.stop()
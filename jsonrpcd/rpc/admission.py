@@ -0,0 +1,129 @@
+from asyncio import Task, get_running_loop, sleep
+from enum import IntEnum
+import logging
+import math
+import time
+from typing import Any
+
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+OVERLOADED = -32053  # like HTTP 503
+
+
+class Priority(IntEnum):
+    "The priority option of a registration."
+
+    LOW = 0  # shed first
+    NORMAL = 1
+    HIGH = 2  # never shed
+
+
+class Overloaded(Exception):
+    "The server sheds load, retry later."
+
+    def __init__(self, retry_after: float) -> None:
+        self.retry_after = retry_after
+        super().__init__("Server overloaded")
+
+
+class Admission:
+    """Load shedding, from the event loop lag and the calls in flight.
+    Past max_lag or max_in_flight, the server is overloaded: calls of a priority
+    under shed are rejected, and so are new connections. It is back to normal
+    once both are under resume times their threshold for cooldown seconds,
+    it doesn't flap."""
+
+    def __init__(
+        self,
+        max_lag: float = 0.1,
+        max_in_flight: int = 10_000,
+        shed: Priority | int = Priority.LOW,
+        resume: float = 0.5,
+        cooldown: float = 1.0,
+        interval: float = 0.05,
+    ) -> None:
+        self.max_lag = max_lag
+        self.max_in_flight = max_in_flight
+        self.shed = shed
+        self.resume = resume
+        self.cooldown = cooldown
+        self.interval = interval
+        self.lag = 0.0  # seconds, smoothed
+        self.in_flight = 0
+        self.overloaded = False
+        self.rejected_calls = 0
+        self.rejected_connections = 0
+        self._calm_since: float | None = None
+        self._task: Task | None = None
+
+    def start(self) -> None:
+        "Watch the loop lag, once there is a running loop."
+        if self._task is None or self._task.done():
+            self._task = get_running_loop().create_task(self._watch())
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _watch(self) -> None:
+        while True:
+            start = time.monotonic()
+            await sleep(self.interval)
+            lag = max(0.0, time.monotonic() - start - self.interval)
+            self.lag = 0.7 * self.lag + 0.3 * lag
+            self._update(time.monotonic())
+
+    def _update(self, now: float) -> None:
+        if self.lag > self.max_lag or self.in_flight > self.max_in_flight:
+            if not self.overloaded:
+                logger.warning(
+                    f"Overloaded: lag {self.lag * 1000:.1f} ms,"
+                    f" {self.in_flight} calls in flight"
+                )
+            self.overloaded = True
+            self._calm_since = None
+        elif self.overloaded:
+            if (
+                self.lag > self.max_lag * self.resume
+                or self.in_flight > self.max_in_flight * self.resume
+            ):
+                self._calm_since = None
+            elif self._calm_since is None:
+                self._calm_since = now
+            elif now - self._calm_since >= self.cooldown:
+                self.overloaded = False
+                self._calm_since = None
+                logger.warning("Back to normal")
+
+    def admit(self, options: dict[str, Any]) -> None:
+        "A call, raise Overloaded when its priority is shed."
+        if self._task is None:
+            self.start()
+        if self.in_flight > self.max_in_flight:
+            self._update(time.monotonic())
+        if not self.overloaded:
+            return
+        priority = options.get("priority", Priority.NORMAL)
+        if priority <= self.shed and priority < Priority.HIGH:
+            self.rejected_calls += 1
+            raise Overloaded(self.cooldown)
+
+    def accepting(self) -> bool:
+        "A new connection, False when it must be turned away."
+        if self._task is None:
+            self.start()
+        if self.overloaded:
+            self.rejected_connections += 1
+            return False
+        return True
+
+    def check_connection(self) -> None:
+        """A new connection, or a new HTTP call, turned away with a 503 when
+        overloaded, before any work is done for it."""
+        if not self.accepting():
+            raise web.HTTPServiceUnavailable(
+                headers={"Retry-After": str(math.ceil(self.cooldown))}
+            )
@@ -0,0 +1,101 @@
+import asyncio
+
+from aiohttp import ClientSession, web
+from aiohttp.test_utils import TestServer
+import pytest
+
+from ..ws.web import JsonRpcWebHandler
+from .admission import OVERLOADED, Admission, Priority
+from .app import App, Request, Session
+from .app_test import OutTest
+
+
+def testHysteresis():
+    admission = Admission(max_lag=0.1, resume=0.5, cooldown=1.0)
+    admission.lag = 0.2
+    admission._update(0.0)
+    assert admission.overloaded
+    # Under the threshold, but not under the resume level
+    admission.lag = 0.08
+    admission._update(1.0)
+    admission._update(5.0)
+    assert admission.overloaded
+    # Calm, for a while
+    admission.lag = 0.01
+    admission._update(6.0)
+    admission._update(6.5)
+    assert admission.overloaded
+    admission._update(7.0)
+    assert not admission.overloaded
+
+
+@pytest.mark.asyncio
+async def testShedding():
+    admission = Admission(max_in_flight=2)
+    app = App(admission=admission)
+    done = asyncio.Event()
+
+    @app.handler("slow", public=True)
+    async def slow(request: Request) -> str:
+        await done.wait()
+        return "done"
+
+    @app.handler("report", public=True, priority="low")
+    async def report(request: Request) -> str:
+        return "report"
+
+    @app.handler("health", public=True, priority=Priority.HIGH)
+    async def health(request: Request) -> str:
+        return "ok"
+
+    out = OutTest()
+    session = Session(out)
+    calls = [
+        asyncio.create_task(
+            app._handle(session, dict(jsonrpc="2.0", id=i, method="slow"))
+        )
+        for i in range(3)
+    ]
+    await asyncio.sleep(0)
+    assert admission.in_flight == 3
+    await app._handle(session, dict(jsonrpc="2.0", id=4, method="report"))
+    await app._handle(session, dict(jsonrpc="2.0", id=5, method="health"))
+    assert out.messages[0]["error"]["code"] == OVERLOADED
+    assert out.messages[1]["result"] == "ok"
+    done.set()
+    await asyncio.gather(*calls)
+    assert admission.in_flight == 0
+    assert admission.rejected_calls == 1
+    admission.stop()
+
+
+@pytest.mark.asyncio
+async def testConnection():
+    admission = Admission()
+    app = App(admission=admission)
+    web_app = web.Application()
+    web_app.add_routes([web.get("/ws", JsonRpcWebHandler(app))])
+    async with TestServer(web_app) as server, ClientSession() as client:
+        admission.overloaded = True
+        async with client.get(server.make_url("/ws")) as resp:
+            assert resp.status == 503
+            assert resp.headers["Retry-After"] == "1"
+        admission.overloaded = False
+        async with client.ws_connect(server.make_url("/ws")) as ws:
+            await ws.send_json(dict(jsonrpc="2.0", id=1, method="nope"))
+            assert (await ws.receive_json())["error"]["code"] == -32601
+    assert admission.rejected_connections == 1
+    assert "jsonrpc_shed_total" in app.metrics.render()
+    admission.stop()
+
+
+@pytest.mark.asyncio
+async def testCheckConnection():
+    admission = Admission()
+    admission.check_connection()
+    admission.overloaded = True
+    with pytest.raises(web.HTTPServiceUnavailable) as e:
+        admission.check_connection()
+    assert e.value.headers["Retry-After"] == "1"
+    assert admission.rejected_connections == 1
+    admission.stop()
@@ -1,16 +1,63 @@
-import json
+from asyncio import (
+    FIRST_COMPLETED,
+    CancelledError,
+    Future,
+    gather,
+    get_running_loop,
+    timeout_at,
+    wait,
+    wait_for,
+)
+import inspect
 import logging
-from typing import Any, AsyncGenerator, Awaitable, Callable, MutableMapping
+import math
+import time
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncGenerator,
+    Awaitable,
+    Callable,
+    MutableMapping,
+    NamedTuple,
+)
 import traceback
 import sys
 
+from .admission import OVERLOADED, Admission, Overloaded, Priority
+from .cache import ResultCache
+from .codec import Codec, Frame, default_codec
 from .dispatcher import Dispatcher, MethodNotFoundException
+from .json_rpc import JsonRpcRequestException, checkup
+from .metrics import AppMetrics
+from .outbox import Outbox
+from .params import Binder, InvalidParams
+from .pool import Pool, Pools
+from .quota import QUOTA_EXCEEDED, Buckets, Quota, Quotas, QuotaExceeded
+
+if TYPE_CHECKING:
+    from ..cluster.backend import Backend, RemoteUser
 
 MessageIn = AsyncGenerator[dict[str, Any], None]
-MessageOut = Callable[[dict[str, Any]], Awaitable[None]]
+MessageOut = Callable[[dict[str, Any] | list[dict[str, Any]]], Awaitable[None]]
+FrameOut = Callable[[bytes], Awaitable[None]]
 
 logger = logging.getLogger(__name__)
 
+PARTIAL_RESULT = "$/partialResult"  # a chunk of a streamed result
+CANCEL_REQUEST = "$/cancelRequest"  # the client gives up a call
+REQUEST_CANCELLED = -32800
+DEADLINE_EXCEEDED = -32008  # like HTTP 408
+
+
+def _seconds(value: Any) -> bool:
+    "A timeout, a finite number of seconds, more than 0, not a bool."
+    return (
+        isinstance(value, (int, float))
+        and not isinstance(value, bool)
+        and 0 < value < math.inf  # NaN too
+    )
+
 
 class Bounced(Exception):
     "Authenticate first."
@@ -18,24 +65,55 @@ class Bounced(Exception):
     pass
 
 
+class DeadlineExceeded(Exception):
+    "The call took longer than its timeout."
+
+    pass
+
+
+class CallError(Exception):
+    "The client answered a server call with an error."
+
+    def __init__(self, error: dict[str, Any]) -> None:
+        self.error = error
+        super().__init__(error.get("message"))
+
+    @property
+    def code(self) -> int | None:
+        return self.error.get("code")
+
+
 class Store(MutableMapping[str, Any]):
+    """Key value store, the dict is created on first write.
+    Stores are slotted, thousands of sessions are idle most of the time."""
+
+    __slots__ = ("_store",)
+
+    _store: dict[str, Any] | None
+
     def __init__(self) -> None:
         super().__init__()
-        self._store = dict[str, Any]()
+        self._store = None
 
     def __iter__(self):
-        return iter(self._store)
+        return iter(() if self._store is None else self._store)
 
     def __len__(self) -> int:
-        return len(self._store)
+        return 0 if self._store is None else len(self._store)
 
     def __delitem__(self, key: str) -> None:
+        if self._store is None:
+            raise KeyError(key)
         del self._store[key]
 
     def __setitem__(self, key: str, value: Any) -> None:
+        if self._store is None:
+            self._store = dict[str, Any]()
         self._store[key] = value
 
     def __getitem__(self, key: str, /) -> Any:
+        if self._store is None:
+            raise KeyError(key)
         return self._store[key]
 
     def __hash__(self) -> int:
@@ -46,24 +124,56 @@ class Session(Store):
     """Websocket Session.
     Client connects and establish a connection."""
 
+    __slots__ = (
+        "_user",
+        "authenticated",
+        "_out",
+        "_room",
+        "_frame_out",
+        "codec",
+        "outbox",
+        "_calls",
+        "_last_call_id",
+        "streaming",
+    )
+
     _user: "User | None"
     authenticated: bool
     _out: MessageOut
     _room: "Room | None"
+    _frame_out: FrameOut | None
+    codec: Codec
+    outbox: Outbox | None
+    _calls: dict[int, Future] | None
+    _last_call_id: int
+    streaming: bool
 
     def __init__(
         self,
         message_out: MessageOut,
         user: "User | None" = None,
+        codec: Codec | None = None,
+        frame_out: FrameOut | None = None,
+        outbox: Outbox | None = None,
     ) -> None:
+        """frame_out writes already encoded messages,
+        without it, frames are written as messages.
+        The outbox, if any, is the queue behind the writers.
+        Streamed results are sent chunk by chunk to streaming sessions."""
         super().__init__()
+        self.streaming = True
         self.authenticated = False
         if user is None:
             self._user = None
         else:
             self.user = user
         self._out = message_out
+        self._frame_out = frame_out
+        self.outbox = outbox
+        self._calls = None  # pending server calls, created by the first one
+        self._last_call_id = 0
         self._room = None
+        self.codec = default_codec if codec is None else codec
 
     @property
     def user(self) -> "User | None":
@@ -86,7 +196,15 @@ class Session(Store):
         """
         Write a message to the wire, something like a websocket.
         Used when sending events to the client."""
-        await self._out(message)
+        await self.send_frame(Frame(message))
+
+    async def send_frame(self, frame: Frame):
+        """Write a shared frame, encoded once for every session using the same codec.
+        Used by broadcasts."""
+        if self._frame_out is None:
+            await self._out(frame.message)
+        else:
+            await self._frame_out(frame.encode(self.codec))
 
     def close(self):
         assert self.user is not None
@@ -95,10 +213,67 @@ class Session(Store):
         logger.info(f"session closed: {self.user.login}")
 
     async def unicast(self, message: dict[str, Any]):
-        raise NotImplementedError()
+        "Send an event to this session."
+        assert message.get("id") is None  # it's an event
+        await self.send_message(message)
+
+    async def call(
+        self,
+        method: str,
+        params: dict[str, Any] | list[Any] | None = None,
+        timeout: float | None = 30.0,
+    ) -> Any:
+        """Call a method of the client, and wait for its result.
+        A client error is raised as CallError, TimeoutError after timeout seconds,
+        ConnectionError if the session is closed first.
+        The response is read by the websocket loop, even when the session is busy,
+        unless its backlog is full."""
+        if self._calls is None:
+            self._calls = dict[int, Future]()
+        self._last_call_id += 1
+        id_ = self._last_call_id
+        future = get_running_loop().create_future()
+        self._calls[id_] = future
+        message: dict[str, Any] = dict(jsonrpc="2.0", id=id_, method=method)
+        if params is not None:
+            message["params"] = params
+        try:
+            await self._out(message)
+            return await wait_for(future, timeout)
+        except TimeoutError:
+            raise TimeoutError(
+                f"No response to '{method}' after {timeout} seconds"
+            ) from None
+        finally:
+            self._calls.pop(id_, None)
+
+    def resolve(self, response: dict[str, Any]) -> bool:
+        "A response to a server call is received, False if nobody waits for it."
+        if self._calls is None:
+            return False
+        future = self._calls.pop(response.get("id"), None)  # type: ignore
+        if future is None or future.done():
+            logger.info(f"Unexpected response: {response.get('id')}")
+            return False
+        if "error" in response:
+            future.set_exception(CallError(response["error"]))
+        else:
+            future.set_result(response.get("result"))
+        return True
+
+    def cancel_calls(self) -> None:
+        "The session is over, pending server calls fail."
+        if self._calls is None:
+            return
+        for future in self._calls.values():
+            if not future.done():
+                future.set_exception(ConnectionError("Session closed"))
+        self._calls.clear()
 
 
 class User(Store):
+    __slots__ = ("_room", "sessions", "context", "login")
+
     _room: "Room"
     sessions: set[Session]
     context: dict[str, Any]
@@ -123,29 +298,99 @@ class User(Store):
         if len(self.sessions) == 0:
             # user leaves the room
             del self._room.users[self.login]
+            app = self._room.app
+            if app._users.get(self.login) is self:
+                del app._users[self.login]
+            if app.bus is not None and self._room.name is not None:
+                app.bus.presence(self._room.name, [self.login], joined=False)
             logger.info(f"User {self.login} leaves the room")
 
     async def unicast(self, message: dict[str, Any]):
-        for session in self.sessions:
-            # FIXME handle function, not just event
-            await session.unicast(message)
+        "Send an event to every session of the user."
+        await gather(*(session.unicast(message) for session in self.sessions))
+
+    async def call_any(
+        self,
+        method: str,
+        params: dict[str, Any] | list[Any] | None = None,
+        timeout: float | None = 30.0,
+    ) -> Any:
+        """Call the method on all the sessions of the user, the first result wins,
+        other calls are cancelled. Raise the last error if every session fails."""
+        if len(self.sessions) == 0:
+            raise ConnectionError(f"User {self.login} has no session")
+        pending = set(
+            get_running_loop().create_task(session.call(method, params, timeout))
+            for session in self.sessions
+        )
+        error: BaseException | None = None
+        try:
+            while len(pending):
+                done, pending = await wait(pending, return_when=FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+        finally:
+            for task in pending:
+                task.cancel()
+        assert error is not None
+        raise error
+
+    async def call_all(
+        self,
+        method: str,
+        params: dict[str, Any] | list[Any] | None = None,
+        timeout: float | None = 30.0,
+    ) -> list[Any]:
+        "Call the method on all the sessions of the user, errors are returned."
+        return await gather(
+            *(session.call(method, params, timeout) for session in self.sessions),
+            return_exceptions=True,
+        )
+
+
+class FanOut(NamedTuple):
+    "Report of a broadcast."
+
+    sessions: int
+    failed: int
+    duration: float  # seconds
 
 
 class Room(Store):
+    __slots__ = ("_app", "_users", "send_timeout", "name")
+
     _app: "App"
     _users: dict[str, User]
+    send_timeout: float | None
+    name: str | None
 
-    def __init__(self, app: "App") -> None:
+    def __init__(
+        self,
+        app: "App",
+        send_timeout: float | None = 10.0,
+        name: str | None = None,
+    ) -> None:
+        """A session stalled for send_timeout seconds is given up by broadcasts.
+        Named rooms are shared with the other nodes, through the App bus."""
         super().__init__()
         self._app = app
         self._users = dict[str, User]()
+        self.send_timeout = send_timeout
+        self.name = name
+        if name is not None:
+            app._rooms[name] = self
 
     def adduser(self, user: User, session: Session | None = None):
+        joined = user.login not in self._users
         self._users[user.login] = user
         self._app._users[user.login] = user
         if session is not None:
             session._room = self
         user._room = self
+        if joined and self._app.bus is not None and self.name is not None:
+            self._app.bus.presence(self.name, [user.login], joined=True)
         logger.info(f"User {user.login} added to the room")
 
     @property
@@ -156,16 +401,65 @@ class Room(Store):
     def app(self):
         return self._app
 
-    async def broadcast(self, message: dict[str, Any], but: str | None = None):
+    @property
+    def codec(self) -> Codec:
+        return self._app.codec
+
+    async def broadcast(
+        self, message: dict[str, Any], but: str | None = None
+    ) -> FanOut:
+        """Send an event to every session of the room, but one user.
+        The event is encoded once, and written to all the sessions concurrently.
+        The sibling workers get it too, the report is about the local sessions."""
         assert message.get("id") is None  # it's an event
+        frame = Frame(message)
+        start = time.perf_counter()
+        frame.encode(self._app.codec)
+        self._app.metrics.encoded_events.observe(time.perf_counter() - start)
+        if self._app.bus is not None and self.name is not None:
+            self._app.bus.broadcast(self.name, frame, but)
+        return await self.fan_out(frame, but)
+
+    async def fan_out(self, frame: Frame, but: str | None = None) -> FanOut:
+        "Write the frame to the local sessions of the room, but one user."
+        start = time.perf_counter()
         users = set[str]()
+        sessions = list[Session]()
         for user in self._users.values():
             if user.login == but:
                 continue
             users.add(user.login)
-            for session in user.sessions:
-                await session.send_message(message)
-        logger.info(f"Broadcast '{message['method']}' to {', '.join(users)}")
+            sessions.extend(user.sessions)
+        delivered = await gather(
+            *(self._deliver(session, frame) for session in sessions)
+        )
+        fan_out = FanOut(
+            sessions=len(sessions),
+            failed=delivered.count(False),
+            duration=time.perf_counter() - start,
+        )
+        room = "" if self.name is None else self.name
+        self._app.metrics.fan_out.observe(fan_out.duration, room)
+        if fan_out.failed:
+            self._app.metrics.fan_out_failed.inc(room, amount=fan_out.failed)
+        logger.info(
+            f"Broadcast '{frame.message['method']}' to {', '.join(users)}"
+            f" ({fan_out.sessions} sessions, {fan_out.failed} failed)"
+            f" in {fan_out.duration * 1000:.3f} ms",
+            extra=dict(fan_out=fan_out),
+        )
+        return fan_out
+
+    async def _deliver(self, session: Session, frame: Frame) -> bool:
+        # One broken or stalled session must not fail the others.
+        try:
+            await wait_for(session.send_frame(frame), self.send_timeout)
+        except Exception as e:
+            logger.warning(
+                f"Broadcast to a session failed: {e!r}", extra=dict(session=session)
+            )
+            return False
+        return True
 
     def __len__(self) -> int:
         return len(self._users)
@@ -176,84 +470,412 @@ class App(Store):
     App has Users and registered Methods.
     """
 
-    _handlers: Dispatcher[Callable[["Request"], Awaitable[Any]]]
+    _handlers: Dispatcher[Callable[..., Awaitable[Any]]]
     _users: dict[str, User]
+    _rooms: dict[str, Room]
+    codec: Codec
+    bus: "Backend | None"
+    metrics: AppMetrics
+    _caches: dict[str, ResultCache]
+    quotas: Quotas
+    admission: Admission | None
+    pools: Pools
+    timeout: float | None
 
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        codec: Codec | None = None,
+        quotas: Quotas | None = None,
+        admission: Admission | None = None,
+        pools: Pools | None = None,
+        timeout: float | None = None,
+    ) -> None:
+        """quotas limit the calls of each user and of each room,
+        method quotas are registration options.
+        admission sheds load when the server is overloaded.
+        pools run the sync handlers, with the executor option.
+        timeout is the default one of the calls, in seconds."""
         super().__init__()
-        self._handlers = Dispatcher[Callable[["Request"], Awaitable[Any]]]()
+        self._handlers = Dispatcher[Callable[..., Awaitable[Any]]]()
         self._users = dict()
+        self._rooms = dict()
+        self.codec = default_codec if codec is None else codec
+        self.bus = None  # set by a cluster backend
+        self._caches = dict[str, ResultCache]()
+        self.quotas = Quotas() if quotas is None else quotas
+        self.admission = admission
+        if timeout is not None and not _seconds(timeout):
+            raise ValueError(
+                f"timeout must be a positive number of seconds, not {timeout!r}"
+            )
+        self.timeout = timeout
+        self.pools = Pools() if pools is None else pools
+        self.metrics = AppMetrics()
+        for pool in self.pools:
+            pool.observe = self.metrics.pool_wait.labels(pool.name).observe
+        self.metrics.collect(self._collect)
+
+    def _collect(self) -> None:
+        self.metrics.room_users.clear()
+        for name, room in self._rooms.items():
+            self.metrics.room_users.set(len(room), name)
+        for method, cache in self._caches.items():
+            self.metrics.cache.labels(method, "hit").set(cache.hits)
+            self.metrics.cache.labels(method, "miss").set(cache.misses)
+            self.metrics.cache.labels(method, "coalesced").set(cache.coalesced)
+        for pool in self.pools:
+            self.metrics.pool_queued.set(pool.queued, pool.name)
+        for scope, rejected in self.quotas.rejected.items():
+            self.metrics.quota_rejected.labels(scope).set(rejected)
+        if self.admission is not None:
+            self.metrics.loop_lag.set(self.admission.lag)
+            self.metrics.in_flight.set(self.admission.in_flight)
+            self.metrics.overloaded.set(int(self.admission.overloaded))
+            self.metrics.shed.labels("call").set(self.admission.rejected_calls)
+            self.metrics.shed.labels("connection").set(
+                self.admission.rejected_connections
+            )
+
+    async def close(self, _: Any = None) -> None:
+        """Stop the admission control, and shut the executors down.
+        Its owner calls it, with aiohttp: web_app.on_cleanup.append(app.close)"""
+        if self.admission is not None:
+            self.admission.stop()
+        self.pools.shutdown()
 
     def add_user(self, user: User):
         self._users[user.login] = user
 
-    def find_user(self, login: str) -> User:
-        return self._users[login]
-
-    def handler(self, method: str, public: bool = False):
+    def find_user(self, login: str) -> "User | RemoteUser":
+        "Local users first, then the ones held by sibling workers."
+        try:
+            return self._users[login]
+        except KeyError:
+            if self.bus is None:
+                raise
+            return self.bus.find_user(login)
+
+    def _options(
+        self, method: str, options: dict[str, Any], public: bool = False
+    ) -> dict[str, Any]:
+        """Registration options.
+        cache: a ResultCache, or its TTL in seconds, not for a streamed result.
+        quota: a Quota, for each user, not for a public method, anonymous
+        callers have no user.
+        cost: tokens taken from the quotas by a call, 1 by default, at most
+        the burst of each quota.
+        priority: a Priority, or its name, the low ones are shed first.
+        executor: "thread", "process" or a Pool, for a sync function.
+        timeout: seconds, None for no timeout, the App one by default."""
+        timeout = options.get("timeout")
+        if timeout is not None and not _seconds(timeout):
+            raise ValueError(
+                f"timeout must be a positive number of seconds, not {timeout!r}"
+            )
+        executor = options.get("executor")
+        if executor is not None:
+            options["executor"] = self.pools.get(executor)
+        priority = options.get("priority")
+        if isinstance(priority, str):
+            options["priority"] = Priority[priority.upper()]
+        quota = options.get("quota")
+        if quota is not None and public:
+            raise ValueError(f"{method} is public, a quota can't apply to it")
+        if isinstance(quota, Quota):
+            options["quota"] = Buckets(quota)
+        self.quotas.validate(options.get("cost", 1), options.get("quota"))
+        cache = options.get("cache")
+        if cache is not None:
+            if not isinstance(cache, ResultCache):
+                cache = options["cache"] = ResultCache(ttl=float(cache))
+            self._caches[method] = cache
+        return options
+
+    def _wrap(
+        self, function: Callable, options: dict[str, Any], handler: bool = True
+    ) -> Callable:
+        """Adapt the function: an async generator streams its result,
+        a sync function with an executor option runs in its pool."""
+        pool: Pool | None = options.get("executor")
+        if pool is not None and (
+            inspect.iscoroutinefunction(function)
+            or inspect.isasyncgenfunction(function)
+        ):
+            raise ValueError("An executor runs sync functions, not async ones")
+        if inspect.isasyncgenfunction(function):
+            if options.get("cache") is not None:
+                raise ValueError("A streamed result can't be cached")
+            options["stream"] = True
+            return function
+        if pool is None:
+            return function
+        if handler and pool is self.pools.process:
+            raise ValueError("A process pool runs functions, not Request handlers")
+
+        async def offloaded(*args, **kwargs) -> Any:
+            return await pool.run(function, *args, **kwargs)
+
+        return offloaded
+
+    def handler(self, method: str, public: bool = False, **options):
         "Decorator appending an handler to the application"
 
         def decorator(
             function: Callable[["Request"], Awaitable[Any]],
         ) -> None:
-            if public:
-                self._handlers.put_handler(method, _anonymous(function))
-            else:
-                self._handlers.put_handler(method, function)
+            opts = self._options(method, options, public)
+            self._handlers.put_handler(
+                method, self._wrap(function, opts), public, options=opts
+            )
 
         return decorator
 
-    def namespace(self, ns: str, public: bool = False):
+    def namespace(self, ns: str, public: bool = False, **options):
         "Decorator appending an namespace to the application"
 
         def decorator(function: Callable[["Request"], Awaitable[Any]]) -> None:
-            if public:
-                self._handlers.put_namespace(ns, _anonymous(function))
-            else:
-                self._handlers.put_namespace(ns, function)
+            opts = self._options(ns, options, public)
+            self._handlers.put_namespace(
+                ns, self._wrap(function, opts), public, options=opts
+            )
 
         return decorator
 
-    def function(self, method: str, public: bool = False):
-        "Decorator appending an namespace to the application"
+    def function(self, method: str, public: bool = False, **options):
+        """Decorator appending a function to the application.
+        The function takes the params as arguments, not the Request.
+        Params are checked against its signature and type hints before the call."""
 
         def handler(function: Callable):
-            async def _f(request: Request):
-                if isinstance(request.params, dict):
-                    return await function(**request.params)
-                else:
-                    return await function(*request.params)
-
-            if public:
-                self._handlers.put_handler(method, _anonymous(_f))
-            else:
-                self._handlers.put_handler(method, _f)
-            return _f
+            opts = self._options(method, options, public)
+            self._handlers.put_handler(
+                method,
+                self._wrap(function, opts, handler=False),
+                public,
+                style="function",
+                binder=Binder(function),
+                options=opts,
+            )
+            return function
 
         return handler
 
     async def _handle(self, session: Session, rpc_request: dict[str, Any]) -> None:
+        response = await self._call(session, rpc_request)
+        if response is not None:
+            start = time.perf_counter()
+            await session._out(response)
+            self.metrics.sent.observe(time.perf_counter() - start)
+
+    async def _handle_batch(
+        self, session: Session, rpc_requests: list[Any], concurrency: int = 0
+    ) -> None:
+        """Execute a batch of requests, at most concurrency at once, 0 is
+        unlimited, 1 is one after the other.
+        All the responses are sent back in one array, notifications are left out."""
+        responses: list[dict[str, Any] | None] = [None] * len(rpc_requests)
+        entries = iter(enumerate(rpc_requests))
+
+        async def worker() -> None:
+            for i, rpc_request in entries:
+                responses[i] = await self._call_checked(session, rpc_request)
+
+        workers = len(rpc_requests)
+        if concurrency > 0:
+            workers = min(concurrency, workers)
+        await gather(*(worker() for _ in range(workers)))
+        batch = [response for response in responses if response is not None]
+        if len(batch):
+            start = time.perf_counter()
+            await session._out(batch)
+            self.metrics.sent.observe(time.perf_counter() - start)
+
+    async def _call_checked(
+        self, session: Session, rpc_request: Any
+    ) -> dict[str, Any] | None:
+        # Batch entries are not checked by the transport.
+        try:
+            if not isinstance(rpc_request, dict):
+                raise JsonRpcRequestException("Request must be an object")
+            checkup(rpc_request)
+        except JsonRpcRequestException as e:
+            return dict(
+                jsonrpc="2.0",
+                id=None,
+                error=dict(code=-32600, message="Invalid Request", data=str(e)),
+            )
+        return await self._call(session, rpc_request)
+
+    async def _stream(
+        self, session: Session, id_: Any, chunks: AsyncGenerator[Any, None]
+    ) -> Any:
+        """Send the chunks as ordered partial results, waiting for the outbox,
+        the final result is their count.
+        A session which doesn't stream gets the list of the chunks."""
+        try:
+            if id_ is None:
+                async for _ in chunks:
+                    pass
+                return None
+            if not session.streaming:
+                return [chunk async for chunk in chunks]
+            seq = 0
+            async for chunk in chunks:
+                await session._out(
+                    dict(
+                        jsonrpc="2.0",
+                        method=PARTIAL_RESULT,
+                        params=dict(id=id_, seq=seq, value=chunk),
+                    )
+                )
+                seq += 1
+            return seq
+        finally:
+            await chunks.aclose()
+
+    async def _until(self, deadline: float, call: Awaitable[Any]) -> Any:
+        "Abort the call at the deadline, a loop time."
+        scope = timeout_at(deadline)
+        try:
+            async with scope:
+                return await call
+        except TimeoutError:
+            if scope.expired():
+                raise DeadlineExceeded() from None
+            raise  # not ours
+
+    async def _call(
+        self, session: Session, rpc_request: dict[str, Any]
+    ) -> dict[str, Any] | None:
+        "Execute a request, return its response, None for a notification."
+        start = time.perf_counter()
+        running = 0.0
+        metrics = self.metrics.unrouted
+        code = -32000
+        admission = self.admission
+        if admission is not None:
+            admission.in_flight += 1
         request: Request = Request.from_json(self, session, rpc_request)
         try:
-            method: Callable[[Request], Awaitable[Any]] = self._handlers[request.method]
-            if (
-                "_anonymously" not in method.__qualname__  # type: ignore [FIXME] function has a __qualname__, what about hand crafted __call__ ?
-                and not request.session.authenticated
-            ):  # FIXME introspection seems ugly
+            route = self._handlers.route(request.method)
+            metrics = self.metrics.route(route, route.name != request.method)
+            if not route.public and not request.session.authenticated:
                 raise Bounced(f"'{request.method}' method needs authentication")
+            request._anonymous = route.public
+            if admission is not None:
+                admission.admit(route.options)
+            self.quotas.check(session, route.options)
+            # The client may be in a hurry, with its own timeout
+            timeout = route.options.get("timeout", self.timeout)
+            budget = rpc_request.get("timeout")
+            if budget is not None:
+                if not _seconds(budget):
+                    raise InvalidParams(
+                        f"timeout must be a positive number of seconds, not {budget!r}"
+                    )
+                if timeout is None or budget < timeout:
+                    timeout = budget
+            if timeout is not None:
+                request.deadline = get_running_loop().time() + timeout
             logger.info(
                 f"method call: {rpc_request['method']}",
                 extra=dict(request=rpc_request, session=session),
             )
             result: Any
-            result = await method(request)
+            bound = None
+            if route.binder is not None:
+                bound = route.binder(request.params)
+            cache: ResultCache | None = route.options.get("cache")
+            key = None
+            if cache is not None:
+                params: Any = request.params
+                if route.binder is not None and bound is not None:
+                    params = route.binder.named(*bound)  # canonical arguments
+                key = cache.key(request.method, params, session)
+            running = time.perf_counter()
+            metrics.dispatch.observe(running - start)
+            call: Awaitable[Any]
+            if route.options.get("stream"):
+                call = self._stream(
+                    session,
+                    request.id_,
+                    route.handler(request)
+                    if bound is None
+                    else route.handler(*bound[0], **bound[1]),
+                )
+            elif key is not None:
+                assert cache is not None
+                call = cache.call(
+                    key,
+                    lambda: (
+                        route.handler(request)
+                        if bound is None
+                        else route.handler(*bound[0], **bound[1])
+                    ),
+                )
+            elif bound is not None:
+                call = route.handler(*bound[0], **bound[1])
+            else:
+                call = route.handler(request)
+            if request.deadline is None:
+                result = await call
+            else:
+                result = await self._until(request.deadline, call)
+            code = 0
+        except CancelledError:
+            code = REQUEST_CANCELLED
+            raise
         except MethodNotFoundException as e:
-            response = dict(
+            code = -32601
+            return dict(
                 id=request.id_,
                 jsonrpc=request.jsonrpc,
                 error=dict(code=-32601, message="Method not found", data=str(e)),
             )
-            await session._out(response)
+        except DeadlineExceeded:
+            code = DEADLINE_EXCEEDED
+            if request.id_ is None:
+                return None
+            return dict(
+                id=request.id_,
+                jsonrpc=request.jsonrpc,
+                error=dict(code=DEADLINE_EXCEEDED, message="Deadline exceeded"),
+            )
+        except Overloaded as e:
+            code = OVERLOADED
+            if request.id_ is None:
+                return None
+            return dict(
+                id=request.id_,
+                jsonrpc=request.jsonrpc,
+                error=dict(
+                    code=OVERLOADED,
+                    message="Server overloaded",
+                    data=dict(retry_after=e.retry_after),
+                ),
+            )
+        except QuotaExceeded as e:
+            code = QUOTA_EXCEEDED
+            if request.id_ is None:
+                return None
+            return dict(
+                id=request.id_,
+                jsonrpc=request.jsonrpc,
+                error=dict(
+                    code=QUOTA_EXCEEDED,
+                    message="Quota exceeded",
+                    data=dict(scope=e.scope, retry_after=e.retry_after),
+                ),
+            )
+        except InvalidParams as e:
+            code = -32602
+            if request.id_ is None:
+                return None
+            return dict(
+                id=request.id_,
+                jsonrpc=request.jsonrpc,
+                error=dict(code=-32602, message="Invalid params", data=str(e)),
+            )
         except Exception as e:
             logger.info("method error", extra=dict(stack=sys.exc_info()))
             # Lots of exception can be caught here
@@ -266,28 +888,45 @@ class App(Store):
                 """
                 print(f"jsonrpcsession error : {e}")
                 # the client have to read logs to discover th exception
-            else:
-                response = dict(
-                    id=request.id_,
-                    jsonrpc=request.jsonrpc,
-                    error=dict(code=-32000, message=str(e)),
-                )
-                await session._out(response)
+                return None
+            return dict(
+                id=request.id_,
+                jsonrpc=request.jsonrpc,
+                error=dict(code=-32000, message=str(e)),
+            )
         else:
             if request.id_ is not None:
-                response = dict(id=request.id_, result=result, jsonrpc=request.jsonrpc)
-                await session._out(response)
+                return dict(id=request.id_, result=result, jsonrpc=request.jsonrpc)
             elif result is not None:
                 pass  # [FIXME] notification returns nothing
+            return None
+        finally:
+            if admission is not None:
+                admission.in_flight -= 1
+            if running:
+                metrics.handler.observe(time.perf_counter() - running)
+            metrics.done(code)
 
 
 class Request:
+    __slots__ = (
+        "_session",
+        "_app",
+        "method",
+        "params",
+        "id_",
+        "_anonymous",
+        "deadline",
+    )
+
+    _jsonrpc = "2.0"  # Harcoded, this will never change
     _session: Session
     _app: App
     method: str
     params: dict[str, Any] | list[Any]
     id_: Any
     _anonymous: bool
+    deadline: float | None  # loop time
 
     def __init__(
         self,
@@ -303,7 +942,7 @@ class Request:
         self.method = method
         self.params = params
         self._anonymous = False
-        self._jsonrpc = "2.0"  # Harcoded, this will never change
+        self.deadline = None
 
     @staticmethod
     def from_json(app: App, session: Session, message: dict[str, Any]) -> "Request":
@@ -319,12 +958,19 @@ class Request:
         return dict(id=self.id_, method=self.method, params=self.params)
 
     def as_json(self) -> str:
-        return json.dumps(self.as_dict())
+        return self._app.codec.encode(self.as_dict()).decode()
 
     @property
     def session(self) -> Session:
         return self._session
 
+    @property
+    def remaining(self) -> float | None:
+        "Seconds left before the deadline, for the downstream calls."
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - get_running_loop().time())
+
     @property
     def user(self) -> User | None:
         return self._session._user
@@ -344,6 +990,7 @@ class Request:
         return self._jsonrpc
 
 
+# [FIXME] deprecated, public routes are tagged by the Dispatcher
 def _anonymous(
     function: Callable[[Request], Awaitable[Any]],
 ) -> Callable[[Request], Awaitable[Any]]:
@@ -1,8 +1,10 @@
+import asyncio
 from typing import Any, cast
 
 import pytest
 
-from .app import App, Request, Room, Session, User, _anonymous
+from .app import App, CallError, Request, Room, Session, User, _anonymous
+from .codec import JsonCodec
 
 
 class OutTest:
@@ -54,6 +56,48 @@ async def testRoom():
     assert out_b.messages[0] == dict(method="hello", params=["World"])
 
 
+class CountingCodec(JsonCodec):
+    def __init__(self) -> None:
+        super().__init__()
+        self.encoded = 0
+
+    def encode(self, message: Any) -> bytes:
+        self.encoded += 1
+        return super().encode(message)
+
+
+@pytest.mark.asyncio
+async def testBroadcastFrame():
+    codec = CountingCodec()
+    app = App(codec=codec)
+    room = Room(app, send_timeout=0.1)
+    frames = dict[str, list[bytes]]()
+
+    def frame_out(login: str):
+        frames[login] = list()
+
+        async def _out(data: bytes):
+            if login == "broken":
+                raise ConnectionResetError()
+            if login == "stalled":
+                await asyncio.sleep(10)
+            frames[login].append(data)
+
+        return _out
+
+    for login in ("alice", "bob", "broken", "stalled"):
+        user = User(login)
+        room.adduser(user)
+        Session(OutTest(), user, codec=codec, frame_out=frame_out(login))
+
+    fan_out = await room.broadcast(dict(method="hello", params=["World"]), but="bob")
+    assert fan_out.sessions == 3
+    assert fan_out.failed == 2
+    assert codec.encoded == 1
+    assert frames["alice"] == [b'{"method":"hello","params":["World"]}']
+    assert frames["bob"] == []
+
+
 @pytest.mark.asyncio
 async def testApp():
     app = App()
@@ -156,3 +200,242 @@ async def testBadMethod():
     resp = out.messages[0]
     assert "error" in resp
     assert resp["error"]["message"] == "Method not found"
+
+
+@pytest.mark.asyncio
+async def testBatch():
+    out = OutTest()
+    session = Session(out)
+    app = App()
+
+    @app.handler("hello", public=True)
+    async def _hello(request: Request) -> str:
+        return f"Hello {cast(list, request.params)[0]}"
+
+    await app._handle_batch(
+        session,
+        [
+            dict(jsonrpc="2.0", id=1, method="hello", params=["Alice"]),
+            dict(jsonrpc="2.0", method="hello", params=["nobody"]),
+            dict(jsonrpc="2.0", id=2, method="nope"),
+            dict(id=3, method="hello", params=["Bob"]),
+            42,
+            dict(jsonrpc="2.0", id=4, method="hello", params=["Bob"]),
+        ],
+    )
+    assert len(out) == 1
+    batch = cast(list, out.messages[0])
+    assert len(batch) == 5  # the notification is left out
+    assert batch[0] == dict(id=1, jsonrpc="2.0", result="Hello Alice")
+    assert batch[1]["error"]["code"] == -32601
+    assert batch[2]["error"]["code"] == -32600
+    assert batch[3]["error"]["code"] == -32600
+    assert batch[4]["result"] == "Hello Bob"
+
+    # Only notifications, nothing to answer
+    await app._handle_batch(
+        session, [dict(jsonrpc="2.0", method="hello", params=["nobody"])]
+    )
+    assert len(out) == 1
+
+
+@pytest.mark.asyncio
+async def testInvalidParams():
+    out = OutTest()
+    session = Session(out)
+    app = App()
+    calls = list[int]()
+
+    @app.function("add", public=True)
+    async def _add(a: int, b: int = 0) -> int:
+        calls.append(a)
+        return a + b
+
+    await app._handle(session, dict(id=1, method="add", params=dict(a=1, b=2)))
+    assert out.messages.pop()["result"] == 3
+    await app._handle(session, dict(id=2, method="add", params=["one"]))
+    resp = out.messages.pop()
+    assert resp["error"]["code"] == -32602
+    assert resp["error"]["message"] == "Invalid params"
+    await app._handle(session, dict(method="add", params=[1, 2, 3]))
+    assert len(out) == 0
+    assert calls == [1]  # the function is not called with bad params
+
+
+class ClientMockup(OutTest):
+    "Answer server calls, as a client would."
+
+    def __init__(self, answer: Any = None, error: bool = False) -> None:
+        super().__init__()
+        self.session: Session | None = None
+        self._answer = answer
+        self._error = error
+
+    async def __call__(self, message: dict[str, Any]):
+        await super().__call__(message)
+        if self._answer is None or self.session is None:
+            return  # this client never answers
+        response: dict[str, Any] = dict(jsonrpc="2.0", id=message["id"])
+        if self._error:
+            response["error"] = dict(code=-1, message=self._answer)
+        else:
+            response["result"] = self._answer
+        asyncio.get_running_loop().call_soon(self.session.resolve, response)
+
+
+@pytest.mark.asyncio
+async def testCall():
+    client = ClientMockup("pong")
+    session = Session(client)
+    client.session = session
+    assert await session.call("ping", ["?"]) == "pong"
+    assert await session.call("ping") == "pong"
+    assert client.messages[0] == dict(jsonrpc="2.0", id=1, method="ping", params=["?"])
+    assert client.messages[1]["id"] == 2
+    assert session._calls == dict()
+
+    silent = Session(ClientMockup())
+    with pytest.raises(TimeoutError):
+        await silent.call("ping", timeout=0.01)
+    assert silent._calls == dict()
+
+    waiting = asyncio.create_task(silent.call("ping"))
+    await asyncio.sleep(0)
+    silent.cancel_calls()
+    with pytest.raises(ConnectionError):
+        await waiting
+
+    failing = ClientMockup("nope", error=True)
+    session = Session(failing)
+    failing.session = session
+    with pytest.raises(CallError) as e:
+        await session.call("ping")
+    assert e.value.code == -1
+    assert not session.resolve(dict(jsonrpc="2.0", id=42, result=None))
+
+
+@pytest.mark.asyncio
+async def testUserCall():
+    user = User("alice")
+    for answer in (None, "phone", "laptop"):
+        client = ClientMockup(answer)
+        client.session = Session(client, user)
+
+    results = await user.call_all("ping", timeout=0.05)
+    assert sorted(str(r) for r in results if not isinstance(r, Exception)) == [
+        "laptop",
+        "phone",
+    ]
+    assert len([r for r in results if isinstance(r, TimeoutError)]) == 1
+    assert await user.call_any("ping", timeout=1) in ("phone", "laptop")
+
+    nobody = User("bob")
+    with pytest.raises(ConnectionError):
+        await nobody.call_any("ping")
+    client = ClientMockup()
+    Session(client, nobody)
+    with pytest.raises(TimeoutError):
+        await nobody.call_any("ping", timeout=0.01)
+
+
+@pytest.mark.asyncio
+async def testStream():
+    app = App()
+
+    @app.handler("listing", public=True)
+    async def listing(request: Request):
+        for i in range(3):
+            yield f"item {i}"
+
+    @app.function("count", public=True)
+    async def count(n: int):
+        for i in range(n):
+            yield i
+        raise Exception("Too far")
+
+    out = OutTest()
+    session = Session(out)
+    await app._handle(session, dict(jsonrpc="2.0", id=1, method="listing"))
+    assert [m.get("params") for m in out.messages[:3]] == [
+        dict(id=1, seq=i, value=f"item {i}") for i in range(3)
+    ]
+    assert out.messages[3] == dict(jsonrpc="2.0", id=1, result=3)
+    # Partial results, then the error
+    out.messages.clear()
+    await app._handle(session, dict(jsonrpc="2.0", id=2, method="count", params=[2]))
+    assert [m.get("method") for m in out.messages] == ["$/partialResult"] * 2 + [None]
+    assert out.messages[-1]["error"]["message"] == "Too far"
+    # Not streaming, one response
+    out.messages.clear()
+    session.streaming = False
+    await app._handle(session, dict(jsonrpc="2.0", id=3, method="listing"))
+    assert out.messages == [
+        dict(jsonrpc="2.0", id=3, result=["item 0", "item 1", "item 2"])
+    ]
+
+
+@pytest.mark.asyncio
+async def testDeadline():
+    app = App(timeout=5)
+    budgets = list[float | None]()
+
+    @app.handler("slow", public=True, timeout=0.05)
+    async def slow(request: Request) -> str:
+        await asyncio.sleep(1)
+        return "late"
+
+    @app.handler("budget", public=True)
+    async def budget(request: Request) -> str:
+        budgets.append(request.remaining)
+        raise TimeoutError("Downstream timeout")
+
+    @app.handler("forever", public=True, timeout=None)
+    async def forever(request: Request) -> None:
+        budgets.append(request.remaining)
+
+    out = OutTest()
+    session = Session(out)
+    await app._handle(session, dict(jsonrpc="2.0", id=1, method="slow"))
+    assert out.messages[-1]["error"]["code"] == -32008
+    # The client timeout is shorter
+    await app._handle(session, dict(jsonrpc="2.0", id=2, method="budget", timeout=2))
+    # A TimeoutError of the handler is an error, not an expired call
+    assert out.messages[-1]["error"]["code"] == -32000
+    await app._handle(session, dict(jsonrpc="2.0", id=3, method="budget"))
+    await app._handle(session, dict(jsonrpc="2.0", id=4, method="forever"))
+    assert 1.9 < cast(float, budgets[0]) <= 2
+    assert 4.9 < cast(float, budgets[1]) <= 5
+    assert budgets[2] is None
+    assert 'method="slow",namespace="",code="-32008"' in app.metrics.render()
+
+
+@pytest.mark.asyncio
+async def testBadTimeout():
+    app = App()
+
+    @app.handler("ping", public=True)
+    async def ping(request: Request) -> str:
+        return "pong"
+
+    out = OutTest()
+    session = Session(out)
+    for timeout in (True, float("nan"), float("inf"), 1e400, 0, -1, "1"):
+        await app._handle(
+            session, dict(jsonrpc="2.0", id=1, method="ping", timeout=timeout)
+        )
+        assert out.messages[-1]["error"]["code"] == -32602
+    await app._handle(session, dict(jsonrpc="2.0", id=1, method="ping", timeout=0.5))
+    assert out.messages[-1]["result"] == "pong"
+
+
+def testTimeoutOption():
+    async def ping(request: Request) -> str:
+        return "pong"
+
+    for timeout in (True, float("nan"), float("inf"), 0, -1, "5"):
+        with pytest.raises(ValueError):
+            App(timeout=timeout)  # type: ignore
+        with pytest.raises(ValueError):
+            App().handler("ping", timeout=timeout)(ping)
+    App(timeout=None).handler("ping", timeout=None)(ping)
+    App(timeout=30).handler("ping", timeout=0.5)(ping)
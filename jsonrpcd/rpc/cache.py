@@ -0,0 +1,106 @@
+from asyncio import Task, create_task, shield
+from collections import OrderedDict
+from enum import StrEnum
+import json
+import time
+from typing import TYPE_CHECKING, Any, Awaitable, Callable
+
+if TYPE_CHECKING:
+    from .app import Session
+
+
+def _retrieve(task: Task) -> None:
+    # Every caller may be gone, the error is theirs, not the loop's
+    if not task.cancelled():
+        task.exception()
+
+
+class Scope(StrEnum):
+    "Who shares the cached results."
+
+    METHOD = "method"  # everybody
+    USER = "user"  # sessions of the same user
+    ROOM = "room"  # users of the same room
+
+
+class ResultCache:
+    """Results of a method, by canonical params, for ttl seconds, LRU evicted.
+    Concurrent identical calls share one execution, errors are not cached.
+    Opt-in, with the cache option of a registration:
+
+        @app.function("weather", public=True, cache=ResultCache(ttl=5))
+    """
+
+    __slots__ = (
+        "ttl",
+        "size",
+        "scope",
+        "_results",
+        "_in_flight",
+        "hits",
+        "misses",
+        "coalesced",
+    )
+
+    def __init__(
+        self, ttl: float = 1.0, size: int = 1024, scope: Scope | str = Scope.METHOD
+    ) -> None:
+        self.ttl = ttl
+        self.size = size
+        self.scope = Scope(scope)
+        self._results = OrderedDict[tuple, tuple[float, Any]]()
+        self._in_flight = dict[tuple, Task]()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def __len__(self) -> int:
+        return len(self._results)
+
+    def key(self, method: str, params: Any, session: "Session") -> tuple | None:
+        "None when the call can't be cached, out of its scope."
+        try:
+            canonical = json.dumps(params, sort_keys=True, separators=(",", ":"))
+        except (TypeError, ValueError):
+            # Bytes from binary codecs, keys of mixed types: not canonical
+            canonical = f"repr:{params!r}"
+        if self.scope is Scope.METHOD:
+            return (method, canonical)
+        if self.scope is Scope.USER:
+            user = session.user
+            return None if user is None else (method, canonical, user.login)
+        room = session._room
+        return None if room is None else (method, canonical, room)
+
+    async def call(self, key: tuple, function: Callable[[], Awaitable[Any]]) -> Any:
+        "The cached result, the running call, or a new call."
+        entry = self._results.get(key)
+        if entry is not None:
+            if entry[0] > time.monotonic():
+                self._results.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            del self._results[key]
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            # Its own task, a caller leaving doesn't cancel the others
+            task = create_task(self._run(key, function))
+            task.add_done_callback(_retrieve)
+            self._in_flight[key] = task
+        return await shield(task)
+
+    async def _run(self, key: tuple, function: Callable[[], Awaitable[Any]]) -> Any:
+        try:
+            result = await function()
+        finally:
+            del self._in_flight[key]
+        self._results[key] = (time.monotonic() + self.ttl, result)
+        if len(self._results) > self.size:
+            self._results.popitem(last=False)
+        return result
+
+    def clear(self) -> None:
+        self._results.clear()
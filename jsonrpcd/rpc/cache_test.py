@@ -0,0 +1,133 @@
+import asyncio
+from typing import Any
+
+import pytest
+
+from .app import App, Request, Room, Session, User
+from .app_test import OutTest
+from .cache import ResultCache
+
+
+@pytest.mark.asyncio
+async def testCache():
+    app = App()
+    calls = 0
+
+    @app.function("weather", public=True, cache=ResultCache(ttl=10))
+    async def weather(city: str, unit: str = "C") -> str:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return f"Sunny in {city}"
+
+    out = OutTest()
+    session = Session(out)
+    # Concurrent identical calls, one execution
+    await asyncio.gather(
+        *(
+            app._handle(
+                session, dict(jsonrpc="2.0", id=i, method="weather", params=["Paris"])
+            )
+            for i in range(5)
+        )
+    )
+    assert calls == 1
+    assert [m["result"] for m in out.messages] == ["Sunny in Paris"] * 5
+    # Same params, another shape
+    await app._handle(
+        session,
+        dict(jsonrpc="2.0", id=6, method="weather", params=dict(city="Paris")),
+    )
+    assert calls == 1
+    await app._handle(
+        session, dict(jsonrpc="2.0", id=7, method="weather", params=["Lyon"])
+    )
+    assert calls == 2
+    cache = app._caches["weather"]
+    assert (cache.hits, cache.misses, cache.coalesced) == (1, 2, 4)
+    assert 'jsonrpc_cache_total{method="weather",result="coalesced"} 4' in (
+        app.metrics.render()
+    )
+
+
+@pytest.mark.asyncio
+async def testCacheErrors():
+    app = App()
+    calls = 0
+
+    @app.handler("flaky", public=True, cache=10)
+    async def flaky(request: Request) -> str:
+        nonlocal calls
+        calls += 1
+        raise Exception("Nope")
+
+    out = OutTest()
+    for i in range(2):
+        await app._handle(Session(out), dict(jsonrpc="2.0", id=i, method="flaky"))
+    assert calls == 2
+    assert out.messages[-1]["error"]["message"] == "Nope"
+
+
+@pytest.mark.asyncio
+async def testCacheScope():
+    app = App()
+    calls = 0
+
+    @app.handler("whoami", cache=ResultCache(ttl=10, scope="user"))
+    async def whoami(request: Request) -> str:
+        nonlocal calls
+        calls += 1
+        assert request.user is not None
+        return request.user.login
+
+    room = Room(app)
+    outs = dict[str, OutTest]()
+    for login in ("alice", "bob", "alice"):
+        user = room.users.get(login) or User(login)
+        room.adduser(user)
+        out = outs[login] = OutTest()
+        session = Session(out, user)
+        session.authenticate()
+        await app._handle(session, dict(jsonrpc="2.0", id=1, method="whoami"))
+        assert out.messages[-1]["result"] == login
+    assert calls == 2
+
+
+@pytest.mark.asyncio
+async def testCacheKey():
+    app = App()
+    calls = 0
+
+    @app.function("weather", public=True, cache=10)
+    async def weather(city: Any, unit: str = "C") -> str:
+        nonlocal calls
+        calls += 1
+        return f"Sunny in {city!r}"
+
+    out = OutTest()
+    session = Session(out)
+    # Defaults are part of the key
+    for i, params in enumerate((["Paris"], ["Paris", "C"], dict(city="Paris"))):
+        await app._handle(
+            session, dict(jsonrpc="2.0", id=i, method="weather", params=params)
+        )
+    assert calls == 1
+    # Not JSON, still cached
+    for i, city in enumerate((b"Paris", b"Paris", {1: "a", "b": 2})):
+        await app._handle(
+            session, dict(jsonrpc="2.0", id=i, method="weather", params=[city])
+        )
+    assert [m.get("error") for m in out.messages] == [None] * 6
+    assert calls == 3
+
+
+def testCacheStream():
+    app = App()
+
+    async def history(room: str):
+        yield room
+
+    with pytest.raises(ValueError):
+        app.function("history", cache=ResultCache(ttl=5))(history)
+    with pytest.raises(ValueError):
+        app.function("history", cache=5)(history)
@@ -0,0 +1,192 @@
+import json
+from typing import Any, Protocol
+
+
+class Codec(Protocol):
+    """Serialize messages to the wire, and back.
+    Encoding works on bytes, decoding accepts bytes or str,
+    binary codecs only accept bytes."""
+
+    name: str
+    binary: bool  # written as binary websocket frames
+    media_type: str  # the HTTP content type
+
+    def encode(self, message: Any) -> bytes: ...
+
+    def decode(self, data: bytes | str) -> Any: ...
+
+
+class JsonCodec:
+    """The standard library json, always available.
+    Lone surrogates are not UTF-8, such messages are escaped to ASCII."""
+
+    name = "json"
+    binary = False
+    media_type = "application/json"
+
+    def __init__(self) -> None:
+        self._encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+        self._ascii = json.JSONEncoder(ensure_ascii=True, separators=(",", ":"))
+        self._decoder = json.JSONDecoder()
+
+    def encode(self, message: Any) -> bytes:
+        try:
+            return self._encoder.encode(message).encode()
+        except UnicodeEncodeError:
+            return self._ascii.encode(message).encode()
+
+    def decode(self, data: bytes | str) -> Any:
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            data = bytes(data).decode()
+        return self._decoder.decode(data)
+
+
+class OrjsonCodec:
+    "orjson, optional dependency."
+
+    name = "orjson"
+    binary = False
+    media_type = "application/json"
+
+    def __init__(self) -> None:
+        import orjson
+
+        self._dumps = orjson.dumps
+        self._loads = orjson.loads
+
+    def encode(self, message: Any) -> bytes:
+        return self._dumps(message)
+
+    def decode(self, data: bytes | str) -> Any:
+        return self._loads(data)
+
+
+class MsgspecCodec:
+    "msgspec, optional dependency."
+
+    name = "msgspec"
+    binary = False
+    media_type = "application/json"
+
+    def __init__(self) -> None:
+        import msgspec
+
+        self._encoder = msgspec.json.Encoder()
+        self._decoder = msgspec.json.Decoder()
+
+    def encode(self, message: Any) -> bytes:
+        return self._encoder.encode(message)
+
+    def decode(self, data: bytes | str) -> Any:
+        return self._decoder.decode(data)
+
+
+class MsgpackCodec:
+    "MessagePack, optional dependency."
+
+    name = "msgpack"
+    binary = True
+    media_type = "application/msgpack"
+
+    def __init__(self) -> None:
+        import msgpack
+
+        self._packer = msgpack.Packer()
+        self._unpackb = msgpack.unpackb
+
+    def encode(self, message: Any) -> bytes:
+        return self._packer.pack(message)
+
+    def decode(self, data: bytes | str) -> Any:
+        return self._unpackb(data)
+
+
+class CborCodec:
+    "CBOR, optional dependency."
+
+    name = "cbor"
+    binary = True
+    media_type = "application/cbor"
+
+    def __init__(self) -> None:
+        import cbor2
+
+        self._dumps = cbor2.dumps
+        self._loads = cbor2.loads
+
+    def encode(self, message: Any) -> bytes:
+        return self._dumps(message)
+
+    def decode(self, data: bytes | str) -> Any:
+        return self._loads(data)
+
+
+CODECS: dict[str, type] = dict(
+    json=JsonCodec,
+    orjson=OrjsonCodec,
+    msgspec=MsgspecCodec,
+)
+
+# Not JSON, negotiated by websocket subprotocol
+BINARY_CODECS: dict[str, type] = dict(
+    msgpack=MsgpackCodec,
+    cbor=CborCodec,
+)
+
+
+def available_codecs(binary: bool = False) -> list[str]:
+    "Names of the JSON codecs, or the binary ones, whose dependency is installed."
+    names = list[str]()
+    for name, klass in (BINARY_CODECS if binary else CODECS).items():
+        try:
+            klass()
+        except ImportError:
+            continue
+        names.append(name)
+    return names
+
+
+def get_codec(name: str = "json") -> Codec:
+    """Build a codec from its name.
+    "auto" picks the fastest installed one."""
+    if name == "auto":
+        for fast in ("orjson", "msgspec"):
+            try:
+                return CODECS[fast]()
+            except ImportError:
+                continue
+        return JsonCodec()
+    try:
+        klass = CODECS[name] if name in CODECS else BINARY_CODECS[name]
+    except KeyError:
+        raise ValueError(f"Unknown codec: {name}")
+    return klass()
+
+
+default_codec: Codec = JsonCodec()
+
+
+class Frame:
+    """A message encoded once, shared by all its recipients.
+    Encodings are cached by codec name."""
+
+    __slots__ = ("message", "_encoded")
+
+    def __init__(self, message: Any) -> None:
+        self.message = message
+        self._encoded = dict[str, bytes]()
+
+    @classmethod
+    def from_encoded(cls, data: bytes, codec: Codec) -> "Frame":
+        "A frame received already encoded, it is decoded once."
+        frame = cls(codec.decode(data))
+        frame._encoded[codec.name] = data
+        return frame
+
+    def encode(self, codec: Codec) -> bytes:
+        try:
+            return self._encoded[codec.name]
+        except KeyError:
+            data = codec.encode(self.message)
+            self._encoded[codec.name] = data
+            return data
@@ -0,0 +1,57 @@
+import pytest
+
+from .app import App, Request, Session
+from .app_test import OutTest
+from .codec import Frame, JsonCodec, available_codecs, get_codec
+
+MESSAGE = dict(jsonrpc="2.0", id=1, method="hello", params=["Wörld", 4.2, None])
+
+
+@pytest.mark.parametrize("name", available_codecs())
+def testCodec(name: str):
+    codec = get_codec(name)
+    assert codec.name == name
+    data = codec.encode(MESSAGE)
+    assert isinstance(data, bytes)
+    assert codec.decode(data) == MESSAGE
+    assert codec.decode(data.decode()) == MESSAGE
+    # Every codec speaks the same JSON
+    assert JsonCodec().decode(data) == MESSAGE
+
+
+def testLoneSurrogate():
+    codec = JsonCodec()
+    message = dict(jsonrpc="2.0", method="tick", params=["\ud800", "Wörld"])
+    data = codec.encode(message)
+    assert (
+        data == b'{"jsonrpc":"2.0","method":"tick","params":["\\ud800","W\\u00f6rld"]}'
+    )
+    assert codec.decode(data) == message
+
+
+def testGetCodec():
+    assert "json" in available_codecs()
+    assert get_codec("auto").name in available_codecs()
+    with pytest.raises(ValueError):
+        get_codec("yaml")
+
+
+def testRequestAsJson():
+    app = App(codec=get_codec("auto"))
+    request = Request.from_json(app, Session(OutTest()), MESSAGE)
+    assert JsonCodec().decode(request.as_json()) == dict(
+        id=1, method="hello", params=["Wörld", 4.2, None]
+    )
+
+
+@pytest.mark.parametrize("name", available_codecs(binary=True))
+def testBinaryCodec(name: str):
+    codec = get_codec(name)
+    assert codec.binary
+    data = codec.encode(MESSAGE)
+    assert codec.decode(data) == MESSAGE
+    assert len(data) < len(JsonCodec().encode(MESSAGE))
+    # A broadcast is encoded once by wire format
+    frame = Frame(MESSAGE)
+    assert frame.encode(codec) is frame.encode(codec)
+    assert frame.encode(JsonCodec()) != data
@@ -1,30 +1,110 @@
-from typing import Callable
+from typing import Any, Callable
+
+from .params import Binder
 
 
 class MethodNotFoundException(Exception):
     pass
 
 
+class Route[T: Callable]:
+    """A registered handler, with its metadata.
+    public: no authentication needed.
+    style: "request" handlers take the Request, "function" ones take the params.
+    binder: turns the params into the function arguments.
+    options: per method settings, like limits."""
+
+    __slots__ = ("name", "handler", "public", "style", "binder", "options")
+
+    name: str
+    handler: T
+    public: bool
+    style: str
+    binder: Binder | None
+    options: dict[str, Any]
+
+    def __init__(
+        self,
+        name: str,
+        handler: T,
+        public: bool = False,
+        style: str = "request",
+        binder: Binder | None = None,
+        options: dict[str, Any] | None = None,
+    ) -> None:
+        self.name = name
+        self.handler = handler
+        self.public = public
+        self.style = style
+        self.binder = binder
+        self.options = dict() if options is None else options
+
+
+class _Node[T: Callable]:
+    "Namespace prefix trie."
+
+    __slots__ = ("children", "route")
+
+    def __init__(self) -> None:
+        self.children = dict[str, _Node[T]]()
+        self.route: Route[T] | None = None
+
+
 class Dispatcher[T: Callable]:
+    """Find the route of a method.
+    Namespaces, even nested ones (a.b.c), win over handlers, the longest one first.
+    Resolved routes are cached, a lookup is one dict access."""
+
     # Callable[..., Awaitable[tuple["Request", dict[str, Any]]]]
-    _handlers: dict[str, T]
-    _namespaces: dict[str, T]
+    _handlers: dict[str, Route[T]]
+    _namespaces: _Node[T]
+    _resolved: dict[str, Route[T]]
+    cache_size: int = 4096  # random method names can't grow the cache forever
 
     def __init__(self) -> None:
-        self._handlers = dict[str, T]()
-        self._namespaces = dict[str, T]()
+        self._handlers = dict[str, Route[T]]()
+        self._namespaces = _Node[T]()
+        self._resolved = dict[str, Route[T]]()
 
-    def put_handler(self, name: str, handler: T):
-        self._handlers[name] = handler
+    def put_handler(self, name: str, handler: T, public: bool = False, **meta):
+        self._handlers[name] = Route(name, handler, public, **meta)
+        self._resolved.clear()
 
-    def put_namespace(self, name: str, handler: T):
-        self._namespaces[name] = handler
+    def put_namespace(self, name: str, handler: T, public: bool = False, **meta):
+        node = self._namespaces
+        for slug in name.split("."):
+            node = node.children.setdefault(slug, _Node[T]())
+        node.route = Route(name, handler, public, **meta)
+        self._resolved.clear()
 
-    def __getitem__(self, name: str) -> T:
+    def route(self, name: str) -> Route[T]:
+        try:
+            return self._resolved[name]
+        except KeyError:
+            pass
+        route = self._resolve(name)
+        if len(self._resolved) < self.cache_size:
+            self._resolved[name] = route
+        return route
+
+    def _resolve(self, name: str) -> Route[T]:
         slugs = name.split(".")
+        found: Route[T] | None = None
+        node = self._namespaces
+        # A namespace is a strict prefix of the method
+        for slug in slugs[:-1]:
+            child = node.children.get(slug)
+            if child is None:
+                break
+            node = child
+            if node.route is not None:
+                found = node.route
+        if found is not None:
+            return found
         try:
-            if len(slugs) > 1 and slugs[0] in self._namespaces:
-                return self._namespaces[slugs[0]]
             return self._handlers[name]
         except KeyError:
             raise MethodNotFoundException(f"Unregistered method: {name}")
+
+    def __getitem__(self, name: str) -> T:
+        return self.route(name).handler
@@ -4,7 +4,7 @@ import pytest
 
 from .app import App, Request, Session
 from .app_test import OutTest
-from .dispatcher import Dispatcher
+from .dispatcher import Dispatcher, MethodNotFoundException
 
 
 @pytest.mark.asyncio
@@ -37,3 +37,36 @@ async def test_dispatcher():
         )
         == "Hello World"
     )
+
+
+def test_nested_namespaces():
+    async def _handler(request: Request) -> None:
+        pass
+
+    async def _a(request: Request) -> None:
+        pass
+
+    async def _abc(request: Request) -> None:
+        pass
+
+    d = Dispatcher[Callable[..., Awaitable[Any]]]()
+    d.put_handler("a.b", _handler, public=True)
+    d.put_handler("hello", _handler, style="function", options=dict(timeout=1))
+    assert d["a.b"] is _handler
+    route = d.route("hello")
+    assert not route.public
+    assert route.style == "function"
+    assert route.options == dict(timeout=1)
+
+    # Namespaces win over handlers, and the cache is flushed
+    d.put_namespace("a", _a, public=True)
+    d.put_namespace("a.b.c", _abc)
+    assert d["a.b"] is _a
+    assert d.route("a.b").public
+    assert d["a.x.y"] is _a
+    assert d["a.b.c.d"] is _abc
+    assert d["a.b.c"] is _a  # a namespace is a strict prefix
+    with pytest.raises(MethodNotFoundException):
+        d["b.c"]
+    with pytest.raises(MethodNotFoundException):
+        d["a"]
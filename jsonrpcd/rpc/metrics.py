@@ -0,0 +1,342 @@
+from bisect import bisect_left
+from typing import TYPE_CHECKING, Any, Callable
+
+if TYPE_CHECKING:
+    from .app import Session
+    from .tube import AutoTube
+
+# Seconds, from 100µs to 10s
+BUCKETS = (
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n")
+
+
+def _labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if len(pairs) else ""
+
+
+class Value:
+    "A counter or a gauge, for one set of label values."
+
+    __slots__ = ("value",)
+
+    def __init__(self) -> None:
+        self.value: float = 0
+
+    def inc(self, amount: float = 1) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1) -> None:
+        self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class Serie:
+    """A histogram, for one set of label values.
+    An observation is a bisect and two additions."""
+
+    __slots__ = ("buckets", "counts", "sum")
+
+    def __init__(self, buckets: tuple[float, ...]) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # +Inf included
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+
+class Metric[C]:
+    """A named metric, with a child by label values.
+    Hot paths keep the child, from labels(), and skip the lookup."""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.label_names = labels
+        self._children = dict[tuple[str, ...], C]()
+
+    def _child(self) -> C:
+        raise NotImplementedError()
+
+    def labels(self, *values: str) -> C:
+        child = self._children.get(values)
+        if child is None:
+            child = self._children[values] = self._child()
+        return child
+
+    def clear(self) -> None:
+        self._children.clear()
+
+    def render(self) -> list[str]:
+        raise NotImplementedError()
+
+    def _header(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(Metric[Value]):
+    kind = "counter"
+
+    def _child(self) -> Value:
+        return Value()
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self.labels(*labels).inc(amount)
+
+    def value(self, *labels: str) -> float:
+        child = self._children.get(labels)
+        return 0 if child is None else child.value
+
+    def render(self) -> list[str]:
+        lines = self._header()
+        for values, child in self._children.items():
+            lines.append(
+                f"{self.name}{_labels(self.label_names, values)} {child.value}"
+            )
+        return lines
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, *labels: str) -> None:
+        self.labels(*labels).set(value)
+
+    def dec(self, *labels: str, amount: float = 1) -> None:
+        self.labels(*labels).dec(amount)
+
+
+class Histogram(Metric[Serie]):
+    "Counts by bucket, the sum and the count of observations."
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = BUCKETS,
+    ) -> None:
+        super().__init__(name, help, labels)
+        self.buckets = buckets
+
+    def _child(self) -> Serie:
+        return Serie(self.buckets)
+
+    def observe(self, value: float, *labels: str) -> None:
+        self.labels(*labels).observe(value)
+
+    def count(self, *labels: str) -> int:
+        child = self._children.get(labels)
+        return 0 if child is None else sum(child.counts)
+
+    def render(self) -> list[str]:
+        lines = self._header()
+        for values, serie in self._children.items():
+            total = 0
+            for bound, count in zip((*self.buckets, "+Inf"), serie.counts):
+                total += count
+                le = _labels(self.label_names, values, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{le} {total}")
+            labels = _labels(self.label_names, values)
+            lines.append(f"{self.name}_sum{labels} {serie.sum}")
+            lines.append(f"{self.name}_count{labels} {total}")
+        return lines
+
+
+class Metrics:
+    """Registry of metrics, rendered in the Prometheus text format.
+    Collectors are called before rendering, to update gauges."""
+
+    def __init__(self) -> None:
+        self._metrics = list[Metric]()
+        self._collectors = list[Callable[[], None]]()
+
+    def counter(self, name: str, help: str, labels: tuple[str, ...] = ()) -> Counter:
+        return self._add(Counter(name, help, labels))
+
+    def gauge(self, name: str, help: str, labels: tuple[str, ...] = ()) -> Gauge:
+        return self._add(Gauge(name, help, labels))
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        labels: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = BUCKETS,
+    ) -> Histogram:
+        return self._add(Histogram(name, help, labels, buckets))
+
+    def _add[M: Metric](self, metric: M) -> M:
+        self._metrics.append(metric)
+        return metric
+
+    def collect(self, collector: Callable[[], None]) -> None:
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        for collector in self._collectors:
+            collector()
+        lines = list[str]()
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+class RouteMetrics:
+    "The children of a route, looked up once."
+
+    __slots__ = ("dispatch", "handler", "_requests", "_labels", "_codes")
+
+    def __init__(self, metrics: "AppMetrics", labels: tuple[str, str]) -> None:
+        self.dispatch = metrics.dispatch.labels(*labels)
+        self.handler = metrics.handler.labels(*labels)
+        self._requests = metrics.requests
+        self._labels = labels
+        self._codes = dict[int, Value]()
+
+    def done(self, code: int) -> None:
+        "Count a call, by its error code."
+        try:
+            self._codes[code].inc()
+        except KeyError:
+            counter = self._requests.labels(*self._labels, str(code))
+            self._codes[code] = counter
+            counter.inc()
+
+
+class AppMetrics(Metrics):
+    """Metrics of an App.
+    Calls are labelled by method and namespace, methods of a namespace are
+    counted together, as "*"."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.requests = self.counter(
+            "jsonrpc_requests_total",
+            "Calls, by error code, 0 is a success",
+            ("method", "namespace", "code"),
+        )
+        self.dispatch = self.histogram(
+            "jsonrpc_dispatch_seconds",
+            "Route lookup, authentication and params binding",
+            ("method", "namespace"),
+        )
+        self.handler = self.histogram(
+            "jsonrpc_handler_seconds",
+            "Handler execution",
+            ("method", "namespace"),
+        )
+        self.encode = self.histogram(
+            "jsonrpc_encode_seconds", "Message encoding", ("kind",)
+        )
+        self.send = self.histogram(
+            "jsonrpc_send_seconds", "Response encoding and queuing to the outbox"
+        )
+        # Children of the hot paths
+        self.sent = self.send.labels()
+        self.encoded_responses = self.encode.labels("response")
+        self.encoded_events = self.encode.labels("event")
+        self.fan_out = self.histogram(
+            "jsonrpc_fan_out_seconds", "Broadcast to the local sessions", ("room",)
+        )
+        self.fan_out_failed = self.counter(
+            "jsonrpc_fan_out_failed_total", "Sessions given up by broadcasts", ("room",)
+        )
+        self.cache = self.counter(
+            "jsonrpc_cache_total",
+            "Cached results: hit, miss, or coalesced with a running call",
+            ("method", "result"),
+        )
+        self.shed = self.counter(
+            "jsonrpc_shed_total", "Rejected by the admission control", ("kind",)
+        )
+        self.quota_rejected = self.counter(
+            "jsonrpc_quota_rejected_total", "Calls over quota", ("scope",)
+        )
+        self.pool_wait = self.histogram(
+            "jsonrpc_pool_wait_seconds",
+            "Offloaded calls waiting for a worker",
+            ("pool",),
+        )
+        self.pool_queued = self.gauge(
+            "jsonrpc_pool_queued", "Offloaded calls waiting for a worker", ("pool",)
+        )
+        self.loop_lag = self.gauge("jsonrpc_loop_lag_seconds", "Event loop lag")
+        self.in_flight = self.gauge("jsonrpc_in_flight", "Calls in flight")
+        self.overloaded = self.gauge("jsonrpc_overloaded", "1 when shedding load")
+        self.cancelled = self.counter(
+            "jsonrpc_cancelled_total",
+            "Calls cancelled, by the client or by its disconnection",
+            ("reason",),
+        )
+        self.room_users = self.gauge("jsonrpc_room_users", "Users by room", ("room",))
+        self.sessions = self.gauge("jsonrpc_sessions", "Connected sessions")
+        self.session_in_flight = self.gauge(
+            "jsonrpc_session_in_flight",
+            "Tasks of the sessions, the sum and the busiest session",
+            ("stat",),
+        )
+        self.outbox_depth = self.gauge(
+            "jsonrpc_outbox_depth",
+            "Frames waiting in the outboxes, the sum and the deepest one",
+            ("stat",),
+        )
+        self._routes = dict[Any, RouteMetrics]()
+        self.unrouted = RouteMetrics(self, ("", ""))  # unknown methods
+        self._live = dict["Session", "AutoTube | None"]()
+        self.collect(self._collect_sessions)
+
+    def route(self, route: Any, namespace: bool) -> RouteMetrics:
+        "Children of a Route from the Dispatcher."
+        try:
+            return self._routes[route]
+        except KeyError:
+            labels = ("*", route.name) if namespace else (route.name, "")
+            metrics = self._routes[route] = RouteMetrics(self, labels)
+            return metrics
+
+    def open(self, session: "Session", tube: "AutoTube | None" = None) -> None:
+        "Watch a connected session, and its in-flight tasks."
+        self._live[session] = tube
+
+    def close(self, session: "Session") -> None:
+        self._live.pop(session, None)
+
+    def _collect_sessions(self) -> None:
+        self.sessions.set(len(self._live))
+        tubes = [len(tube) for tube in self._live.values() if tube is not None]
+        self.session_in_flight.set(sum(tubes), "sum")
+        self.session_in_flight.set(max(tubes, default=0), "max")
+        depths = [s.outbox.depth for s in self._live if s.outbox is not None]
+        self.outbox_depth.set(sum(depths), "sum")
+        self.outbox_depth.set(max(depths, default=0), "max")
@@ -0,0 +1,61 @@
+import pytest
+
+from .app import App, Request, Room, Session, User
+from .app_test import OutTest
+from .metrics import Metrics
+
+
+def testHistogram():
+    metrics = Metrics()
+    histogram = metrics.histogram("latency_seconds", "Latency", ("method",))
+    histogram.observe(0.0003, "hello")
+    histogram.observe(0.002, "hello")
+    histogram.observe(60, "hello")
+    assert histogram.count("hello") == 3
+    text = metrics.render()
+    assert "# TYPE latency_seconds histogram" in text
+    assert 'latency_seconds_bucket{method="hello",le="0.0005"} 1' in text
+    assert 'latency_seconds_bucket{method="hello",le="0.0025"} 2' in text
+    assert 'latency_seconds_bucket{method="hello",le="+Inf"} 3' in text
+    assert 'latency_seconds_count{method="hello"} 3' in text
+
+
+def testLabelEscape():
+    metrics = Metrics()
+    metrics.counter("calls_total", "Calls", ("method",)).inc('say "hi"')
+    assert 'calls_total{method="say \\"hi\\""} 1' in metrics.render()
+
+
+@pytest.mark.asyncio
+async def testAppMetrics():
+    app = App()
+
+    @app.handler("hello", public=True)
+    async def hello(request: Request) -> str:
+        return "Hello"
+
+    @app.namespace("admin", public=True)
+    async def admin(request: Request) -> str:
+        return "Done"
+
+    out = OutTest()
+    session = Session(out)
+    await app._handle(session, dict(jsonrpc="2.0", id=1, method="hello"))
+    await app._handle(session, dict(jsonrpc="2.0", id=2, method="admin.reboot"))
+    await app._handle(session, dict(jsonrpc="2.0", id=3, method="nope"))
+    assert app.metrics.requests.value("hello", "", "0") == 1
+    assert app.metrics.requests.value("*", "admin", "0") == 1
+    assert app.metrics.requests.value("", "", "-32601") == 1
+    assert app.metrics.handler.count("hello", "") == 1
+    assert app.metrics.send.count() == 3
+
+    room = Room(app, name="lobby")
+    user = User("alice")
+    room.adduser(user)
+    Session(OutTest(), user)
+    app.metrics.open(session)
+    await room.broadcast(dict(method="tick", params=[]))
+    assert app.metrics.fan_out.count("lobby") == 1
+    text = app.metrics.render()
+    assert 'jsonrpc_room_users{room="lobby"} 1' in text
+    assert "jsonrpc_sessions 1" in text
@@ -0,0 +1,159 @@
+from asyncio import Event, Task, create_task, current_task, ensure_future
+from collections import deque
+from enum import StrEnum
+from inspect import isawaitable
+import logging
+from typing import Any, Awaitable, Callable
+
+logger = logging.getLogger(__name__)
+
+
+class Overflow(StrEnum):
+    "What to do when a slow consumer fills its outbox."
+
+    BLOCK = "block"  # the sender waits
+    DROP_OLDEST = "drop_oldest"  # oldest events are dropped, never responses
+    DISCONNECT = "disconnect"  # the slow consumer is disconnected
+
+
+class Outbox:
+    """Bounded queue of encoded frames, drained by its own writer task.
+    Senders don't wait for the wire, only for room in the queue.
+    The writer task lives only while there is something to write,
+    an idle outbox costs no task."""
+
+    __slots__ = (
+        "_write",
+        "_queue",
+        "maxsize",
+        "overflow",
+        "_on_overflow",
+        "_writable",
+        "_task",
+        "_closing",
+        "_started",
+        "closed",
+        "sent",
+        "dropped",
+    )
+
+    maxsize: int
+    overflow: Overflow
+    closed: bool
+    sent: int
+    dropped: int
+    _task: Task | None
+    _writable: Event | None
+    _closing: Any
+
+    def __init__(
+        self,
+        write: Callable[[bytes], Awaitable[None]],
+        maxsize: int = 1024,
+        overflow: Overflow | str = Overflow.BLOCK,
+        on_overflow: Callable[[], Any] | None = None,
+    ) -> None:
+        """on_overflow is called when the slow consumer is disconnected,
+        it can be async."""
+        self._write = write
+        self._queue = deque[tuple[bytes, bool]]()
+        self.maxsize = maxsize
+        self.overflow = Overflow(overflow)
+        self._on_overflow = on_overflow
+        self._writable = None  # created when a sender is blocked
+        self._task = None
+        self._closing = None
+        self._started = False
+        self.closed = False
+        self.sent = 0
+        self.dropped = 0
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+    @property
+    def depth(self) -> int:
+        "Frames waiting to be written."
+        return len(self._queue)
+
+    def start(self) -> None:
+        "Frames are queued, and not written, until the outbox is started."
+        self._started = True
+        self._wake()
+
+    def _wake(self) -> None:
+        if not self._started or len(self._queue) == 0:
+            return
+        if self._task is None or self._task.done():
+            self._task = create_task(self._drain())
+
+    async def put(self, data: bytes) -> None:
+        "Queue a response, it is never dropped while the outbox is open."
+        await self._put(data, False)
+
+    async def put_event(self, data: bytes) -> None:
+        "Queue an event, it can be dropped by the overflow policy."
+        await self._put(data, True)
+
+    async def _put(self, data: bytes, event: bool) -> None:
+        while len(self._queue) >= self.maxsize and not self.closed:
+            if self.overflow is Overflow.DISCONNECT:
+                logger.warning(f"Slow consumer disconnected, {self.depth} frames late")
+                self._disconnect()
+                break
+            if self.overflow is Overflow.DROP_OLDEST:
+                if self._drop_oldest_event():
+                    continue
+                if event:
+                    self.dropped += 1
+                    return
+            # Block, responses are not dropped
+            if self._writable is None:
+                self._writable = Event()
+            self._writable.clear()
+            await self._writable.wait()
+        if self.closed:
+            self.dropped += 1
+            return
+        self._queue.append((data, event))
+        self._wake()
+
+    def _drop_oldest_event(self) -> bool:
+        for i, (_, event) in enumerate(self._queue):
+            if event:
+                del self._queue[i]
+                self.dropped += 1
+                return True
+        return False
+
+    def _disconnect(self) -> None:
+        self.close()
+        if self._on_overflow is not None:
+            closing = self._on_overflow()
+            if isawaitable(closing):
+                self._closing = ensure_future(closing)
+
+    async def _drain(self) -> None:
+        while len(self._queue):
+            data, _ = self._queue.popleft()
+            if self._writable is not None:
+                self._writable.set()
+            try:
+                await self._write(data)
+            except Exception as e:
+                logger.warning(f"Outbox write failed: {e!r}")
+                self.close()
+                return
+            self.sent += 1
+
+    def close(self) -> None:
+        "Stop writing, pending frames are dropped."
+        if self.closed:
+            return
+        self.closed = True
+        self.dropped += len(self._queue)
+        self._queue.clear()
+        if self._writable is not None:
+            self._writable.set()  # wake up the blocked senders
+        if self._task is not None and self._task is not current_task():
+            self._task.cancel()
@@ -0,0 +1,89 @@
+import asyncio
+
+import pytest
+
+from .outbox import Outbox, Overflow
+
+
+class SlowWire:
+    "Nothing is written until the wire is opened."
+
+    def __init__(self) -> None:
+        self.frames = list[bytes]()
+        self.opened = asyncio.Event()
+
+    async def __call__(self, data: bytes):
+        await self.opened.wait()
+        self.frames.append(data)
+
+
+@pytest.mark.asyncio
+async def testOutbox():
+    wire = SlowWire()
+    wire.opened.set()
+    outbox = Outbox(wire)
+    outbox.start()
+    await outbox.put(b"1")
+    await outbox.put_event(b"2")
+    await asyncio.sleep(0)
+    assert wire.frames == [b"1", b"2"]
+    assert outbox.sent == 2
+    outbox.close()
+    await outbox.put(b"3")
+    assert outbox.dropped == 1
+
+
+@pytest.mark.asyncio
+async def testBlock():
+    wire = SlowWire()
+    outbox = Outbox(wire, maxsize=2, overflow=Overflow.BLOCK)
+    outbox.start()
+    for i in range(3):  # the writer holds the first one
+        await outbox.put(str(i).encode())
+    blocked = asyncio.create_task(outbox.put(b"3"))
+    await asyncio.sleep(0.01)
+    assert not blocked.done()
+    assert outbox.depth == 2
+    wire.opened.set()
+    await blocked
+    await asyncio.sleep(0.01)
+    assert wire.frames == [b"0", b"1", b"2", b"3"]
+    assert outbox.dropped == 0
+
+
+@pytest.mark.asyncio
+async def testDropOldest():
+    wire = SlowWire()
+    outbox = Outbox(wire, maxsize=2, overflow="drop_oldest")
+    outbox.start()
+    await outbox.put_event(b"writing")
+    await asyncio.sleep(0)
+    await outbox.put_event(b"old")
+    await outbox.put(b"response")
+    await outbox.put_event(b"new")  # "old" is dropped
+    assert outbox.dropped == 1
+    await outbox.put_event(b"newer")  # "new" is dropped, never the response
+    assert outbox.dropped == 2
+    wire.opened.set()
+    await asyncio.sleep(0.01)
+    assert wire.frames == [b"writing", b"response", b"newer"]
+
+
+@pytest.mark.asyncio
+async def testDisconnect():
+    wire = SlowWire()
+    disconnected = list[bool]()
+
+    async def _disconnect():
+        disconnected.append(True)
+
+    outbox = Outbox(wire, maxsize=1, overflow="disconnect", on_overflow=_disconnect)
+    outbox.start()
+    await outbox.put_event(b"writing")
+    await asyncio.sleep(0)
+    await outbox.put_event(b"queued")
+    await outbox.put_event(b"too much")
+    await asyncio.sleep(0)
+    assert outbox.closed
+    assert disconnected == [True]
+    assert outbox.dropped == 2
@@ -0,0 +1,175 @@
+import inspect
+import types
+import typing
+from typing import Any, Callable, Union
+
+
+class InvalidParams(Exception):
+    "Params don't match the function signature."
+
+    pass
+
+
+Check = Callable[[str, Any], Any]
+
+
+def _anything(name: str, value: Any) -> Any:
+    return value
+
+
+def _int(name: str, value: Any) -> Any:
+    if type(value) is int:
+        return value
+    if type(value) is float and value.is_integer():
+        return int(value)
+    raise InvalidParams(f"'{name}' must be an integer, not {type(value).__name__}")
+
+
+def _float(name: str, value: Any) -> Any:
+    if type(value) is float:
+        return value
+    if type(value) is int:
+        return float(value)
+    raise InvalidParams(f"'{name}' must be a number, not {type(value).__name__}")
+
+
+def _instance(klass: type, label: str) -> Check:
+    def _check(name: str, value: Any) -> Any:
+        if isinstance(value, klass):
+            return value
+        raise InvalidParams(f"'{name}' must be {label}, not {type(value).__name__}")
+
+    return _check
+
+
+def _optional(check: Check) -> Check:
+    def _check(name: str, value: Any) -> Any:
+        if value is None:
+            return None
+        return check(name, value)
+
+    return _check
+
+
+def compile_check(hint: Any) -> Check:
+    "The cheap check, and coercion, of a type hint. Unknown types are not checked."
+    origin = typing.get_origin(hint)
+    if origin is Union or origin is types.UnionType:
+        args = [arg for arg in typing.get_args(hint) if arg is not type(None)]
+        if len(args) == 1:
+            return _optional(compile_check(args[0]))
+        return _anything
+    if origin is not None:
+        hint = origin
+    if hint is int:
+        return _int
+    if hint is float:
+        return _float
+    if hint is bool:
+        return _instance(bool, "a boolean")
+    if hint is str:
+        return _instance(str, "a string")
+    if hint is list or hint is tuple:
+        return _instance(list, "an array")
+    if hint is dict:
+        return _instance(dict, "an object")
+    return _anything
+
+
+class Binder:
+    """Bind JSON-RPC params to the function arguments.
+    Compiled once, from the signature and the type hints, when the function is
+    registered."""
+
+    __slots__ = (
+        "_positional",
+        "_named",
+        "_required",
+        "_required_keywords",
+        "_varargs",
+        "_varkw",
+        "_defaults",
+    )
+
+    def __init__(self, function: Callable) -> None:
+        signature = inspect.signature(function)
+        try:
+            hints = typing.get_type_hints(function)
+        except Exception:
+            hints = dict()
+        self._positional = list[tuple[str, Check]]()
+        self._named = dict[str, Check]()
+        self._required = set[str]()
+        self._required_keywords = list[str]()
+        self._varargs = False
+        self._varkw = False
+        self._defaults = dict[str, Any]()
+        for name, parameter in signature.parameters.items():
+            check = compile_check(hints[name]) if name in hints else _anything
+            if parameter.kind is parameter.VAR_POSITIONAL:
+                self._varargs = True
+                continue
+            if parameter.kind is parameter.VAR_KEYWORD:
+                self._varkw = True
+                continue
+            if parameter.kind is not parameter.KEYWORD_ONLY:
+                self._positional.append((name, check))
+            if parameter.kind is not parameter.POSITIONAL_ONLY:
+                self._named[name] = check
+            if parameter.default is not parameter.empty:
+                self._defaults[name] = parameter.default
+            else:
+                self._required.add(name)
+                if parameter.kind is parameter.KEYWORD_ONLY:
+                    self._required_keywords.append(name)
+
+    def __call__(self, params: Any) -> tuple[list[Any], dict[str, Any]]:
+        "Arguments and keyword arguments, or raise InvalidParams."
+        if isinstance(params, list):
+            return self._bind_list(params), dict()
+        if isinstance(params, dict):
+            return list(), self._bind_dict(params)
+        raise InvalidParams(f"params must be an array or an object, not {params!r}")
+
+    def named(self, args: list[Any], kwargs: dict[str, Any]) -> dict[str, Any]:
+        """Bound arguments by name, defaults included,
+        positional or named params give the same dict."""
+        named = dict(kwargs)
+        for (name, _), value in zip(self._positional, args):
+            named[name] = value
+        for name, default in self._defaults.items():
+            named.setdefault(name, default)
+        if len(args) > len(self._positional):
+            named["*"] = args[len(self._positional) :]
+        return named
+
+    def _bind_list(self, params: list[Any]) -> list[Any]:
+        if len(params) > len(self._positional) and not self._varargs:
+            raise InvalidParams(
+                f"Too many params: {len(params)}, expected {len(self._positional)}"
+            )
+        args = [
+            check(name, value) for (name, check), value in zip(self._positional, params)
+        ]
+        for name, _ in self._positional[len(params) :]:
+            if name in self._required:
+                raise InvalidParams(f"Missing param: '{name}'")
+        if len(self._required_keywords):
+            raise InvalidParams(f"Missing param: '{self._required_keywords[0]}'")
+        args.extend(params[len(self._positional) :])
+        return args
+
+    def _bind_dict(self, params: dict[str, Any]) -> dict[str, Any]:
+        kwargs = dict[str, Any]()
+        for name, value in params.items():
+            check = self._named.get(name)
+            if check is None:
+                if not self._varkw:
+                    raise InvalidParams(f"Unexpected param: '{name}'")
+                kwargs[name] = value
+            else:
+                kwargs[name] = check(name, value)
+        for name in self._required:
+            if name not in params:
+                raise InvalidParams(f"Missing param: '{name}'")
+        return kwargs
@@ -0,0 +1,45 @@
+import pytest
+
+from .params import Binder, InvalidParams
+
+
+async def _move(x: float, y: float, label: str | None = None, *, fast: bool = False):
+    pass
+
+
+def testBinder():
+    binder = Binder(_move)
+    assert binder([1, 2.5]) == ([1.0, 2.5], dict())
+    assert binder([1, 2, "here"]) == ([1.0, 2.0, "here"], dict())
+    assert binder(dict(y=2, x=1, fast=True)) == (list(), dict(x=1.0, y=2.0, fast=True))
+    args, _ = binder([1, 2])
+    assert type(args[0]) is float
+
+    for params, message in (
+        ([1], "Missing param: 'y'"),
+        ([1, 2, "here", True], "Too many params"),
+        (["1", 2], "'x' must be a number, not str"),
+        ([1, 2, 3], "'label' must be a string, not int"),
+        (dict(x=1, y=2, z=3), "Unexpected param: 'z'"),
+        (dict(x=1, fast="yes", y=2), "'fast' must be a boolean"),
+        (42, "params must be an array or an object"),
+    ):
+        with pytest.raises(InvalidParams, match=message):
+            binder(params)
+
+
+def testBinderVariadic():
+    def _any(a: int, *args, **kwargs):
+        pass
+
+    binder = Binder(_any)
+    assert binder([1.0, "b", "c"]) == ([1, "b", "c"], dict())
+    assert binder(dict(a=1, b=2)) == (list(), dict(a=1, b=2))
+    with pytest.raises(InvalidParams, match="must be an integer"):
+        binder([1.5])
+
+    def _keyword(*, a):
+        pass
+
+    with pytest.raises(InvalidParams, match="Missing param: 'a'"):
+        Binder(_keyword)([])
@@ -0,0 +1,114 @@
+from asyncio import get_running_loop, wrap_future
+from concurrent.futures import (
+    Executor,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+)
+import multiprocessing
+import os
+import time
+from typing import Any, Callable, Iterator
+
+
+def _timed(
+    function: Callable, args: tuple, kwargs: dict[str, Any]
+) -> tuple[float, Any]:
+    # Run by the worker, the monotonic clock is shared by the processes
+    return time.monotonic(), function(*args, **kwargs)
+
+
+class Pool:
+    """An executor, created on first use, with its queue length and wait time.
+    Process pools need picklable functions, arguments and results."""
+
+    def __init__(self, name: str, workers: int, factory: Callable[[int], Executor]):
+        self.name = name
+        self.workers = workers
+        self._factory = factory
+        self._executor: Executor | None = None
+        self.pending = 0  # submitted, not done
+        self.done = 0
+        self.waited = 0.0  # seconds in the queue, in total
+        self.observe: Callable[[float], None] | None = None  # wait time
+
+    @property
+    def queued(self) -> int:
+        "Calls waiting for a worker."
+        return max(0, self.pending - self.workers)
+
+    async def run(self, function: Callable, *args, **kwargs) -> Any:
+        if self._executor is None:
+            self._executor = self._factory(self.workers)
+        loop = get_running_loop()
+        submitted = time.monotonic()
+        future = self._executor.submit(_timed, function, args, kwargs)
+        self.pending += 1
+
+        def _done(_: Future) -> None:
+            # When the worker is done, not when the caller gives up
+            try:
+                loop.call_soon_threadsafe(self._finished)
+            except RuntimeError:
+                pass  # the loop is closed
+
+        future.add_done_callback(_done)
+        started, result = await wrap_future(future)
+        wait = max(0.0, started - submitted)
+        self.waited += wait
+        if self.observe is not None:
+            self.observe(wait)
+        return result
+
+    def _finished(self) -> None:
+        self.pending -= 1
+        self.done += 1
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+def _process_pool(workers: int) -> ProcessPoolExecutor:
+    # The loop and the thread pool are threads, fork() could deadlock
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context(
+        "forkserver" if "forkserver" in methods else "spawn"
+    )
+    return ProcessPoolExecutor(workers, mp_context=context)
+
+
+class Pools:
+    """The executors of an App, for sync and CPU bound handlers,
+    with the executor option of a registration: "thread" or "process".
+    A thread pool of threads workers, a process pool of processes workers,
+    both default to the CPU count.
+    Workers are started by a fork server, or spawned, the functions are
+    imported by their module.
+    App.close() shuts them down."""
+
+    def __init__(self, threads: int | None = None, processes: int | None = None):
+        cpus = os.cpu_count() or 1
+        self.thread = Pool(
+            "thread",
+            threads or cpus,
+            lambda workers: ThreadPoolExecutor(workers, thread_name_prefix="jsonrpcd"),
+        )
+        self.process = Pool("process", processes or cpus, _process_pool)
+
+    def __iter__(self) -> Iterator[Pool]:
+        return iter((self.thread, self.process))
+
+    def get(self, executor: "str | Pool") -> Pool:
+        if isinstance(executor, Pool):
+            return executor
+        if executor == "thread":
+            return self.thread
+        if executor == "process":
+            return self.process
+        raise ValueError(f"Unknown executor: {executor!r}")
+
+    def shutdown(self) -> None:
+        for pool in self:
+            pool.shutdown()
@@ -0,0 +1,104 @@
+import asyncio
+import threading
+
+import pytest
+
+from .app import App, Request, Session
+from .app_test import OutTest
+from .pool import Pools
+
+
+def fibonacci(n: int) -> int:
+    return n if n < 2 else fibonacci(n - 1) + fibonacci(n - 2)
+
+
+@pytest.mark.asyncio
+async def testThreadPool():
+    app = App(pools=Pools(threads=1))
+    gate = threading.Event()
+
+    @app.handler("block", public=True, executor="thread")
+    def block(request: Request) -> str:
+        gate.wait(5)
+        return threading.current_thread().name
+
+    out = OutTest()
+    session = Session(out)
+    calls = [
+        asyncio.create_task(
+            app._handle(session, dict(jsonrpc="2.0", id=i, method="block"))
+        )
+        for i in range(3)
+    ]
+    await asyncio.sleep(0.05)
+    # The loop is free, one call runs, the others wait
+    assert app.pools.thread.pending == 3
+    assert app.pools.thread.queued == 2
+    gate.set()
+    await asyncio.gather(*calls)
+    assert all(m["result"].startswith("jsonrpcd") for m in out.messages)
+    assert app.pools.thread.done == 3
+    assert app.pools.thread.waited > 0
+    assert 'jsonrpc_pool_wait_seconds_count{pool="thread"} 3' in app.metrics.render()
+    app.pools.shutdown()
+
+
+@pytest.mark.asyncio
+async def testProcessPool():
+    app = App(pools=Pools(processes=1))
+    app.function("fibonacci", public=True, executor="process")(fibonacci)
+    out = OutTest()
+    await app._handle(
+        Session(out), dict(jsonrpc="2.0", id=1, method="fibonacci", params=[20])
+    )
+    assert out.messages[0]["result"] == 6765
+    app.pools.shutdown()
+    with pytest.raises(ValueError):
+        app.handler("nope", executor="process")(fibonacci)
+
+
+@pytest.mark.asyncio
+async def testPoolTimeout():
+    app = App(pools=Pools(threads=1))
+    gate = threading.Event()
+
+    @app.function("block", public=True, executor="thread", timeout=0.05)
+    def block() -> str:
+        gate.wait(5)
+        return "late"
+
+    out = OutTest()
+    await app._handle(Session(out), dict(jsonrpc="2.0", id=1, method="block"))
+    assert out.messages[-1]["error"]["code"] == -32008
+    # The thread is still busy
+    assert app.pools.thread.pending == 1
+    gate.set()
+    for _ in range(100):
+        if app.pools.thread.pending == 0:
+            break
+        await asyncio.sleep(0.01)
+    assert app.pools.thread.pending == 0
+    app.pools.shutdown()
+
+
+def testAsyncExecutor():
+    app = App()
+
+    async def coroutine() -> None:
+        pass
+
+    async def generator():
+        yield 1
+
+    for function in (coroutine, generator):
+        with pytest.raises(ValueError):
+            app.function("nope", executor="thread")(function)
+
+
+@pytest.mark.asyncio
+async def testClose():
+    app = App(pools=Pools(threads=1, processes=1))
+    await app.pools.process.run(fibonacci, 10)
+    await app.pools.thread.run(fibonacci, 10)
+    await app.close()
+    assert all(pool._executor is None for pool in app.pools)
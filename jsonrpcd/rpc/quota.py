@@ -0,0 +1,138 @@
+import time
+from typing import TYPE_CHECKING, Any, Hashable
+
+if TYPE_CHECKING:
+    from .app import Session
+
+QUOTA_EXCEEDED = -32029  # like HTTP 429
+
+
+class QuotaExceeded(Exception):
+    "Too many calls, retry later."
+
+    def __init__(self, scope: str, retry_after: float) -> None:
+        self.scope = scope
+        self.retry_after = retry_after
+        super().__init__(f"{scope} quota exceeded, retry after {retry_after:.3f}s")
+
+
+class Quota:
+    "A token bucket: rate tokens by second, burst tokens at most."
+
+    __slots__ = ("rate", "burst")
+
+    def __init__(self, rate: float, burst: float | None = None) -> None:
+        if not rate > 0:
+            raise ValueError(f"Quota rate must be positive, not {rate!r}")
+        if burst is not None and not burst > 0:
+            raise ValueError(f"Quota burst must be positive, not {burst!r}")
+        self.rate = rate
+        self.burst = rate if burst is None else burst
+
+
+class Bucket:
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, tokens: float, now: float) -> None:
+        self.tokens = tokens
+        self.updated = now
+
+    def wait(self, quota: Quota, now: float, cost: float) -> float:
+        "Refill, and the seconds to wait before cost tokens are available."
+        self.tokens = min(quota.burst, self.tokens + (now - self.updated) * quota.rate)
+        self.updated = now
+        if self.tokens >= cost:
+            return 0.0
+        return (cost - self.tokens) / quota.rate
+
+
+class Buckets:
+    """Buckets of a quota, by key.
+    Full buckets are forgotten when there are too many, a new one is the same."""
+
+    __slots__ = ("quota", "size", "_buckets")
+
+    def __init__(self, quota: Quota, size: int = 10_000) -> None:
+        self.quota = quota
+        self.size = size
+        self._buckets = dict[Hashable, Bucket]()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def bucket(self, key: Hashable, now: float) -> Bucket:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= self.size:
+                self._prune(now)
+            bucket = self._buckets[key] = Bucket(self.quota.burst, now)
+        return bucket
+
+    def _prune(self, now: float) -> None:
+        quota = self.quota
+        for key, bucket in list(self._buckets.items()):
+            if bucket.tokens + (now - bucket.updated) * quota.rate >= quota.burst:
+                del self._buckets[key]
+
+
+class Quotas:
+    """Token buckets checked before dispatch, for each user, each room,
+    and each method of each user (the quota option of a registration).
+    A call takes its cost option, 1 by default, from every bucket, or from none.
+    Anonymous sessions only have room quotas."""
+
+    user: Buckets | None
+    room: Buckets | None
+
+    def __init__(
+        self, user: Quota | None = None, room: Quota | None = None, size: int = 10_000
+    ) -> None:
+        self._size = size
+        self.user = None if user is None else Buckets(user, size)
+        self.room = None if room is None else Buckets(room, size)
+        self.rejected = dict[str, int]()
+
+    def validate(self, cost: Any, method: Buckets | None = None) -> None:
+        "A cost that every bucket of the call can hold, or ValueError."
+        if isinstance(cost, bool) or not isinstance(cost, (int, float)):
+            raise ValueError(f"Cost must be a number, not {cost!r}")
+        if not cost > 0:
+            raise ValueError(f"Cost must be positive, not {cost!r}")
+        for name, buckets in (
+            ("user", self.user),
+            ("room", self.room),
+            ("method", method),
+        ):
+            if buckets is not None and cost > buckets.quota.burst:
+                raise ValueError(
+                    f"Cost {cost!r} is over the {name} burst {buckets.quota.burst!r}"
+                )
+
+    def check(self, session: "Session", options: dict[str, Any]) -> None:
+        "Take the tokens, or raise QuotaExceeded."
+        method: Buckets | None = options.get("quota")
+        if self.user is None and self.room is None and method is None:
+            return
+        now = time.monotonic()
+        cost = options.get("cost", 1)
+        user = session.user
+        room = session._room
+        checks = list[tuple[str, Buckets, Bucket]]()
+        if user is not None:
+            if self.user is not None:
+                checks.append(("user", self.user, self.user.bucket(user.login, now)))
+            if method is not None:
+                checks.append(("method", method, method.bucket(user.login, now)))
+        if room is not None and self.room is not None:
+            checks.append(("room", self.room, self.room.bucket(room, now)))
+        retry_after = 0.0
+        scope = ""
+        for name, buckets, bucket in checks:
+            wait = bucket.wait(buckets.quota, now, cost)
+            if wait > retry_after:
+                retry_after, scope = wait, name
+        if retry_after > 0:
+            self.rejected[scope] = self.rejected.get(scope, 0) + 1
+            raise QuotaExceeded(scope, retry_after)
+        for _, _, bucket in checks:
+            bucket.tokens -= cost
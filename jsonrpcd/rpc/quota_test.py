@@ -0,0 +1,94 @@
+import pytest
+
+from .app import App, Request, Room, Session, User
+from .app_test import OutTest
+from .quota import QUOTA_EXCEEDED, Quota, Quotas
+
+
+def _session(room: Room, login: str) -> tuple[Session, OutTest]:
+    out = OutTest()
+    user = room.users.get(login) or User(login)
+    session = Session(out, user)
+    room.adduser(user, session)
+    session.authenticate()
+    return session, out
+
+
+@pytest.mark.asyncio
+async def testUserQuota():
+    app = App(quotas=Quotas(user=Quota(rate=1, burst=2)))
+
+    @app.handler("ping")
+    async def ping(request: Request) -> str:
+        return "pong"
+
+    room = Room(app)
+    alice, out = _session(room, "alice")
+    for i in range(3):
+        await app._handle(alice, dict(jsonrpc="2.0", id=i, method="ping"))
+    assert [m.get("result") for m in out.messages] == ["pong", "pong", None]
+    error = out.messages[-1]["error"]
+    assert error["code"] == QUOTA_EXCEEDED
+    assert error["data"]["scope"] == "user"
+    assert 0 < error["data"]["retry_after"] <= 1
+    # Each user has its bucket
+    bob, out = _session(room, "bob")
+    await app._handle(bob, dict(jsonrpc="2.0", id=1, method="ping"))
+    assert out.messages[-1]["result"] == "pong"
+
+
+@pytest.mark.asyncio
+async def testRoomAndMethodQuotas():
+    app = App(quotas=Quotas(room=Quota(rate=1, burst=3)))
+
+    @app.namespace("all", quota=Quota(rate=1, burst=1))
+    async def all(request: Request) -> None:
+        pass
+
+    @app.handler("ping")
+    async def ping(request: Request) -> str:
+        return "pong"
+
+    room = Room(app)
+    alice, alice_out = _session(room, "alice")
+    bob, bob_out = _session(room, "bob")
+    await app._handle(alice, dict(jsonrpc="2.0", id=1, method="all.fire"))
+    await app._handle(alice, dict(jsonrpc="2.0", id=2, method="all.fire"))
+    assert alice_out.messages[-1]["error"]["data"]["scope"] == "method"
+    # The method quota is per user, the room one is shared
+    await app._handle(bob, dict(jsonrpc="2.0", id=1, method="all.fire"))
+    await app._handle(bob, dict(jsonrpc="2.0", id=2, method="ping"))
+    assert [m.get("error") for m in bob_out.messages] == [None, None]
+    await app._handle(bob, dict(jsonrpc="2.0", id=3, method="ping"))
+    assert bob_out.messages[-1]["error"]["data"]["scope"] == "room"
+    assert app.quotas.rejected == dict(method=1, room=1)
+    metrics = app.metrics.render()
+    assert 'jsonrpc_quota_rejected_total{scope="method"} 1' in metrics
+    assert 'jsonrpc_quota_rejected_total{scope="room"} 1' in metrics
+
+
+def testQuotaValidation():
+    for rate, burst in ((0, None), (-1, None), (float("nan"), None), (1, 0)):
+        with pytest.raises(ValueError):
+            Quota(rate, burst)
+    app = App(quotas=Quotas(user=Quota(rate=1, burst=5)))
+
+    async def ping(request: Request) -> str:
+        return "pong"
+
+    for options in (
+        dict(cost=0),
+        dict(cost=-1),
+        dict(cost="1"),
+        dict(cost=True),
+        dict(cost=6),  # never fits in the user bucket
+        dict(cost=3, quota=Quota(rate=1, burst=2)),
+    ):
+        with pytest.raises(ValueError):
+            app.handler("ping", **options)(ping)
+    app.handler("ping", cost=5, quota=Quota(rate=1, burst=5))(ping)
+    # Anonymous callers have no user bucket
+    with pytest.raises(ValueError):
+        app.handler("pong", public=True, quota=Quota(rate=1))(ping)
+    with pytest.raises(ValueError):
+        app.namespace("all", public=True, quota=Quota(rate=1))(ping)
@@ -1,5 +1,6 @@
-from asyncio import Future, Queue, Task, create_task
-from typing import Coroutine
+from asyncio import Event, Future, Queue, Task, create_task
+from collections import deque
+from typing import Callable, Coroutine, Hashable
 
 
 class Tube:
@@ -28,16 +29,85 @@ class Tube:
 
 
 class AutoTube:
-    def __init__(self) -> None:
-        self._queries = set()
+    """Put coroutines in the tube and forget them.
+    With a maxsize, submit them to the backlog, they are started in order
+    when there is room.
+    Tasks put with a key can be cancelled, waiting or running."""
+
+    def __init__(self, maxsize: int = 0, backlog: int | None = None) -> None:
+        "The backlog, maxsize by default, is the count of waiting coroutines."
+        self._queries = set[Task]()
+        self._keys = dict[Hashable, set[Task]]()
+        self._waiting = deque[tuple[Callable[[], Coroutine], Hashable | None]]()
+        self._maxsize = maxsize
+        self._backlog = max(1, maxsize if backlog is None else backlog)
+        self._room = Event()
+        self.cancelled = 0
 
     def __len__(self) -> int:
         return len(self._queries)
 
+    @property
+    def waiting(self) -> int:
+        return len(self._waiting)
+
+    def full(self) -> bool:
+        return self._maxsize > 0 and len(self._queries) >= self._maxsize
+
     def _done(self, future: Future) -> None:
         self._queries.discard(future)
+        while len(self._waiting) and not self.full():
+            factory, key = self._waiting.popleft()
+            self.put(factory(), key)
+        self._room.set()
 
-    def put(self, coroutine: Coroutine) -> None:
+    def put(self, coroutine: Coroutine, key: Hashable | None = None) -> None:
         t: Task = create_task(coroutine)
         self._queries.add(t)
         t.add_done_callback(self._done)
+        if key is not None:
+            # A reused key cancels every task of the key
+            self._keys.setdefault(key, set()).add(t)
+
+            def _forget(future: Future) -> None:
+                tasks = self._keys.get(key)
+                if tasks is not None:
+                    tasks.discard(future)
+                    if len(tasks) == 0:
+                        del self._keys[key]
+
+            t.add_done_callback(_forget)
+
+    def submit(self, factory: Callable[[], Coroutine], key: Hashable | None = None):
+        "The coroutine of the factory is started now, or after the waiting ones."
+        if len(self._waiting) or self.full():
+            self._waiting.append((factory, key))
+        else:
+            self.put(factory(), key)
+
+    def cancel(self, key: Hashable) -> bool:
+        "Cancel the tasks of the key, waiting or running, False if there is none."
+        count = sum(task.cancel() for task in self._keys.pop(key, ()))
+        waiting = len(self._waiting)
+        self._waiting = deque(entry for entry in self._waiting if entry[1] != key)
+        if len(self._waiting) < waiting:
+            count += waiting - len(self._waiting)
+            self._room.set()
+        self.cancelled += count
+        return count > 0
+
+    def cancel_all(self) -> int:
+        """Cancel every task, running or waiting, with a key or not,
+        return how many were cancelled."""
+        count = sum(task.cancel() for task in list(self._queries)) + len(self._waiting)
+        self._waiting.clear()  # the done callbacks start nothing more
+        self._keys.clear()
+        self._room.set()
+        self.cancelled += count
+        return count
+
+    async def wait_backlog(self) -> None:
+        "Wait until there is room in the backlog."
+        while self._maxsize > 0 and len(self._waiting) >= self._backlog:
+            self._room.clear()
+            await self._room.wait()
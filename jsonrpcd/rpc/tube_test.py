@@ -1,3 +1,4 @@
+import asyncio
 from asyncio import Event, sleep
 from typing import Coroutine
 
@@ -60,3 +61,95 @@ async def testAutoTube():
     auto.put(do(_add(1, 3)))
     await waiter.wait()
     assert a == {3, 4}
+
+
+@pytest.mark.asyncio
+async def testAutoTubeMaxsize():
+    gate = Event()
+    started = list[int]()
+
+    async def blocked(i: int):
+        started.append(i)
+        await gate.wait()
+
+    auto = AutoTube(2)
+    for i in range(3):
+        auto.submit(lambda i=i: blocked(i))
+    await sleep(0.01)
+    assert auto.full()
+    assert (len(auto), auto.waiting, started) == (2, 1, [0, 1])
+    gate.set()
+    await sleep(0.01)
+    assert started == [0, 1, 2]
+    assert not auto.full()
+
+
+@pytest.mark.asyncio
+async def testAutoTubeCancel():
+    gate = Event()
+
+    async def blocked():
+        await gate.wait()
+
+    auto = AutoTube()
+    auto.put(blocked(), 1)
+    auto.put(blocked(), 2)
+    auto.put(blocked(), 2)  # a reused key
+    auto.put(blocked())  # not cancellable by key
+    await sleep(0)
+    assert auto.cancel(1)
+    assert not auto.cancel(1)
+    assert not auto.cancel(42)
+    assert auto.cancel(2)
+    await sleep(0.01)
+    assert len(auto) == 1
+    assert auto.cancelled == 3
+    gate.set()
+
+
+@pytest.mark.asyncio
+async def testAutoTubeCancelAll():
+    gate = Event()
+    started = list[int]()
+
+    async def blocked(i: int):
+        started.append(i)
+        await gate.wait()
+
+    auto = AutoTube(1, backlog=4)
+    auto.submit(lambda: blocked(0))  # a notification, without key
+    for i in range(1, 4):
+        auto.submit(lambda i=i: blocked(i), i if i % 2 else None)
+    await sleep(0)
+    assert (len(auto), auto.waiting) == (1, 3)
+    assert auto.cancel_all() == 4
+    await sleep(0.01)
+    # The waiting ones are never started
+    assert started == [0]
+    assert (len(auto), auto.waiting, auto.cancelled) == (0, 0, 4)
+
+
+@pytest.mark.asyncio
+async def testAutoTubeBacklog():
+    gate = Event()
+    started = list[int]()
+
+    async def blocked(i: int):
+        started.append(i)
+        await gate.wait()
+
+    auto = AutoTube(1, backlog=2)
+    for i in range(3):
+        auto.submit(lambda i=i: blocked(i), i)
+    await sleep(0)
+    assert (len(auto), auto.waiting) == (1, 2)
+    waiting = asyncio.create_task(auto.wait_backlog())
+    await sleep(0.01)
+    assert not waiting.done()
+    # A waiting one is cancelled before it starts
+    assert auto.cancel(2)
+    gate.set()
+    await waiting
+    await sleep(0.01)
+    assert started == [0, 1]
+    assert auto.cancelled == 1
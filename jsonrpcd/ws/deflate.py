@@ -0,0 +1,121 @@
+from typing import Any
+import zlib
+
+from aiohttp import WSMsgType, web
+
+from ..rpc.codec import Codec
+
+RSV1 = 0x40  # the compressed bit
+
+
+def _supported(writer: Any) -> bool:
+    "The private parts of the aiohttp writer used by send_deflated."
+    protocol = getattr(writer, "protocol", None)
+    return (
+        all(
+            hasattr(writer, name)
+            for name in ("compress", "_write_websocket_frame", "_output_size", "_limit")
+        )
+        and hasattr(protocol, "_paused")
+        and hasattr(protocol, "_drain_helper")
+    )
+
+
+class Deflated(bytes):
+    "A compressed message, written as is, with the RSV1 bit."
+
+    __slots__ = ()
+
+
+class DeflateCodec:
+    """A codec, and the permessage-deflate compression of its messages.
+    Each message is compressed alone, without context takeover: the same bytes
+    are valid for every session of the same window, broadcast frames are
+    compressed once. Inbound messages are already inflated by aiohttp.
+    One compressor is reused, a full flush ends each message and resets its
+    history."""
+
+    def __init__(
+        self, codec: Codec, level: int, window_bits: int, min_size: int
+    ) -> None:
+        self._codec = codec
+        self.level = level
+        self.window_bits = window_bits
+        self.min_size = min_size
+        # Frames cache their encodings by name
+        self.name = f"{codec.name}+deflate:{level}:{window_bits}:{min_size}"
+        self.binary = codec.binary
+        self.media_type = codec.media_type
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, -window_bits)
+
+    def encode(self, message: Any) -> bytes:
+        data = self._codec.encode(message)
+        if len(data) < self.min_size:
+            return data
+        compressor = self._compressor
+        deflated = compressor.compress(data) + compressor.flush(zlib.Z_FULL_FLUSH)
+        if len(deflated) - 4 >= len(data):
+            return data
+        return Deflated(deflated[:-4])  # without the 00 00 ff ff tail, RFC 7692
+
+    def decode(self, data: bytes | str) -> Any:
+        return self._codec.decode(data)
+
+
+class Deflate:
+    """permessage-deflate options of a websocket handler.
+    Messages of min_size bytes or more are compressed at level, with a window
+    of window_bits, or the smaller one asked by the client. Smaller messages
+    are not worth it.
+    With context_takeover, aiohttp compresses the stream of each session,
+    better for long sessions, but nothing is shared, the other options are
+    ignored."""
+
+    def __init__(
+        self,
+        level: int = 1,
+        window_bits: int = 15,
+        min_size: int = 256,
+        context_takeover: bool = False,
+    ) -> None:
+        if not 9 <= window_bits <= 15:
+            raise ValueError("window_bits must be between 9 and 15")
+        self.level = level
+        self.window_bits = window_bits
+        self.min_size = min_size
+        self.context_takeover = context_takeover
+        self._codecs = dict[tuple[str, int], DeflateCodec]()
+
+    def codec(self, ws: web.WebSocketResponse, codec: Codec) -> Codec:
+        """The codec of a prepared websocket.
+        Compression is taken from aiohttp, unless the client didn't ask for it,
+        or the aiohttp writer is not the expected one, aiohttp keeps it then."""
+        if self.context_takeover or not ws.compress:
+            return codec
+        if not _supported(ws._writer):
+            return codec
+        assert ws._writer is not None
+        ws._writer.compress = 0  # aiohttp still inflates what it reads
+        window_bits = min(self.window_bits, int(ws.compress))
+        key = (codec.name, window_bits)
+        deflate = self._codecs.get(key)
+        if deflate is None:
+            deflate = self._codecs[key] = DeflateCodec(
+                codec, self.level, window_bits, self.min_size
+            )
+        return deflate
+
+
+async def send_deflated(
+    ws: web.WebSocketResponse, data: Deflated, opcode: WSMsgType
+) -> None:
+    "Write an already compressed frame, aiohttp has no public API for it."
+    writer = ws._writer
+    if writer is None:
+        raise ConnectionResetError("Not connected")
+    writer._write_websocket_frame(data, opcode, RSV1)
+    # The flow control of WebSocketWriter.send_frame
+    if writer._output_size > writer._limit:
+        writer._output_size = 0
+        if writer.protocol._paused:
+            await writer.protocol._drain_helper()
@@ -0,0 +1,124 @@
+import asyncio
+import base64
+import json
+import os
+from types import SimpleNamespace
+import zlib
+
+from aiohttp import ClientSession, web
+from aiohttp.test_utils import TestServer
+import pytest
+
+from ..rpc.app import App, Request, Session
+from ..rpc.codec import Frame, JsonCodec
+from .deflate import RSV1, Deflate, DeflateCodec, Deflated
+from .web import JsonRpcWebHandler
+
+EVENT = dict(jsonrpc="2.0", method="tick", params=[dict(x=i, y=-i) for i in range(100)])
+
+
+def _inflate(data: bytes, window_bits: int = 15) -> bytes:
+    return zlib.decompressobj(-window_bits).decompress(data + b"\x00\x00\xff\xff")
+
+
+def testDeflateCodec():
+    plain = JsonCodec()
+    codec = DeflateCodec(plain, level=6, window_bits=10, min_size=64)
+    data = codec.encode(EVENT)
+    assert isinstance(data, Deflated)
+    assert len(data) < len(plain.encode(EVENT)) / 2
+    assert _inflate(data, 10) == plain.encode(EVENT)
+    # Too small to be worth it
+    assert not isinstance(codec.encode(dict(jsonrpc="2.0", method="tick")), Deflated)
+    # Compressed once, for every session of the same window
+    frame = Frame(EVENT)
+    assert frame.encode(codec) is frame.encode(codec)
+    # The compressor is reused, each message is still inflated alone
+    for _ in range(3):
+        assert _inflate(codec.encode(EVENT), 10) == plain.encode(EVENT)
+    with pytest.raises(ValueError):
+        Deflate(window_bits=8)
+
+
+@pytest.mark.asyncio
+async def testDeflate():
+    app = App()
+    codecs = list[str]()
+
+    @app.handler("ticks", public=True)
+    async def ticks(request: Request) -> dict:
+        return EVENT
+
+    async def init(session: Session):
+        codecs.append(session.codec.name)
+
+    deflate = Deflate(min_size=64)
+    web_app = web.Application()
+    web_app.add_routes(
+        [web.get("/ws", JsonRpcWebHandler(app, init=init, deflate=deflate))]
+    )
+    async with TestServer(web_app) as server, ClientSession() as client:
+        url = server.make_url("/ws")
+        for compress in (15, 11, 0):
+            async with client.ws_connect(url, compress=compress) as ws:
+                await ws.send_json(dict(jsonrpc="2.0", id=1, method="ticks"))
+                assert (await ws.receive_json())["result"] == EVENT
+    assert codecs == ["json+deflate:1:15:64", "json+deflate:1:11:64", "json"]
+
+
+def testUnsupportedWriter():
+    codec = JsonCodec()
+    ws = SimpleNamespace(compress=15, _writer=SimpleNamespace(compress=15))
+    # Not the expected aiohttp writer, aiohttp compresses
+    assert Deflate().codec(ws, codec) is codec  # type: ignore
+    assert ws._writer.compress == 15
+
+
+async def _read_frame(reader: asyncio.StreamReader) -> tuple[int, bytes]:
+    head = await reader.readexactly(2)
+    size = head[1] & 0x7F
+    if size == 126:
+        size = int.from_bytes(await reader.readexactly(2))
+    elif size == 127:
+        size = int.from_bytes(await reader.readexactly(8))
+    return head[0], await reader.readexactly(size)
+
+
+@pytest.mark.asyncio
+async def testDeflateWire():
+    app = App()
+
+    @app.handler("ticks", public=True)
+    async def ticks(request: Request) -> dict:
+        return EVENT
+
+    web_app = web.Application()
+    web_app.add_routes(
+        [web.get("/ws", JsonRpcWebHandler(app, deflate=Deflate(min_size=64)))]
+    )
+    async with TestServer(web_app) as server:
+        reader, writer = await asyncio.open_connection(server.host, server.port)
+        key = base64.b64encode(os.urandom(16)).decode()
+        writer.write(
+            (
+                "GET /ws HTTP/1.1\r\n"
+                f"Host: {server.host}:{server.port}\r\n"
+                "Upgrade: websocket\r\n"
+                "Connection: Upgrade\r\n"
+                f"Sec-WebSocket-Key: {key}\r\n"
+                "Sec-WebSocket-Version: 13\r\n"
+                "Sec-WebSocket-Extensions: permessage-deflate\r\n"
+                "\r\n"
+            ).encode()
+        )
+        headers = await reader.readuntil(b"\r\n\r\n")
+        assert b"permessage-deflate" in headers
+        payload = json.dumps(dict(jsonrpc="2.0", id=1, method="ticks")).encode()
+        # A masked text frame, the mask is zeros
+        writer.write(bytes([0x81, 0x80 | len(payload)]) + b"\x00" * 4 + payload)
+        first, data = await _read_frame(reader)
+        assert first & 0x0F == 0x1  # text
+        assert first & RSV1
+        assert json.loads(_inflate(data))["result"] == EVENT
+        writer.close()
+        await writer.wait_closed()
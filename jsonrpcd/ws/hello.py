@@ -1,6 +1,8 @@
 from typing import cast
 from aiohttp import web
 
+from ..http.metrics import MetricsHandler
+from ..http.web import JsonRpcPostHandler
 from ..rpc.app import App, Request
 from .web import JsonRpcWebHandler
 
@@ -13,14 +15,32 @@ async def hello(request: Request) -> str:
 
 
 rpc_app = JsonRpcWebHandler(app)
+post_app = JsonRpcPostHandler(app)
 
 routes = web.RouteTableDef()
 
 routes.get("/rpc")(rpc_app)
+routes.post("/rpc")(post_app)
+routes.get("/metrics")(MetricsHandler(app))
 
+json_rpc_app = app
 app = web.Application()
 app.add_routes(routes)
+app.on_cleanup.append(json_rpc_app.close)
+
+
+def apps() -> tuple[web.Application, App]:
+    "Factory for the cluster workers."
+    return app, json_rpc_app
 
 
 if __name__ == "__main__":
-    web.run_app(app)
+    import sys
+
+    if len(sys.argv) > 1:
+        # python -m jsonrpcd.ws.hello workers
+        from ..cluster.launcher import run_workers
+
+        run_workers(apps, int(sys.argv[1]))
+    else:
+        web.run_app(app)
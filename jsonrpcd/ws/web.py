@@ -1,33 +1,121 @@
-from typing import Any, AsyncGenerator, Callable, cast
+from functools import partial
+from typing import Any, AsyncGenerator, Callable, Sequence, cast
 import logging
+import time
 
 import aiohttp
 from aiohttp import web
 from aiohttp.web import WebSocketResponse
 
-from ..rpc.app import App, Session
+from ..rpc.app import (
+    CANCEL_REQUEST,
+    REQUEST_CANCELLED,
+    App,
+    FrameOut,
+    MessageOut,
+    Session,
+)
+from ..rpc.codec import Codec, available_codecs, default_codec, get_codec
 from ..rpc.json_rpc import JsonRpcRequestException, checkup
+from ..rpc.metrics import AppMetrics
+from ..rpc.outbox import Outbox, Overflow
 from ..rpc.tube import AutoTube
+from .deflate import Deflate, Deflated, send_deflated
 
 logger = logging.getLogger(__name__)
 
+SUBPROTOCOL = "jsonrpc"  # the default codec, binary ones are "jsonrpc.<name>"
+
+
+def _isResponse(message: Any) -> bool:
+    return (
+        isinstance(message, dict)
+        and "method" not in message
+        and ("result" in message or "error" in message)
+    )
+
+
+def _key(id_: Any) -> str | int | float | None:
+    "Ids of the cancellable calls, strings and numbers."
+    return id_ if isinstance(id_, (str, int, float)) else None
+
+
+def websocketFrameWriter(ws: web.WebSocketResponse, binary: bool = False) -> FrameOut:
+    "Write encoded messages as text frames, or binary ones."
+    opcode = aiohttp.WSMsgType.BINARY if binary else aiohttp.WSMsgType.TEXT
+
+    async def _out(data: bytes) -> None:
+        if isinstance(data, Deflated):
+            await send_deflated(ws, data, opcode)
+        else:
+            await ws.send_frame(data, opcode)
+
+    return _out
+
+
+def websocketWriter(
+    ws: web.WebSocketResponse,
+    codec: Codec,
+    write: FrameOut | None = None,
+    metrics: AppMetrics | None = None,
+) -> MessageOut:
+    """Encode messages with the codec, write them as frames, or with write.
+    Encoding time is measured by the metrics, if any."""
+    _write = websocketFrameWriter(ws, codec.binary) if write is None else write
+
+    if metrics is None:
+
+        async def _out(message: Any) -> None:
+            await _write(codec.encode(message))
+
+        return _out
+
+    encoded = metrics.encoded_responses
+
+    async def _measured_out(message: Any) -> None:
+        start = time.perf_counter()
+        data = codec.encode(message)
+        encoded.observe(time.perf_counter() - start)
+        await _write(data)
+
+    return _measured_out
+
 
 async def websocketJsonRpcIterator(
     ws: web.WebSocketResponse,
-) -> AsyncGenerator[dict[str, Any], None]:
-    "Yield message as dict, don't bother with websockets or JSON details."
+    codec: Codec = default_codec,
+) -> AsyncGenerator[dict[str, Any] | list[Any], None]:
+    """Yield message as dict, or batch as list,
+    don't bother with websockets or JSON details."""
+    send = websocketWriter(ws, codec)
     try:
         async for msg in ws:
-            if msg.type == aiohttp.WSMsgType.TEXT:
+            if msg.type in (aiohttp.WSMsgType.TEXT, aiohttp.WSMsgType.BINARY):
                 try:
-                    message: dict = msg.json()
+                    message: dict | list = codec.decode(msg.data)
                 except Exception as e:
                     response = dict(
                         jsonrpc="2.0",
                         id=None,
                         error=dict(code=-32700, message="Parse error", data=str(e)),
                     )
-                    await ws.send_json(response)
+                    await send(response)
+                    continue
+                if isinstance(message, list):
+                    if len(message) == 0:
+                        response = dict(
+                            jsonrpc="2.0",
+                            id=None,
+                            error=dict(code=-32600, message="Invalid Request"),
+                        )
+                        await send(response)
+                        continue
+                    # Batch entries are checked one by one, by the App
+                    yield message
+                    continue
+                if _isResponse(message):
+                    # Response to a server call
+                    yield message
                     continue
                 try:
                     checkup(message)
@@ -36,7 +124,7 @@ async def websocketJsonRpcIterator(
                         jsonrpc="2.0",
                         error=dict(code=-32600, message="Invalid Request", data=str(e)),
                     )
-                    await ws.send_json(response)
+                    await send(response)
                     continue
                 yield message
             elif msg.type == aiohttp.WSMsgType.ERROR:
@@ -54,12 +142,26 @@ async def websocketJsonRpcIterator(
             jsonrpc="2.0",
             error=dict(code=-32603, message="Internal error", data=str(e)),
         )
-        await ws.send_json(response)
+        await send(response)
     finally:
         if not ws.closed:
             await ws.close()
 
 
+class Handshake:
+    """What is left of the HTTP request once the websocket is established.
+    The aiohttp request, its transport and payload are not kept alive."""
+
+    __slots__ = ("method", "path", "query", "headers", "remote")
+
+    def __init__(self, request: web.BaseRequest) -> None:
+        self.method = request.method
+        self.path = request.path
+        self.query = request.query
+        self.headers = request.headers
+        self.remote = request.remote
+
+
 class JsonRpcUserException(Exception):
     def __init__(self, error: dict[str, Any], id: Any | None = None) -> None:
         self._error = error
@@ -78,10 +180,18 @@ class JsonRpcSession:
     The client is connected and can start sending requests (and receiving responses).
     """
 
-    def __init__(self, app: App, session: Session, ws: WebSocketResponse) -> None:
+    def __init__(
+        self,
+        app: App,
+        session: Session,
+        ws: WebSocketResponse,
+        concurrency: int = 0,
+    ) -> None:
+        "A batch runs at most concurrency requests at once, 0 is unlimited."
         self.app = app
         self.session = session
         self.ws = ws
+        self.concurrency = concurrency
 
     async def __call__(self, message: dict[str, Any]):
         """Execute a request.
@@ -91,44 +201,166 @@ class JsonRpcSession:
         # It must be handled in the rpc module.
         await self.app._handle(self.session, message)
 
+    async def batch(self, messages: list[Any]):
+        "Execute a batch of requests, answer with one batch of responses."
+        await self.app._handle_batch(self.session, messages, self.concurrency)
+
 
 class JsonRpcWebHandler:
     """aiohttp web handler managing the websocket connection."""
 
     _app: App
+    _codec: Codec
+    _outbox_size: int
+    _overflow: Overflow
+    _max_in_flight: int
+    _backlog: int
+    _compact: bool
 
     def __init__(
-        self, app: App, init: None | Callable = None, on_close: None | Callable = None
+        self,
+        app: App,
+        init: None | Callable = None,
+        on_close: None | Callable = None,
+        codec: Codec | None = None,
+        outbox_size: int = 1024,
+        overflow: Overflow | str = Overflow.BLOCK,
+        max_in_flight: int = 64,
+        ordered: bool = False,
+        backlog: int = 16,
+        compact: bool = False,
+        binary: Sequence[str] | None = None,
+        deflate: Deflate | None = None,
     ):
         """Init async function is called in the websocket connection step.
-        It is used to add information to the session."""
+        It is used to add information to the session.
+        The codec defaults to the App one.
+        Each session writes through an outbox of outbox_size frames,
+        overflow is the policy for slow consumers.
+        A session runs at most max_in_flight concurrent requests (0 is unlimited),
+        backlog more wait for a slot, the websocket is not read while the backlog
+        is full. Cancellations and responses to server calls never wait.
+        Ordered sessions run their requests one after the other.
+        The requests of a batch are bounded the same way.
+        Sessions keep a Handshake snapshot as "handshake", compact ones don't keep
+        the "http-request", once the init is done.
+        Clients pick the wire format with the websocket subprotocol: "jsonrpc" is
+        the codec, "jsonrpc.msgpack" or "jsonrpc.cbor" are the binary codecs,
+        all the installed ones by default.
+        deflate tunes the permessage-deflate compression, the aiohttp one
+        without it."""
         self._app: App = app
         self._init = init
         self._on_close = on_close
+        self._codec = app.codec if codec is None else codec
+        self._outbox_size = outbox_size
+        self._overflow = Overflow(overflow)
+        self._max_in_flight = 1 if ordered else max_in_flight
+        self._backlog = backlog
+        self._compact = compact
+        self._deflate = deflate
+        self._protocols: dict[str, Codec] = {SUBPROTOCOL: self._codec}
+        for name in available_codecs(binary=True) if binary is None else binary:
+            self._protocols[f"{SUBPROTOCOL}.{name}"] = get_codec(name)
 
     async def __call__(self, request: web.Request) -> web.Response:
-        ws = web.WebSocketResponse()
+        admission = self._app.admission
+        if admission is not None:
+            admission.check_connection()
+        ws = web.WebSocketResponse(protocols=tuple(self._protocols))
         await ws.prepare(request)
-        session = Session(ws.send_json)
+        # Without subprotocol, it's the codec
+        codec = self._protocols.get(ws.ws_protocol or SUBPROTOCOL, self._codec)
+        if self._deflate is not None:
+            codec = self._deflate.codec(ws, codec)
+        outbox = Outbox(
+            websocketFrameWriter(ws, codec.binary),
+            maxsize=self._outbox_size,
+            overflow=self._overflow,
+            on_overflow=ws.close,
+        )
+        session = Session(
+            websocketWriter(ws, codec, outbox.put, self._app.metrics),
+            codec=codec,
+            frame_out=outbox.put_event,
+            outbox=outbox,
+        )
+        session["handshake"] = Handshake(request)
         session["http-request"] = request
         if self._init is not None:
             await self._init(session)
-        await self._json_rpc_loop(session, ws)
+        if self._compact:
+            del session["http-request"]
+        outbox.start()
+        try:
+            await self._json_rpc_loop(session, ws)
+        finally:
+            outbox.close()
         return cast(web.Response, ws)
 
     async def _json_rpc_loop(self, session: Session, ws: web.WebSocketResponse) -> None:
         # No HTTP in this context, just a websocket
-        jsonrpc_session = JsonRpcSession(self._app, session, ws)
+        # A batch is one frame, its requests are bounded like the other ones
+        jsonrpc_session = JsonRpcSession(self._app, session, ws, self._max_in_flight)
+
+        _tube = AutoTube(self._max_in_flight, self._backlog)
+        self._app.metrics.open(session, _tube)
+        try:
+            await self._read(session, ws, jsonrpc_session, _tube)
+        finally:
+            self._app.metrics.close(session)
+            # Nobody waits for their responses
+            cancelled = _tube.cancel_all()
+            if cancelled:
+                self._app.metrics.cancelled.inc("disconnect", amount=cancelled)
+            session.cancel_calls()
+            try:
+                await ws.close()
+            finally:
+                if self._on_close is not None:
+                    self._on_close(session)
 
-        _tube = AutoTube()
+    async def _cancel(self, session: Session, params: Any, _tube: AutoTube) -> None:
+        "The running call is cancelled, and answered with an error."
+        id_ = _key(params.get("id")) if isinstance(params, dict) else None
+        if id_ is None or not _tube.cancel(id_):
+            return  # already done, or unknown
+        self._app.metrics.cancelled.inc("request")
+        await session._out(
+            dict(
+                jsonrpc="2.0",
+                id=id_,
+                error=dict(code=REQUEST_CANCELLED, message="Request cancelled"),
+            )
+        )
 
-        async for message in websocketJsonRpcIterator(ws):
-            if "method" in message:
-                _tube.put(jsonrpc_session(message))
-            elif "result" in message:
-                pass  # FIXME
+    async def _read(
+        self,
+        session: Session,
+        ws: web.WebSocketResponse,
+        jsonrpc_session: JsonRpcSession,
+        _tube: AutoTube,
+    ) -> None:
+        async for message in websocketJsonRpcIterator(ws, session.codec):
+            if isinstance(message, list):
+                requests = list[Any]()
+                for entry in message:
+                    if _isResponse(entry):
+                        session.resolve(entry)
+                    else:
+                        requests.append(entry)
+                if len(requests):
+                    _tube.submit(partial(jsonrpc_session.batch, requests))
+            elif message.get("method") == CANCEL_REQUEST:
+                await self._cancel(session, message.get("params"), _tube)
+                continue
+            elif "method" in message:
+                _tube.submit(partial(jsonrpc_session, message), _key(message.get("id")))
+            elif _isResponse(message):
+                session.resolve(message)
+                continue
             else:
                 raise Exception(f"strange message : {message}")
-        await ws.close()
-        if self._on_close is not None:
-            self._on_close(session)
+            # Backpressure: the websocket is not read while the backlog is full,
+            # control frames are read while the requests wait for a slot
+            await _tube.wait_backlog()
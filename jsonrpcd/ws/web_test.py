@@ -3,12 +3,14 @@ import json
 from typing import Any, cast
 
 import pytest
-from aiohttp import WSMsgType, web
+from aiohttp import ClientSession, WSMsgType, web
 from aiohttp._websocket.models import WSMessage
+from aiohttp.test_utils import TestServer
 
 from jsonrpcd.rpc.app_test import OutTest
 
 from ..rpc.app import App, Bounced, Request, Session
+from ..rpc.codec import get_codec
 from .web import JsonRpcWebHandler
 
 
@@ -31,6 +33,9 @@ class WebsocketMockup:
     async def send_json(self, data: Any):
         await self._responses.put(json.dumps(data))
 
+    async def send_frame(self, data: bytes, opcode: WSMsgType):
+        await self._responses.put(data.decode())
+
     async def read(self) -> str:
         "Next request."
         return await self._requests.get()
@@ -121,3 +126,277 @@ async def testBadJson(app: App):
     print(debug)
     assert "error" in resp
     assert t.done
+
+
+@pytest.mark.asyncio
+async def testBatch(app: App):
+    web_handler = JsonRpcWebHandler(app)
+    out = OutTest()
+    session = Session(out)
+    session.authenticate()
+    ws = WebsocketMockup()
+    t = asyncio.create_task(
+        web_handler._json_rpc_loop(session, cast(web.WebSocketResponse, ws))
+    )
+
+    await ws.put("[]")
+    resp = json.loads(await ws.get())
+    assert resp["error"]["code"] == -32600
+
+    await ws.put(
+        json.dumps(
+            [
+                dict(jsonrpc="2.0", id=1, method="hello", params=["Alice"]),
+                dict(jsonrpc="2.0", method="hello", params=["Bob"]),
+                dict(jsonrpc="2.0", id=2, method="hello", params=["Charly"]),
+            ]
+        )
+    )
+    await asyncio.sleep(0.01)
+    batch = out.messages.pop()
+    assert [r["result"] for r in batch] == ["Hello Alice", "Hello Charly"]
+    t.cancel()
+
+
+@pytest.mark.asyncio
+async def testOrdered():
+    app = App()
+    calls = list[str]()
+
+    @app.handler("slow", public=True)
+    async def slow(request: Request) -> None:
+        calls.append(f"start {request.id_}")
+        await asyncio.sleep(0.02)
+        calls.append(f"end {request.id_}")
+
+    web_handler = JsonRpcWebHandler(app, ordered=True, backlog=1)
+    session = Session(OutTest())
+    ws = WebsocketMockup()
+    t = asyncio.create_task(
+        web_handler._json_rpc_loop(session, cast(web.WebSocketResponse, ws))
+    )
+    for i in range(3):
+        await ws.put(json.dumps(dict(jsonrpc="2.0", id=i, method="slow")))
+    await asyncio.sleep(0.01)
+    # One request waits for the running one, the websocket is not read further
+    assert ws._requests.qsize() == 1
+    await asyncio.sleep(0.1)
+    assert calls == ["start 0", "end 0", "start 1", "end 1", "start 2", "end 2"]
+    t.cancel()
+
+
+@pytest.mark.asyncio
+async def testServerCall(app: App):
+    web_handler = JsonRpcWebHandler(app)
+    out = OutTest()
+    session = Session(out)
+    ws = WebsocketMockup()
+    t = asyncio.create_task(
+        web_handler._json_rpc_loop(session, cast(web.WebSocketResponse, ws))
+    )
+    call = asyncio.create_task(session.call("ping", ["?"]))
+    await asyncio.sleep(0)
+    request = out.messages.pop()
+    assert request["method"] == "ping"
+    await ws.put(json.dumps(dict(jsonrpc="2.0", id=request["id"], result="pong")))
+    assert await call == "pong"
+
+    # Pending calls fail when the session is over
+    call = asyncio.create_task(session.call("ping"))
+    await asyncio.sleep(0)
+    t.cancel()
+    with pytest.raises(ConnectionError):
+        await call
+    # Without answer
+    with pytest.raises(TimeoutError, match="No response to 'ping'"):
+        await session.call("ping", timeout=0.01)
+
+
+@pytest.mark.asyncio
+async def testServerCallOrdered():
+    app = App()
+
+    @app.handler("delete", public=True)
+    async def delete(request: Request) -> str:
+        confirmed = await request.session.call("confirm", ["delete?"], timeout=1)
+        return "deleted" if confirmed else "kept"
+
+    web_app = web.Application()
+    web_app.add_routes([web.get("/ws", JsonRpcWebHandler(app, ordered=True))])
+    async with TestServer(web_app) as server, ClientSession() as client:
+        async with client.ws_connect(server.make_url("/ws")) as ws:
+            await ws.send_json(dict(jsonrpc="2.0", id=1, method="delete"))
+            call = await ws.receive_json()
+            assert call["method"] == "confirm"
+            # The session is busy, the response is read anyway
+            await ws.send_json(dict(jsonrpc="2.0", id=call["id"], result=True))
+            response = await asyncio.wait_for(ws.receive_json(), 1)
+            assert response == dict(jsonrpc="2.0", id=1, result="deleted")
+
+
+@pytest.mark.asyncio
+async def testSubprotocol(app: App):
+    pytest.importorskip("msgpack")
+    msgpack = get_codec("msgpack")
+
+    async def init(session: Session):
+        session.authenticate()
+
+    web_app = web.Application()
+    handler = JsonRpcWebHandler(app, init=init, binary=["msgpack"])
+    web_app.add_routes([web.get("/ws", handler)])
+    async with TestServer(web_app) as server, ClientSession() as client:
+        url = server.make_url("/ws")
+        async with client.ws_connect(url, protocols=("jsonrpc.msgpack",)) as ws:
+            assert ws.protocol == "jsonrpc.msgpack"
+            await ws.send_bytes(
+                msgpack.encode(
+                    dict(jsonrpc="2.0", id=1, method="hello", params=["World"])
+                )
+            )
+            msg = await ws.receive()
+            assert msg.type == WSMsgType.BINARY
+            assert msgpack.decode(msg.data)["result"] == "Hello World"
+            # Same errors, in the same format
+            await ws.send_bytes(b"\xc1")
+            error = msgpack.decode(await ws.receive_bytes())["error"]
+            assert error["code"] == -32700
+        # JSON, without subprotocol
+        async with client.ws_connect(url) as ws:
+            assert ws.protocol is None
+            await ws.send_json(
+                dict(jsonrpc="2.0", id=1, method="hello", params=["Bob"])
+            )
+            assert (await ws.receive_json())["result"] == "Hello Bob"
+
+
+@pytest.mark.asyncio
+async def testCancel():
+    app = App()
+    started = asyncio.Event()
+    cancelled = list[str]()
+
+    @app.handler("slow", public=True)
+    async def slow(request: Request) -> str:
+        started.set()
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(cast(list[str], request.params)[0])
+            raise
+        return "done"
+
+    web_app = web.Application()
+    web_app.add_routes([web.get("/ws", JsonRpcWebHandler(app))])
+    async with TestServer(web_app) as server, ClientSession() as client:
+        url = server.make_url("/ws")
+        async with client.ws_connect(url) as ws:
+            await ws.send_json(dict(jsonrpc="2.0", id=1, method="slow", params=["a"]))
+            await started.wait()
+            await ws.send_json(
+                dict(jsonrpc="2.0", method="$/cancelRequest", params=dict(id=1))
+            )
+            response = await ws.receive_json()
+            assert response["id"] == 1
+            assert response["error"]["code"] == -32800
+            # Cancelled by the disconnection
+            started.clear()
+            await ws.send_json(dict(jsonrpc="2.0", id=2, method="slow", params=["b"]))
+            await started.wait()
+        for _ in range(100):
+            if len(cancelled) == 2:
+                break
+            await asyncio.sleep(0.01)
+    assert cancelled == ["a", "b"]
+    assert app.metrics.cancelled.value("request") == 1
+    assert app.metrics.cancelled.value("disconnect") == 1
+    assert 'code="-32800"' in app.metrics.render()
+
+
+@pytest.mark.asyncio
+async def testCancelOrdered():
+    app = App()
+    started = asyncio.Event()
+
+    @app.handler("slow", public=True)
+    async def slow(request: Request) -> str:
+        started.set()
+        await asyncio.sleep(3)
+        return "done"
+
+    web_app = web.Application()
+    web_app.add_routes([web.get("/ws", JsonRpcWebHandler(app, ordered=True))])
+    async with TestServer(web_app) as server, ClientSession() as client:
+        async with client.ws_connect(server.make_url("/ws")) as ws:
+            await ws.send_json(dict(jsonrpc="2.0", id=1, method="slow"))
+            await ws.send_json(dict(jsonrpc="2.0", id=2, method="slow"))
+            await started.wait()
+            # The running call, then the waiting one
+            for id_ in (1, 2):
+                await ws.send_json(
+                    dict(jsonrpc="2.0", method="$/cancelRequest", params=dict(id=id_))
+                )
+                response = await asyncio.wait_for(ws.receive_json(), 1)
+                assert response["id"] == id_
+                assert response["error"]["code"] == -32800
+    assert app.metrics.cancelled.value("request") == 2
+
+
+@pytest.mark.asyncio
+async def testCancelNotifications():
+    app = App()
+    started = asyncio.Event()
+    ran = list[str]()
+
+    @app.handler("slow", public=True)
+    async def slow(request: Request) -> None:
+        ran.append(cast(list[str], request.params)[0])
+        started.set()
+        await asyncio.sleep(0.2)
+
+    web_app = web.Application()
+    web_app.add_routes([web.get("/ws", JsonRpcWebHandler(app, max_in_flight=1))])
+    async with TestServer(web_app) as server, ClientSession() as client:
+        async with client.ws_connect(server.make_url("/ws")) as ws:
+            for name in "abcd":
+                await ws.send_json(dict(jsonrpc="2.0", method="slow", params=[name]))
+            await started.wait()
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.5)
+    # The running one is cancelled, the waiting ones never start
+    assert ran == ["a"]
+    assert app.metrics.cancelled.value("disconnect") == 4
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("options,limit", [(dict(ordered=True), 1), ({}, 4)])
+async def testBatchInFlight(options: dict[str, Any], limit: int):
+    app = App()
+    running = 0
+    peak = 0
+
+    @app.handler("slow", public=True)
+    async def slow(request: Request) -> Any:
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.001)
+        running -= 1
+        return request.id_
+
+    web_handler = JsonRpcWebHandler(app, max_in_flight=4, **options)
+    out = OutTest()
+    ws = WebsocketMockup()
+    t = asyncio.create_task(
+        web_handler._json_rpc_loop(Session(out), cast(web.WebSocketResponse, ws))
+    )
+    await ws.put(
+        json.dumps([dict(jsonrpc="2.0", id=i, method="slow") for i in range(50)])
+    )
+    for _ in range(100):
+        if len(out.messages):
+            break
+        await asyncio.sleep(0.01)
+    assert [r["result"] for r in out.messages[0]] == list(range(50))
+    assert peak == limit
+    t.cancel()